@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Request
@@ -6,6 +7,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from auth.password_pool import VerifiedCredentialCache
+from auth.token_cache import ClaimsCache
+from telemetry.metrics import Histogram
 
 
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -15,6 +19,11 @@ from fastapi import Security, HTTPException, status
 SECRET_KEY = os.getenv("SECRET_KEY", "I_Hate_MY_LIfE_BuT_I_LoVE_CODING! ;)")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+
+TOKEN_VERIFY_SECONDS = Histogram(
+    "auth_token_verify_seconds", "Time to validate a bearer token", ["cache"]
+)
 
 
 class JWTBearer(HTTPBearer):
@@ -29,12 +38,13 @@ class JWTBearer(HTTPBearer):
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Invalid authentication scheme.",
                 )
-            if not self.verify_jwt(credentials.credentials):
+            claims = self.verify_jwt(credentials.credentials)
+            if claims is None:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Invalid token or expired token.",
                 )
-            return credentials.credentials
+            return claims
         else:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -42,20 +52,44 @@ class JWTBearer(HTTPBearer):
             )
 
     def verify_jwt(self, token: str):
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return True
-        except JWTError:
-            return False
+        """Return the token's claims, decoding it at most once while cached."""
+        start = time.perf_counter()
+        payload = AuthHandler.claims_cache.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except JWTError:
+                return None
+            AuthHandler.claims_cache.put(token, payload)
+            TOKEN_VERIFY_SECONDS.labels("miss").observe(time.perf_counter() - start)
+        else:
+            TOKEN_VERIFY_SECONDS.labels("hit").observe(time.perf_counter() - start)
+
+        # Refresh tokens are only accepted by the refresh endpoint
+        if payload.get("type") == "refresh":
+            return None
+        return payload
 
 
 class AuthHandler:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     jwt_bearer = JWTBearer()
+    verified_cache = VerifiedCredentialCache(
+        ttl=float(os.getenv("PASSWORD_CACHE_TTL", 0))
+    )
+    claims_cache = ClaimsCache(
+        max_size=int(os.getenv("TOKEN_CACHE_SIZE", 10000)),
+        ttl=float(os.getenv("TOKEN_CACHE_TTL", 300)),
+    )
 
     @staticmethod
     def verify_password(plain_password, hashed_password):
-        return AuthHandler.pwd_context.verify(plain_password, hashed_password)
+        if AuthHandler.verified_cache.contains(plain_password, hashed_password):
+            return True
+        verified = AuthHandler.pwd_context.verify(plain_password, hashed_password)
+        if verified:
+            AuthHandler.verified_cache.add(plain_password, hashed_password)
+        return verified
 
     @staticmethod
     def get_password_hash(password):
@@ -68,6 +102,26 @@ class AuthHandler:
         to_encode.update({"exp": expire})
         return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+    @staticmethod
+    def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
+        to_encode = data.copy()
+        expire = datetime.utcnow() + (
+            expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        )
+        to_encode.update({"exp": expire, "type": "refresh"})
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+    @staticmethod
+    def refresh_access_token(refresh_token: str):
+        payload = AuthHandler.decode_token(refresh_token)
+        if payload.get("type") != "refresh" or not payload.get("sub"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return AuthHandler.create_access_token(data={"sub": payload["sub"]})
+
     @staticmethod
     def decode_token(token: str):
         try:
@@ -81,5 +135,6 @@ class AuthHandler:
             )
 
     @staticmethod
-    def get_current_user(token: str = Security(JWTBearer())):
-        return AuthHandler.decode_token(token)
+    def get_current_user(claims: dict = Security(JWTBearer())):
+        # JWTBearer already decoded and validated the token
+        return claims
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from telemetry.metrics import Histogram
+
+PASSWORD_SECONDS = Histogram(
+    "auth_password_seconds",
+    "Time to hash or verify a password, including queueing",
+    ["operation"],
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password operations are already queued."""
+
+
+class PasswordPool:
+    """Bounded worker pool for bcrypt work so it never runs on the event loop."""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64):
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordPoolBusy("Too many concurrent logins, retry later")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with PASSWORD_SECONDS.labels(fn.__name__).time():
+                return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class VerifiedCredentialCache:
+    """Short-lived, memory-only record of successful password verifications.
+
+    Entries are keyed by an HMAC of the stored hash and the plain password
+    under a random per-process key, so neither is kept in memory. A ttl of 0
+    disables the cache.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, password: str, hashed_password: str) -> bytes:
+        message = hashed_password.encode() + b"\0" + password.encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def contains(self, password: str, hashed_password: str) -> bool:
+        if not self.ttl:
+            return False
+        digest = self._digest(password, hashed_password)
+        with self._lock:
+            expires = self._entries.get(digest)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[digest]
+                return False
+            return True
+
+    def add(self, password: str, hashed_password: str):
+        if not self.ttl:
+            return
+        digest = self._digest(password, hashed_password)
+        with self._lock:
+            self._entries[digest] = time.monotonic() + self.ttl
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
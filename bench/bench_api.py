@@ -0,0 +1,241 @@
+"""Open-loop async load generator replaying a request trace against the API.
+
+Virtual users are registered and logged in first, then every trace record
+is sent at its scheduled time regardless of how earlier requests are doing.
+Latency is measured from the scheduled time, so a slow server shows up as
+latency instead of silently lowering the offered load.
+
+    python -m bench.trace --users 50 --duration 60
+    python -m bench.bench_api --url http://localhost:8000 --trace bench/traces/default.jsonl --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+from urllib.parse import urlsplit
+from bench.results import ResourceSampler, latency_summary, save_results
+from bench.trace import load_trace
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client for JSON requests over asyncio."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(payload)}",
+        ]
+        lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode() + payload
+
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.host, self.port
+                )
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            self.close()
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class VirtualUser:
+    def __init__(self, index: int):
+        self.index = index
+        self.email = f"load-{uuid.uuid4()}@example.com"
+        self.password = "Load2024!"
+        self.token = None
+        self.last_event = None
+
+
+class LoadGenerator:
+    def __init__(self, url: str, connections: int):
+        parts = urlsplit(url)
+        self.pool = asyncio.Queue()
+        for _ in range(connections):
+            self.pool.put_nowait(HTTPConnection(parts.hostname, parts.port or 80))
+        self.samples = {}
+        self.statuses = {}
+
+    async def send(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        connection = await self.pool.get()
+        try:
+            return await connection.request(method, path, body, headers)
+        finally:
+            self.pool.put_nowait(connection)
+
+    async def setup_user(self, user: VirtualUser):
+        await self.send(
+            "POST",
+            "/register",
+            {
+                "name": f"Load {user.index}",
+                "email": user.email,
+                "phone": "0",
+                "password": user.password,
+            },
+        )
+        status, body = await self.send(
+            "POST", "/token", {"email": user.email, "password": user.password}
+        )
+        if status != 200:
+            raise Exception(f"Error: Login failed for {user.email} ({status})")
+        user.token = body["access_token"]
+
+    async def replay(self, record: dict, user: VirtualUser, scheduled: float):
+        body = dict(record.get("body") or {})
+        if record["path"] == "/token" and not body:
+            body = {"email": user.email, "password": user.password}
+        if body.get("event_id") == "$last_event":
+            body["event_id"] = user.last_event
+
+        try:
+            status, response = await self.send(
+                record["method"], record["path"], body, user.token
+            )
+        except (OSError, asyncio.IncompleteReadError):
+            status, response = "connection_error", None
+        latency = time.perf_counter() - scheduled
+
+        if isinstance(response, dict):
+            event = response.get("published_event") or {}
+            event_ids = response.get("event_ids") or [event.get("event_id")]
+            if event_ids[-1]:
+                user.last_event = event_ids[-1]
+
+        path = record["path"]
+        self.statuses.setdefault(path, {}).setdefault(str(status), 0)
+        self.statuses[path][str(status)] += 1
+        if status == 200:
+            self.samples.setdefault(path, []).append(latency)
+
+    async def run(self, records, users, speed):
+        start = time.perf_counter()
+        tasks = []
+        for record in records:
+            scheduled = start + record["at"] / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            user = users[record["user"] % len(users)]
+            tasks.append(asyncio.create_task(self.replay(record, user, scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+async def run_benchmark(args):
+    records = load_trace(args.trace)
+    user_count = max(record["user"] for record in records) + 1
+    generator = LoadGenerator(args.url, args.connections)
+
+    users = [VirtualUser(index) for index in range(user_count)]
+    setup_start = time.perf_counter()
+    await asyncio.gather(*(generator.setup_user(user) for user in users))
+    print(f"Set up {user_count} users in {time.perf_counter() - setup_start:.2f}s")
+
+    samplers = {"generator": ResourceSampler(os.getpid())}
+    if args.server_pid:
+        samplers["server"] = ResourceSampler(args.server_pid)
+    with contextlib.ExitStack() as stack:
+        for sampler in samplers.values():
+            stack.enter_context(sampler)
+        elapsed = await generator.run(records, users, args.speed)
+
+    results = {
+        "trace": args.trace,
+        "speed": args.speed,
+        "users": user_count,
+        "duration_s": elapsed,
+        "offered_rps": len(records) / elapsed,
+        "endpoints": {},
+        "resources": {name: sampler.summary() for name, sampler in samplers.items()},
+    }
+    for path, statuses in sorted(generator.statuses.items()):
+        latencies = generator.samples.get(path, [])
+        results["endpoints"][path] = {
+            "throughput_rps": len(latencies) / elapsed,
+            "statuses": statuses,
+            "latency": latency_summary(latencies),
+        }
+        summary = results["endpoints"][path]["latency"]
+        print(
+            f"{path:<14} ok={len(latencies):<7} statuses={statuses} "
+            f"p50={summary.get('p50_ms', 0):8.2f} ms "
+            f"p99={summary.get('p99_ms', 0):8.2f} ms"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--trace", default="bench/traces/default.jsonl")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay rate multiplier"
+    )
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--server-pid", type=int, help="sample server CPU/memory")
+    parser.add_argument("--out", help="results file, default bench/results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    save_results("api", results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Per-request JWT auth overhead before and after the claims cache.
+
+"before" repeats what every protected route used to do: JWTBearer decoded
+the token to verify it and get_current_user decoded it again. "after" is
+the single, cached decode done by JWTBearer.verify_jwt.
+
+    python -m bench.bench_auth --requests 20000
+"""
+
+import argparse
+import time
+from jose import jwt
+from auth.jwt_handler import ALGORITHM, SECRET_KEY, AuthHandler, JWTBearer
+
+
+def before(token):
+    jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return AuthHandler.decode_token(token)
+
+
+def after(bearer, token):
+    return bearer.verify_jwt(token)
+
+
+def measure(name, fn, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<7} {elapsed / requests * 1e6:8.2f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = AuthHandler.create_access_token(data={"sub": "driver_bench"})
+    bearer = JWTBearer()
+
+    measure("before", lambda: before(token), args.requests)
+    measure("after", lambda: after(bearer, token), args.requests)
+    print(f"token cache: {AuthHandler.claims_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Accuracy and latency comparison of inference backends over sample frames.
+
+The PyTorch checkpoint is the reference: for every other backend the
+harness reports how often the detected classes match per frame, the mean
+IoU of matched boxes and the per-frame latency.
+
+    python -m bench.bench_backends ./samples --backends torch onnx onnx-int8
+"""
+
+import argparse
+import os
+import statistics
+import time
+import cv2
+from edge.backends import BACKENDS, load_model
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(directory):
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise Exception(f"Error: No sample frames found in {directory}")
+    return [cv2.imread(path) for path in paths]
+
+
+def detect(model, frames, imgsz):
+    model.predict(source=frames[0], conf=0.5, imgsz=imgsz, verbose=False)
+    detections, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = model.predict(source=frame, conf=0.5, imgsz=imgsz, verbose=False)[0]
+        latencies.append(time.perf_counter() - start)
+        detections.append(
+            [(int(box.cls[0]), box.xyxy[0].tolist()) for box in result.boxes]
+        )
+    return detections, latencies
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1])
+    return intersection / (union - intersection) if union > intersection else 0.0
+
+
+def compare(reference, candidate):
+    class_matches, ious = 0, []
+    for expected, actual in zip(reference, candidate):
+        if sorted(cls for cls, _ in expected) == sorted(cls for cls, _ in actual):
+            class_matches += 1
+        remaining = list(actual)
+        for cls, box in expected:
+            same_class = [item for item in remaining if item[0] == cls]
+            if not same_class:
+                continue
+            best = max(same_class, key=lambda item: iou(box, item[1]))
+            ious.append(iou(box, best[1]))
+            remaining.remove(best)
+    return class_matches / len(reference), statistics.fmean(ious) if ious else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("frames_dir")
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL_PATH", "./yolo/best_with_100_epochs.pt")
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    frames = load_images(args.frames_dir)
+    reference, _ = detect(load_model(args.model, "torch"), frames, args.imgsz)
+
+    for backend in args.backends:
+        try:
+            model = load_model(args.model, backend)
+        except FileNotFoundError as e:
+            print(f"{backend:<14} skipped: {e}")
+            continue
+        detections, latencies = detect(model, frames, args.imgsz)
+        class_agreement, mean_iou = compare(reference, detections)
+        latencies.sort()
+        print(
+            f"{backend:<14} mean={statistics.fmean(latencies) * 1000:8.2f} ms "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:8.2f} ms "
+            f"class_agreement={class_agreement:6.1%} mean_iou={mean_iou:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Latency of SOS map queries on the geospatial index against a full scan.
+
+Synthetic SOS are scattered around a number of city centres, as alerts
+cluster along busy roads, and indexed in-process. Radius, viewport and
+cluster queries are then timed on the index and, for reference, as a scan
+over every SOS like the map panel's query over all points:
+
+    python -m bench.bench_geo --sos 200000 --queries 200
+"""
+
+import argparse
+import random
+import time
+from db.geo_index import SOSGeoIndex, distance_m, geohash
+from bench.results import latency_summary, save_results
+
+
+def generate_sos(count: int, cities: int, seed: int) -> list:
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-50, 60), rng.uniform(-170, 170)) for _ in range(cities)]
+    now = time.time_ns()
+    records = []
+    for index in range(count):
+        latitude, longitude = rng.choice(centres)
+        records.append(
+            {
+                "time": now - rng.randrange(7 * 86400 * 10**9),
+                "user_id": f"driver_{index % 1000}",
+                "sos_id": str(index),
+                "latitude": max(-90.0, min(90.0, rng.gauss(latitude, 0.5))),
+                "longitude": max(-180.0, min(180.0, rng.gauss(longitude, 0.5))),
+            }
+        )
+    records.sort(key=lambda record: record["time"])
+    return records, centres
+
+
+def scan_radius(records, latitude, longitude, radius):
+    return sorted(
+        (
+            distance_m(latitude, longitude, record["latitude"], record["longitude"]),
+            record["sos_id"],
+        )
+        for record in records
+        if distance_m(latitude, longitude, record["latitude"], record["longitude"])
+        <= radius
+    )
+
+
+def scan_box(records, south, west, north, east):
+    return [
+        record
+        for record in records
+        if south <= record["latitude"] <= north and west <= record["longitude"] <= east
+    ]
+
+
+def scan_clusters(records, precision):
+    counts = {}
+    for record in records:
+        key = geohash(record["latitude"], record["longitude"], precision)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def timed(queries, function) -> dict:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(*query)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sos", type=int, default=200000)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--scan-queries", type=int, default=10, help="full scans are slow"
+    )
+    parser.add_argument("--radius", type=float, default=10000.0, help="meters")
+    parser.add_argument("--precision", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file, default bench/results/")
+    args = parser.parse_args()
+
+    records, centres = generate_sos(args.sos, args.cities, args.seed)
+    index = SOSGeoIndex(precision=args.precision, max_size=args.sos)
+    start = time.perf_counter()
+    index.add_many(records)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(args.seed + 1)
+    points = [
+        (rng.gauss(latitude, 0.5), rng.gauss(longitude, 0.5))
+        for latitude, longitude in rng.choices(centres, k=args.queries)
+    ]
+    # City-sized viewports around the points, and the whole world at zoom 2
+    boxes = [
+        (latitude - 0.5, longitude - 0.75, latitude + 0.5, longitude + 0.75)
+        for latitude, longitude in points
+    ]
+    world = [(-90.0, -180.0, 90.0, 180.0)] * max(args.queries // 10, 1)
+
+    # Index and scan must agree before their speed is compared
+    for latitude, longitude in points[: args.scan_queries]:
+        found = index.within_radius(latitude, longitude, args.radius, limit=args.sos)
+        expected = scan_radius(records, latitude, longitude, args.radius)
+        if sorted(record["sos_id"] for record in found) != sorted(
+            sos_id for _, sos_id in expected
+        ):
+            raise Exception("Error: Index and full scan disagree on a radius query")
+
+    results = {
+        "sos": args.sos,
+        "cities": args.cities,
+        "precision": args.precision,
+        "build_s": build_s,
+        "index": index.stats(),
+        "radius": timed(
+            [(lat, lon, args.radius) for lat, lon in points], index.within_radius
+        ),
+        "radius_scan": timed(
+            [(records, lat, lon, args.radius) for lat, lon in points][
+                : args.scan_queries
+            ],
+            scan_radius,
+        ),
+        "viewport": timed(boxes, index.within_box),
+        "viewport_scan": timed(
+            [(records, *box) for box in boxes][: args.scan_queries], scan_box
+        ),
+        "clusters_world": timed(world, lambda *box: index.clusters(*box, precision=2)),
+        "clusters_city": timed(boxes, lambda *box: index.clusters(*box, precision=6)),
+        "clusters_scan": timed(
+            [(records, 2)] * min(args.scan_queries, 3), scan_clusters
+        ),
+    }
+    print(f"indexed {args.sos} SOS in {build_s:.2f}s")
+    for name in (
+        "radius",
+        "radius_scan",
+        "viewport",
+        "viewport_scan",
+        "clusters_world",
+        "clusters_city",
+        "clusters_scan",
+    ):
+        summary = results[name]
+        print(
+            f"{name:<15} p50={summary['p50_ms']:9.2f} ms "
+            f"p99={summary['p99_ms']:9.2f} ms"
+        )
+    save_results("geo", results, args.out)
+
+
+if __name__ == "__main__":
+    main()
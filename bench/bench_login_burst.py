@@ -0,0 +1,108 @@
+"""Event-ingest latency on POST /event/ while a burst of logins hits /token.
+
+A steady stream of authenticated events runs before, during and after the
+burst of concurrent logins; latency percentiles are reported per phase, so
+the p99 during the burst shows whether password hashing stalls ingestion.
+
+    python -m bench.bench_login_burst --url http://localhost:8000 --logins 100
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def register_and_login(url, email, password):
+    requests.post(
+        f"{url}/register",
+        json={"name": "Bench", "email": email, "phone": "0", "password": password},
+        timeout=30,
+    )
+    response = requests.post(
+        f"{url}/token", json={"email": email, "password": password}, timeout=30
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def ingest(url, token, stop, samples, phase):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = session.post(
+            f"{url}/event/", json={"event_type": "active", "confidence": 0.9}
+        )
+        if response.ok:
+            samples.append((phase[0], time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--ingest-threads", type=int, default=4)
+    parser.add_argument("--phase-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    password = "Bench2024!"
+    email = f"bench-{uuid.uuid4()}@example.com"
+    token = register_and_login(args.url, email, password)
+
+    stop = threading.Event()
+    samples = []
+    phase = ["before"]
+    ingesters = [
+        threading.Thread(target=ingest, args=(args.url, token, stop, samples, phase))
+        for _ in range(args.ingest_threads)
+    ]
+    for thread in ingesters:
+        thread.start()
+
+    time.sleep(args.phase_seconds)
+    phase[0] = "burst"
+    burst_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.logins) as pool:
+        logins = list(
+            pool.map(
+                lambda _: requests.post(
+                    f"{args.url}/token",
+                    json={"email": email, "password": password},
+                    timeout=60,
+                ).status_code,
+                range(args.logins),
+            )
+        )
+    burst_seconds = time.perf_counter() - burst_start
+    phase[0] = "after"
+    time.sleep(args.phase_seconds)
+    stop.set()
+    for thread in ingesters:
+        thread.join()
+
+    print(
+        f"{args.logins} logins in {burst_seconds:.2f}s "
+        f"(ok={logins.count(200)}, busy={logins.count(503)})"
+    )
+    for name in ("before", "burst", "after"):
+        latencies = [latency for label, latency in samples if label == name]
+        if not latencies:
+            continue
+        print(
+            f"{name:<7} events={len(latencies):<6} "
+            f"p50={statistics.median(latencies) * 1000:8.2f} ms "
+            f"p99={percentile(latencies, 0.99) * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
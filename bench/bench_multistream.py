@@ -0,0 +1,113 @@
+"""Compare batched multi-stream inference with one process per camera.
+
+Both modes run the same number of frames through the model and report
+frames per CPU-second (frames/sec/core), so the numbers are comparable on
+any machine regardless of how many threads torch decides to use.
+
+    python -m bench.bench_multistream --video sample.mp4 --streams 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+import cv2
+from ultralytics import YOLO
+
+
+def load_frames(video_path, count):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            if not frames:
+                raise Exception(f"Error: Could not read frames from {video_path}")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _single_camera(model_path, video_path, frames_per_stream, threads):
+    import torch
+
+    torch.set_num_threads(threads)
+    model = YOLO(model_path)
+    for frame in load_frames(video_path, frames_per_stream):
+        model.predict(source=frame, conf=0.5, verbose=False)
+
+
+def run_per_process(model_path, video_path, streams, frames_per_stream, threads):
+    processes = [
+        multiprocessing.Process(
+            target=_single_camera,
+            args=(model_path, video_path, frames_per_stream, threads),
+        )
+        for _ in range(streams)
+    ]
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start, cpu_seconds() - start_cpu
+
+
+def run_batched(model_path, video_path, streams, frames_per_stream, threads):
+    import torch
+
+    torch.set_num_threads(threads)
+    model = YOLO(model_path)
+    frames = load_frames(video_path, frames_per_stream)
+    # Warm up so model loading is not counted against the batched mode only
+    model.predict(source=frames[0], conf=0.5, verbose=False)
+
+    start_cpu, start = cpu_seconds(), time.perf_counter()
+    for frame in frames:
+        # One fresh frame per stream per step, as MultiStreamInference does
+        model.predict(source=[frame] * streams, conf=0.5, verbose=False)
+    return time.perf_counter() - start, cpu_seconds() - start_cpu
+
+
+def report(name, total_frames, wall, cpu):
+    print(
+        f"{name:<18} frames={total_frames:<6} wall={wall:7.2f}s "
+        f"cpu={cpu:7.2f}s fps={total_frames / wall:8.2f} "
+        f"frames/sec/core={total_frames / cpu:8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True)
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL_PATH", "./yolo/best_with_100_epochs.pt")
+    )
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=50, help="frames per stream")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads")
+    args = parser.parse_args()
+
+    total_frames = args.streams * args.frames
+    wall, cpu = run_per_process(
+        args.model, args.video, args.streams, args.frames, args.threads
+    )
+    report("per-process", total_frames, wall, cpu)
+
+    wall, cpu = run_batched(
+        args.model, args.video, args.streams, args.frames, args.threads
+    )
+    report("batched", total_frames, wall, cpu)
+
+
+if __name__ == "__main__":
+    main()
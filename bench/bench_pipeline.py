@@ -0,0 +1,117 @@
+"""Throughput and latency of DrowsinessDetector.process_frame over sample videos.
+
+Frames are decoded up front so only preprocessing, inference and result
+handling are timed. Events the detector emits are counted instead of being
+sent to the backend.
+
+    python -m bench.bench_pipeline video1.mp4 video2.mp4 --frames 300 --preprocessing letterbox
+"""
+
+import argparse
+import os
+import time
+import cv2
+from bench.results import ResourceSampler, latency_summary, save_results
+from main import DrowsinessDetector
+
+
+class CountingStreamer:
+    """Stands in for BackendEventStreamer and counts what would be sent."""
+
+    def __init__(self):
+        self.events = {}
+        self.sos = 0
+
+    def send_event(self, event_type, confidence=0.6, urgent=False, count=1):
+        self.events[event_type] = self.events.get(event_type, 0) + count
+
+    def send_sos(self, message, latitude=0, longitude=0):
+        self.sos += 1
+
+    def reset_sos(self):
+        pass
+
+
+def load_frames(video_path, limit):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise Exception(f"Error: Could not read frames from {video_path}")
+    return frames
+
+
+def run_video(args, video_path):
+    streamer = CountingStreamer()
+    detector = DrowsinessDetector(
+        args.model,
+        streamer,
+        draw_boxes=args.draw,
+        preprocessing=args.preprocessing,
+        imgsz=args.imgsz,
+        backend=args.backend,
+    )
+    frames = load_frames(video_path, args.frames)
+    detector.process_frame(frames[0].copy())
+
+    latencies = []
+    with ResourceSampler(os.getpid()) as sampler:
+        start = time.perf_counter()
+        for frame in frames:
+            frame_start = time.perf_counter()
+            detector.process_frame(frame)
+            latencies.append(time.perf_counter() - frame_start)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "frames": len(frames),
+        "fps": len(frames) / elapsed,
+        "latency": latency_summary(latencies),
+        "resources": sampler.summary(),
+        "events": streamer.events,
+        "sos": streamer.sos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL_PATH", "./yolo/best_with_100_epochs.pt")
+    )
+    parser.add_argument("--frames", type=int, default=300, help="max per video")
+    parser.add_argument(
+        "--preprocessing", choices=["direct", "letterbox"], default="direct"
+    )
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--draw", action="store_true", help="draw boxes too")
+    parser.add_argument("--out", help="results file, default bench/results/")
+    args = parser.parse_args()
+
+    results = {
+        "model": args.model,
+        "backend": args.backend,
+        "preprocessing": args.preprocessing,
+        "imgsz": args.imgsz,
+        "videos": {},
+    }
+    for video_path in args.videos:
+        result = run_video(args, video_path)
+        results["videos"][os.path.basename(video_path)] = result
+        print(
+            f"{os.path.basename(video_path):<24} frames={result['frames']:<5} "
+            f"fps={result['fps']:7.2f} "
+            f"p50={result['latency']['p50_ms']:7.2f} ms "
+            f"p99={result['latency']['p99_ms']:7.2f} ms"
+        )
+    save_results("pipeline", results, args.out)
+
+
+if __name__ == "__main__":
+    main()
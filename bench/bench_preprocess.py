@@ -0,0 +1,77 @@
+"""Per-frame latency and allocation of DrowsinessDetector preprocessing paths.
+
+"before" is the original cvtColor -> PIL -> ndarray round trip that
+Ultralytics undid again internally; "direct" feeds the BGR frame as-is and
+"letterbox" resizes into the reusable LetterboxBuffer. Pass --model to also
+time the full predict call for each path.
+
+    python -m bench.bench_preprocess --width 1280 --height 720 --frames 200
+"""
+
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from PIL import Image
+from edge.preprocess import LetterboxBuffer
+
+
+def before(frame):
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    # Ultralytics converts PIL inputs back to a BGR ndarray before letterboxing
+    return np.asarray(image)[..., ::-1].copy()
+
+
+def direct(frame):
+    return frame
+
+
+def measure(name, prepare, frames, model=None, imgsz=640):
+    prepare(frames[0])  # warm up, lets the letterbox buffer configure itself
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for frame in frames:
+        source = prepare(frame)
+        if model is not None:
+            model.predict(source=source, conf=0.5, imgsz=imgsz, verbose=False)
+    elapsed = time.perf_counter() - start
+    allocated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<10} latency={elapsed / len(frames) * 1000:8.3f} ms/frame "
+        f"peak_alloc={peak / 1024:10.1f} KiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--model", help="optional model path to time predict too")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+        for _ in range(min(args.frames, 16))
+    ]
+    frames = (frames * (args.frames // len(frames) + 1))[: args.frames]
+
+    model = None
+    if args.model:
+        from ultralytics import YOLO
+
+        model = YOLO(args.model)
+
+    measure("before", before, frames, model, args.imgsz)
+    measure("direct", direct, frames, model, args.imgsz)
+    measure("letterbox", LetterboxBuffer(args.imgsz), frames, model, args.imgsz)
+
+
+if __name__ == "__main__":
+    main()
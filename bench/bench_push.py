@@ -0,0 +1,152 @@
+"""End-to-end SOS delivery latency from POST /sos/ to many SSE subscribers.
+
+One driver is registered and every subscriber opens /push/sse with that
+driver's token, so each SOS fans out to all of them. Latency is measured
+from the server's published_at stamp to the moment a subscriber parses the
+message, so client and server must share a clock (run on the same host).
+Raise the open file limit (ulimit -n) for thousands of subscribers.
+
+    python -m bench.bench_push --url http://localhost:8000 --subscribers 2000 --sos 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+from bench.bench_api import LoadGenerator, VirtualUser
+from bench.results import latency_summary, save_results
+
+
+class SSESubscriber:
+    """Reads a chunked text/event-stream response and records SOS latency."""
+
+    def __init__(self, host: str, port: int, token: str):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.latencies = []
+        self.connected = asyncio.Event()
+        self.dropped = False
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(
+            (
+                f"GET /push/sse?topic=sos&token={self.token} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Accept: text/event-stream\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+        try:
+            status = int((await reader.readline()).split()[1])
+            if status != 200:
+                raise Exception(f"Error: Subscription failed ({status})")
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            buffer = b""
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    return
+                buffer += chunk[:-2]
+                *events, buffer = buffer.split(b"\n\n")
+                for event in events:
+                    self.handle(event.decode())
+        finally:
+            writer.close()
+
+    def handle(self, event: str):
+        received = time.time()
+        for line in event.splitlines():
+            if line.startswith(": connected"):
+                self.connected.set()
+            elif line.startswith("event: dropped"):
+                self.dropped = True
+            elif line.startswith("data: "):
+                message = json.loads(line[len("data: ") :])
+                if message.get("topic") == "sos":
+                    self.latencies.append(received - message["published_at"])
+
+
+async def run_benchmark(args) -> dict:
+    parts = urlsplit(args.url)
+    generator = LoadGenerator(args.url, connections=4)
+    driver = VirtualUser(0)
+    await generator.setup_user(driver)
+
+    subscribers = [
+        SSESubscriber(parts.hostname, parts.port or 80, driver.token)
+        for _ in range(args.subscribers)
+    ]
+    tasks = [asyncio.create_task(subscriber.run()) for subscriber in subscribers]
+    await asyncio.wait_for(
+        asyncio.gather(*(subscriber.connected.wait() for subscriber in subscribers)),
+        timeout=60,
+    )
+    print(f"{len(subscribers)} subscribers connected")
+
+    for index in range(args.sos):
+        status, body = await generator.send(
+            "POST",
+            "/event/",
+            {"event_type": "drowsy", "confidence": 0.9},
+            token=driver.token,
+        )
+        if status != 200:
+            raise Exception(f"Error: Event rejected ({status})")
+        await generator.send(
+            "POST",
+            "/sos/",
+            {
+                "event_id": body["published_event"]["event_id"],
+                "message": f"Benchmark SOS {index}",
+                "latitude": 34.0,
+                "longitude": -6.8,
+            },
+            token=driver.token,
+        )
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(args.drain)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = [value for subscriber in subscribers for value in subscriber.latencies]
+    return {
+        "subscribers": len(subscribers),
+        "sos": args.sos,
+        "expected": len(subscribers) * args.sos,
+        "received": len(latencies),
+        "dropped_subscribers": sum(subscriber.dropped for subscriber in subscribers),
+        "latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--sos", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument(
+        "--drain", type=float, default=2.0, help="seconds to wait for stragglers"
+    )
+    parser.add_argument("--out", help="results file, default bench/results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    latency = results["latency"]
+    print(
+        f"received {results['received']}/{results['expected']} "
+        f"p50={latency.get('p50_ms', 0):.2f} ms p99={latency.get('p99_ms', 0):.2f} ms"
+    )
+    save_results("push", results, args.out)
+
+
+if __name__ == "__main__":
+    main()
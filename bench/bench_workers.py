@@ -0,0 +1,165 @@
+"""Cold-start time and request throughput of server_run.py from 1 to N workers.
+
+For each worker count a fresh server is launched and timed until it answers
+and until every worker has finished startup. Closed-loop clients spread over
+several processes, so the client is not the bottleneck, then keep POST
+/event/ busy for a fixed duration. Throughput is reported in total, per
+worker and per core in use.
+
+    STORAGE_BACKEND=memory python -m bench.bench_workers --workers 1,2,4 --duration 20
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+from bench.bench_api import HTTPConnection, LoadGenerator, VirtualUser
+from bench.results import latency_summary, save_results
+
+
+def start_server(workers: int, port: int):
+    """Launch server_run.py, returning the process and its startup timings."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "server_run.py",
+            "--workers",
+            str(workers),
+            "--port",
+            str(port),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    ready = threading.Event()
+    timings = {}
+
+    def watch_output():
+        complete = 0
+        for line in process.stdout:
+            if "Application startup complete" in line:
+                complete += 1
+                if complete == workers:
+                    timings["all_ready_s"] = time.perf_counter() - started
+                    ready.set()
+
+    threading.Thread(target=watch_output, daemon=True).start()
+    while "first_response_s" not in timings:
+        if process.poll() is not None:
+            raise Exception(f"Error: Server exited with status {process.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics/push", timeout=1)
+            timings["first_response_s"] = time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    if not ready.wait(timeout=60):
+        raise Exception("Error: Not every worker finished startup")
+    return process, timings
+
+
+def client_process(job):
+    url, token, connections, duration = job
+    return asyncio.run(closed_loop(url, token, connections, duration))
+
+
+async def closed_loop(url: str, token: str, connections: int, duration: float):
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], 0
+
+    async def run_connection():
+        nonlocal errors
+        connection = HTTPConnection(parts.hostname, parts.port or 80)
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = await connection.request(
+                    "POST",
+                    "/event/",
+                    {"event_type": "active", "confidence": 0.9},
+                    headers,
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                status = 0
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        connection.close()
+
+    await asyncio.gather(*(run_connection() for _ in range(connections)))
+    return latencies, errors
+
+
+async def login_users(url: str, count: int) -> list:
+    generator = LoadGenerator(url, connections=4)
+    users = [VirtualUser(index) for index in range(count)]
+    await asyncio.gather(*(generator.setup_user(user) for user in users))
+    return [user.token for user in users]
+
+
+def run_workers(args, workers: int) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    process, timings = start_server(workers, args.port)
+    try:
+        tokens = asyncio.run(login_users(url, args.client_processes))
+        jobs = [(url, token, args.connections, args.duration) for token in tokens]
+        with multiprocessing.Pool(args.client_processes) as pool:
+            outcomes = pool.map(client_process, jobs)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    latencies = [value for outcome in outcomes for value in outcome[0]]
+    rps = len(latencies) / args.duration
+    cores = min(workers, os.cpu_count())
+    return {
+        **timings,
+        "requests": len(latencies),
+        "errors": sum(outcome[1] for outcome in outcomes),
+        "rps": rps,
+        "rps_per_worker": rps / workers,
+        "rps_per_core": rps / cores,
+        "latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated counts")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--client-processes", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--connections", type=int, default=16, help="per client process"
+    )
+    parser.add_argument("--out", help="results file, default bench/results/")
+    args = parser.parse_args()
+
+    results = {
+        "storage_backend": os.getenv("STORAGE_BACKEND", "influxdb"),
+        "cpu_count": os.cpu_count(),
+        "workers": {},
+    }
+    for workers in (int(value) for value in args.workers.split(",")):
+        result = run_workers(args, workers)
+        results["workers"][str(workers)] = result
+        print(
+            f"workers={workers:<3} cold_start={result['all_ready_s']:6.2f}s "
+            f"rps={result['rps']:8.0f} per_core={result['rps_per_core']:7.0f} "
+            f"p99={result['latency'].get('p99_ms', 0):7.2f} ms errors={result['errors']}"
+        )
+    save_results("workers", results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Compare two benchmark result files saved by the bench scripts.
+
+Every numeric metric present in both files is printed with its relative
+change, so a regression between two commits stands out:
+
+    python -m bench.results bench/results/api-1a2b3c4d.json bench/results/api-5e6f7a8b.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import psutil
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def latency_summary(latencies) -> dict:
+    """Latency percentiles in milliseconds for a list of durations in seconds."""
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+class ResourceSampler:
+    """Samples CPU and resident memory of a process in the background."""
+
+    def __init__(self, pid: int = None, interval: float = 0.5):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.process.cpu_percent()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.cpu_samples.append(self.process.cpu_percent())
+                self.rss_samples.append(self.process.memory_info().rss)
+            except psutil.Error:
+                break
+
+    def summary(self) -> dict:
+        if not self.cpu_samples:
+            return {}
+        return {
+            "cpu_percent_mean": statistics.fmean(self.cpu_samples),
+            "cpu_percent_max": max(self.cpu_samples),
+            "rss_mb_max": max(self.rss_samples) / 2**20,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, results: dict, path: str = None) -> str:
+    """Write results as JSON tagged with the commit and host they came from."""
+    commit = git_commit()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{(commit or 'nocommit')[:8]}.json")
+    document = {
+        "bench": name,
+        "commit": commit,
+        "created_at": time.time(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Saved results to {path}")
+    return path
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline  {baseline.get('commit')}\ncandidate {candidate.get('commit')}")
+
+    before = dict(flatten(baseline["results"]))
+    for key, new in flatten(candidate["results"]):
+        if key not in before:
+            continue
+        old = before[key]
+        change = f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+        print(f"{key:<48} {old:12.3f} {new:12.3f} {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Synthesize a request trace for the API load generator.
+
+A trace is a JSONL file with one request per line, ordered by ``at``:
+
+    {"at": 0.42, "user": 3, "method": "POST", "path": "/event/", "body": {...}}
+
+``at`` is the send time in seconds from the start of the run and ``user``
+indexes the virtual user whose token is used. Two placeholders are filled
+in at replay time: a ``/token`` body of ``{}`` becomes that user's
+credentials, and an ``event_id`` of ``"$last_event"`` becomes the id of
+the user's latest acknowledged event.
+
+    python -m bench.trace --users 50 --duration 60 --out bench/traces/default.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+
+# Rough mix of what edge devices report
+EVENT_TYPES = {"active": 0.7, "inactive": 0.1, "drowsy": 0.12, "sleep": 0.08}
+SOS_MESSAGES = ["Severe Drowsiness Detected!", "help", "emergency"]
+
+
+def synthesize(
+    users: int,
+    duration: float,
+    event_rate: float = 1.0,
+    sos_probability: float = 0.2,
+    login_rate: float = 0.01,
+    seed: int = 0,
+) -> list:
+    """Poisson event and login arrivals per user, with SOS after drowsiness.
+
+    Rates are per user per second; each drowsy event is followed by an SOS
+    with ``sos_probability``.
+    """
+    rng = random.Random(seed)
+    names, weights = zip(*EVENT_TYPES.items())
+    records = []
+    for user in range(users):
+        at = rng.expovariate(event_rate)
+        while at < duration:
+            event_type = rng.choices(names, weights)[0]
+            records.append(
+                {
+                    "at": at,
+                    "user": user,
+                    "method": "POST",
+                    "path": "/event/",
+                    "body": {
+                        "event_type": event_type,
+                        "confidence": round(rng.uniform(0.5, 1.0), 3),
+                    },
+                }
+            )
+            if event_type == "drowsy" and rng.random() < sos_probability:
+                records.append(
+                    {
+                        "at": at + 0.2,
+                        "user": user,
+                        "method": "POST",
+                        "path": "/sos/",
+                        "body": {
+                            "event_id": "$last_event",
+                            "message": rng.choice(SOS_MESSAGES),
+                            "latitude": round(rng.uniform(30.0, 60.0), 4),
+                            "longitude": round(rng.uniform(-10.0, 24.0), 4),
+                        },
+                    }
+                )
+            at += rng.expovariate(event_rate)
+
+        if login_rate > 0:
+            at = rng.expovariate(login_rate)
+            while at < duration:
+                records.append(
+                    {
+                        "at": at,
+                        "user": user,
+                        "method": "POST",
+                        "path": "/token",
+                        "body": {},
+                    }
+                )
+                at += rng.expovariate(login_rate)
+
+    records.sort(key=lambda record: record["at"])
+    return records
+
+
+def save_trace(path: str, records: list):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_trace(path: str) -> list:
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda record: record["at"])
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--event-rate", type=float, default=1.0)
+    parser.add_argument("--sos-probability", type=float, default=0.2)
+    parser.add_argument("--login-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench/traces/default.jsonl")
+    args = parser.parse_args()
+
+    records = synthesize(
+        args.users,
+        args.duration,
+        event_rate=args.event_rate,
+        sos_probability=args.sos_probability,
+        login_rate=args.login_rate,
+        seed=args.seed,
+    )
+    save_trace(args.out, records)
+    print(f"Wrote {len(records)} requests for {args.users} users to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,15 @@ import os
 import uuid
 import time
 from dotenv import load_dotenv
+from db.analytics import LateWrites
+from db.event_index import RecentEventIndex
+from db.storage import history_page, history_query, parse_events, parse_location
+from db.write_buffer import (
+    WRITE_BATCH_POINTS,
+    WRITE_SECONDS,
+    WriteBuffer,
+    to_line_protocol,
+)
 
 
 class InfluxDBHandler:
@@ -16,13 +25,46 @@ class InfluxDBHandler:
         password = os.getenv("INFLUXDB_PASSWORD")
         database = os.getenv("INFLUXDB_DATABASE")
 
+        # Constructing the client does no I/O; setup() creates the database.
+        # Retries with backoff are left to the caller (see AsyncStorage), so
+        # the client itself makes a single attempt bounded by the timeout.
+        self.database = database
         self.client = influxdb.InfluxDBClient(
-            host=host, port=port, username=username, password=password
+            host=host,
+            port=port,
+            username=username,
+            password=password,
+            database=database,
+            timeout=float(os.getenv("INFLUXDB_TIMEOUT", 5)),
+            retries=1,
+            pool_size=int(os.getenv("INFLUXDB_POOL_SIZE", 10)),
         )
 
-        # Ensure the database exists
-        self.client.create_database(database)
-        self.client.switch_database(database)
+        # SOS messages refer to recent events, so existence checks only look
+        # this far back
+        self.event_lookup_window = os.getenv("EVENT_LOOKUP_WINDOW", "24h")
+
+        # Recently accepted event ids answer most checks without a query
+        self.event_index = RecentEventIndex(
+            max_size=int(os.getenv("EVENT_INDEX_SIZE", 100000)),
+            ttl=float(os.getenv("EVENT_INDEX_TTL", 3600)),
+        )
+
+        # Points are queued here and written in batches by a background thread
+        self.write_buffer = WriteBuffer(
+            self.client,
+            batch_size=int(os.getenv("INFLUXDB_BATCH_SIZE", 5000)),
+            flush_interval=float(os.getenv("INFLUXDB_FLUSH_INTERVAL", 1.0)),
+            max_queue_size=int(os.getenv("INFLUXDB_QUEUE_SIZE", 100000)),
+        )
+
+        # Hours whose rollups miss points replayed after the continuous
+        # queries ran, recomputed by EventAnalytics.backfill_late
+        self.late_writes = LateWrites()
+
+    def setup(self):
+        """Ensure the database exists."""
+        self.client.create_database(self.database)
 
     def validate_user_exists(self, user_id: str) -> bool:
         """Check if the user exists in the database."""
@@ -32,10 +74,28 @@ class InfluxDBHandler:
         result = list(self.client.query(query).get_points())
         return len(result) > 0
 
-    def validate_event_exists(self, event_id: str) -> bool:
-        """Check if the event exists in the database."""
-        query = f"SELECT * FROM events WHERE event_id = '{event_id}' LIMIT 1"
-        result = list(self.client.query(query).get_points())
+    def validate_event_exists(self, event_id: str, user_id: str = None) -> bool:
+        """Check if the event exists in the database.
+
+        event_id is a field, so the lookup is bounded by time and, when known,
+        by the indexed user_id tag instead of scanning every event.
+        """
+        if self.event_index.contains(event_id, user_id):
+            return True
+
+        conditions = [
+            '"event_id"::field = $event_id',
+            f"time > now() - {self.event_lookup_window}",
+        ]
+        params = {"event_id": event_id}
+        if user_id:
+            conditions.append('"user_id" = $user_id')
+            params["user_id"] = user_id
+
+        query = 'SELECT "confidence" FROM "events" WHERE ' + " AND ".join(conditions)
+        result = list(
+            self.client.query(f"{query} LIMIT 1", bind_params=params).get_points()
+        )
         return len(result) > 0
 
     def write_event(self, user_id: str, event_type: str, confidence: float) -> str:
@@ -43,22 +103,83 @@ class InfluxDBHandler:
         if not self.validate_user_exists(user_id):
             raise ValueError(f"User {user_id} does not exist")
 
+        event = parse_events([{"event_type": event_type, "confidence": confidence}])[0]
         event_id = str(uuid.uuid4())
-        json_body = [
-            {
-                "measurement": "events",
-                "tags": {
-                    "user_id": user_id,
-                    "event_id": event_id,
-                    "event_type": event_type,
-                },
-                "fields": {"confidence": confidence},
-                "time": time.time_ns(),
-            }
-        ]
-        self.client.write_points(json_body)
+        point = self._event_point(
+            user_id, event_id, event["event_type"], event["confidence"]
+        )
+        self.write_buffer.enqueue(point)
+        self.event_index.add(event_id, user_id)
         return event_id
 
+    def write_events(self, user_id: str, events: list) -> list:
+        """Validate a batch of events and write it with a single request."""
+        lines, event_ids = self.prepare_events(user_id, events)
+        self.commit_events(user_id, lines, event_ids)
+        return event_ids
+
+    def commit_events(self, user_id: str, lines: list, event_ids: list):
+        """Write prepared events directly, bypassing the write buffer."""
+        if lines:
+            with WRITE_SECONDS.labels("direct").time():
+                self.client.write_points(lines, protocol="line")
+            WRITE_BATCH_POINTS.labels("direct").observe(len(lines))
+            self.event_index.add_many(event_ids, user_id)
+
+    def buffer_events(self, user_id: str, lines: list, event_ids: list):
+        """Queue prepared events on the write buffer, all or nothing."""
+        if lines:
+            self.write_buffer.enqueue_lines(lines)
+            self.event_index.add_many(event_ids, user_id)
+
+    def remember_event(self, event_id: str, user_id: str):
+        """Index an event stored by another worker so SOS can refer to it."""
+        self.event_index.add(event_id, user_id)
+
+    def prepare_events(self, user_id: str, events: list) -> tuple:
+        """Validate a batch of events and serialize it to line protocol."""
+        if not self.validate_user_exists(user_id):
+            raise ValueError(f"User {user_id} does not exist")
+
+        points = []
+        event_ids = []
+        parsed = parse_events(events)
+        self.late_writes.record(event["timestamp_ns"] for event in parsed)
+        for event in parsed:
+            event_id = str(uuid.uuid4())
+            point = self._event_point(
+                user_id,
+                event_id,
+                event["event_type"],
+                event["confidence"],
+                event["timestamp_ns"],
+            )
+            # Coalesced detections from edge devices carry window statistics
+            if event["count"] is not None:
+                point["fields"]["count"] = event["count"]
+            if event["max_confidence"] is not None:
+                point["fields"]["max_confidence"] = event["max_confidence"]
+            points.append(to_line_protocol(point))
+            event_ids.append(event_id)
+        return points, event_ids
+
+    @staticmethod
+    def _event_point(
+        user_id: str,
+        event_id: str,
+        event_type: str,
+        confidence: float,
+        timestamp_ns: int = None,
+    ) -> dict:
+        # Only low-cardinality dimensions are tags; ids are fields so every
+        # event does not create a new series
+        return {
+            "measurement": "events",
+            "tags": {"user_id": user_id, "event_type": event_type},
+            "fields": {"event_id": event_id, "confidence": float(confidence)},
+            "time": timestamp_ns or time.time_ns(),
+        }
+
     def write_sos(
         self,
         user_id: str,
@@ -66,29 +187,116 @@ class InfluxDBHandler:
         message: str,
         latitude: float,
         longitude: float,
+        validate_event: bool = True,
     ) -> str:
         """Write an SOS message to the database with validation for the user and event."""
         if not self.validate_user_exists(user_id):
             raise ValueError(f"User {user_id} does not exist")
 
-        if not self.validate_event_exists(event_id):
+        latitude, longitude = parse_location(latitude, longitude)
+        # Buffered events are already in the event index, so no flush is needed
+        if validate_event and not self.validate_event_exists(event_id, user_id):
             raise ValueError(f"Event {event_id} does not exist")
 
         sos_id = str(uuid.uuid4())
-        json_body = [
+        point = {
+            "measurement": "sos",
+            "tags": {"user_id": user_id},
+            "fields": {
+                "event_id": event_id,
+                "sos_id": sos_id,
+                "message": message,
+                "latitude": latitude,
+                "longitude": longitude,
+            },
+            "time": time.time_ns(),
+        }
+        self.write_buffer.enqueue(point)
+        return sos_id
+
+    def write_user(self, user: dict):
+        """Record a user's profile (never the password hash) for Grafana."""
+        point = {
+            "measurement": "users",
+            "tags": {"user_id": user["user_id"], "email": user["email"]},
+            "fields": {"name": user["name"], "phone": user["phone"]},
+            "time": time.time_ns(),
+        }
+        self.write_buffer.enqueue(point)
+
+    def legacy_users(self) -> list:
+        """Users stored in the users measurement before the SQLite store."""
+        result = self.client.query('SELECT * FROM "users"')
+        return list(result.get_points(measurement="users"))
+
+    def event_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields=None,
+    ) -> tuple:
+        """One page of a user's events in [start, end), oldest first."""
+        return self._history(
+            "events", "confidence", user_id, start, end, cursor, limit, fields
+        )
+
+    def sos_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields=None,
+    ) -> tuple:
+        """One page of a user's SOS messages in [start, end), oldest first."""
+        return self._history(
+            "sos", "sos_id", user_id, start, end, cursor, limit, fields
+        )
+
+    def _history(
+        self, measurement, required, user_id, start, end, cursor, limit, fields
+    ) -> tuple:
+        fields, start_ns, end_ns, skip = history_query(
+            measurement, start, end, cursor, limit, fields
+        )
+        # A tag-only SELECT returns nothing, so one field is always queried.
+        # The user_id tag and the time bounds keep this to one user's series
+        columns = ", ".join(f'"{field}"' for field in {*fields, required})
+        query = (
+            f'SELECT {columns} FROM "{measurement}" WHERE "user_id" = $user_id '
+            f"AND time >= {start_ns} AND time < {end_ns} "
+            f"ORDER BY time ASC LIMIT {limit + skip}"
+        )
+        result = self.client.query(query, bind_params={"user_id": user_id}, epoch="ns")
+        rows = [
             {
-                "measurement": "sos",
-                "tags": {"user_id": user_id, "event_id": event_id, "sos_id": sos_id},
-                "fields": {
-                    "message": message,
-                    "latitude": latitude,
-                    "longitude": longitude,
+                "time": point["time"],
+                **{
+                    field: point[field]
+                    for field in fields
+                    if point.get(field) is not None
                 },
-                "time": time.time_ns(),
             }
+            for point in result.get_points(measurement=measurement)
+        ]
+        return history_page(rows, skip, limit)
+
+    def recent_sos(self, start: float, end: float) -> list:
+        """Every user's SOS in [start, end), oldest first, to rebuild the map index."""
+        query = (
+            'SELECT "user_id", "event_id", "sos_id", "message", "latitude", '
+            f'"longitude" FROM "sos" WHERE time >= {int(start * 1e9)} '
+            f"AND time < {int(end * 1e9)}"
+        )
+        # Chunked so InfluxDB streams a large result instead of building it
+        chunks = self.client.query(query, epoch="ns", chunked=True, chunk_size=10000)
+        return [
+            point for chunk in chunks for point in chunk.get_points(measurement="sos")
         ]
-        self.client.write_points(json_body)
-        return sos_id
 
     def reset_database(self):
         """Reset the database by dropping specific measurements."""
@@ -101,13 +309,16 @@ class InfluxDBHandler:
                 print(f"Error dropping {measurement}: {e}")
 
     def close(self):
-        """Close the connection to the InfluxDB client."""
-        pass
+        """Drain pending writes and close the connection to the InfluxDB client."""
+        self.write_buffer.close()
+        self.client.close()
 
 
 def main():
     db_manager = InfluxDBHandler()
+    db_manager.setup()
     db_manager.reset_database()
+    db_manager.close()
 
 
 if __name__ == "__main__":
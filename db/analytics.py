@@ -0,0 +1,391 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Rollup measurements kept up to date by continuous queries. Each level is
+# computed from the one below it, so InfluxDB never rescans raw events for
+# hourly or daily numbers. Confidence is stored as a sum so means stay exact
+# when rolled up further.
+EVENT_ROLLUPS = {
+    "1m": (
+        "events_1m",
+        'SELECT count("confidence") AS "count", sum("confidence") AS '
+        '"sum_confidence", max("confidence") AS "max_confidence" INTO '
+        '"events_1m" FROM "events" GROUP BY time(1m), "user_id", "event_type"',
+        "RESAMPLE FOR 5m",
+    ),
+    "1h": (
+        "events_1h",
+        'SELECT sum("count") AS "count", sum("sum_confidence") AS "sum_confidence", '
+        'max("max_confidence") AS "max_confidence" INTO "events_1h" '
+        'FROM "events_1m" GROUP BY time(1h), "user_id", "event_type"',
+        "RESAMPLE FOR 2h",
+    ),
+    "1d": (
+        "events_1d",
+        'SELECT sum("count") AS "count", sum("sum_confidence") AS "sum_confidence", '
+        'max("max_confidence") AS "max_confidence" INTO "events_1d" '
+        'FROM "events_1h" GROUP BY time(1d), "user_id", "event_type"',
+        "RESAMPLE FOR 2d",
+    ),
+}
+
+SOS_ROLLUPS = {
+    "1m": (
+        "sos_1m",
+        'SELECT count("latitude") AS "count" INTO "sos_1m" FROM "sos" '
+        'GROUP BY time(1m), "user_id"',
+        "RESAMPLE FOR 5m",
+    ),
+    "1h": (
+        "sos_1h",
+        'SELECT sum("count") AS "count" INTO "sos_1h" FROM "sos_1m" '
+        'GROUP BY time(1h), "user_id"',
+        "RESAMPLE FOR 2h",
+    ),
+    "1d": (
+        "sos_1d",
+        'SELECT sum("count") AS "count" INTO "sos_1d" FROM "sos_1h" '
+        'GROUP BY time(1d), "user_id"',
+        "RESAMPLE FOR 2d",
+    ),
+}
+
+ROLLUP_SECONDS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# The 1m continuous queries recompute the last 5 minutes on every run, so
+# points older than this when written are never rolled up by them; the
+# hours they fall in are backfilled instead (see LateWrites)
+ROLLUP_LATENESS = 180
+
+# Longest time range a single request may cover at each resolution
+MAX_RANGE_SECONDS = {"1m": 2 * 86400, "1h": 90 * 86400, "1d": 5 * 365 * 86400}
+
+
+def validate_range(resolution: str, start: float, end: float):
+    """Reject unknown resolutions and ranges too large to serve."""
+    if resolution not in MAX_RANGE_SECONDS:
+        raise ValueError(f"Resolution must be one of {list(MAX_RANGE_SECONDS)}")
+    if end <= start:
+        raise ValueError("'end' must be after 'start'")
+    if end - start > MAX_RANGE_SECONDS[resolution]:
+        raise ValueError(
+            f"Time range too large for {resolution} resolution, use a coarser one"
+        )
+
+
+class LateWrites:
+    """Hours that received points too old for the continuous queries.
+
+    Filled by the storage handler as events with client timestamps are
+    written (edge devices replaying their spool after an outage) and drained
+    by EventAnalytics.backfill_late. An hour is only handed out once no
+    late point arrived for ``settle`` seconds, so buffered points have been
+    flushed by the time it is recomputed.
+    """
+
+    def __init__(self, lateness: float = ROLLUP_LATENESS):
+        self.lateness = lateness
+        # hour start (epoch s) -> monotonic time of the last late point
+        self._hours = {}
+        self._lock = threading.Lock()
+
+        self.late_points = 0
+
+    def record(self, timestamps_ns):
+        cutoff = time.time_ns() - int(self.lateness * 1e9)
+        hours = [
+            timestamp // 10**9 // 3600 * 3600
+            for timestamp in timestamps_ns
+            if timestamp is not None and timestamp < cutoff
+        ]
+        if not hours:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for hour in hours:
+                self._hours[hour] = now
+            self.late_points += len(hours)
+
+    def pop_ranges(self, settle: float) -> list:
+        """Settled hours as merged (start, end) ranges in epoch seconds."""
+        cutoff = time.monotonic() - settle
+        with self._lock:
+            hours = sorted(hour for hour, at in self._hours.items() if at <= cutoff)
+            for hour in hours:
+                del self._hours[hour]
+        ranges = []
+        for hour in hours:
+            if ranges and ranges[-1][1] == hour:
+                ranges[-1][1] = hour + 3600
+            else:
+                ranges.append([hour, hour + 3600])
+        return [tuple(bounds) for bounds in ranges]
+
+    def restore(self, ranges: list):
+        """Put back ranges whose backfill failed, to be retried."""
+        now = time.monotonic()
+        with self._lock:
+            for start, end in ranges:
+                for hour in range(int(start), int(end), 3600):
+                    self._hours.setdefault(hour, now)
+
+    def stats(self) -> dict:
+        return {"pending_hours": len(self._hours), "late_points": self.late_points}
+
+
+class ResponseCache:
+    """Bounded TTL cache for rollup query results."""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "capacity": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class EventAnalytics:
+    """Read side over the events/sos rollups maintained by continuous queries."""
+
+    def __init__(self, db_handler, cache_ttl: float = 30.0, cache_size: int = 1024):
+        self.db_handler = db_handler
+        self.client = db_handler.client
+        self.cache = ResponseCache(ttl=cache_ttl, max_size=cache_size)
+
+    def ensure_rollups(self):
+        """Create the rollup continuous queries if they do not exist yet."""
+        database = self.db_handler.database
+        existing = self._existing_continuous_queries(database)
+
+        for rollups in (EVENT_ROLLUPS, SOS_ROLLUPS):
+            for measurement, select, resample in rollups.values():
+                name = f"cq_{measurement}"
+                if name in existing:
+                    continue
+                self.client.query(
+                    f'CREATE CONTINUOUS QUERY "{name}" ON "{database}" '
+                    f"{resample} BEGIN {select} END"
+                )
+                logger.info("Created continuous query %s", name)
+
+    def backfill(self, start: float, end: float):
+        """Recompute rollups for [start, end), e.g. after importing history."""
+        for rollups in (EVENT_ROLLUPS, SOS_ROLLUPS):
+            # Lower levels first, since each level reads the one below
+            for resolution, (measurement, select, _) in rollups.items():
+                # Whole buckets only: a partial range would overwrite a
+                # bucket with the total of just that part
+                step = ROLLUP_SECONDS[resolution]
+                level_start = math.floor(start / step) * step
+                level_end = math.ceil(end / step) * step
+                into, group_by = select.split(" GROUP BY ")
+                self.client.query(
+                    f"{into} WHERE time >= {level_start * 10**9} "
+                    f"AND time < {level_end * 10**9} GROUP BY {group_by}"
+                )
+        self.cache.clear()
+
+    def backfill_late(self, settle: float = 60.0) -> int:
+        """Backfill the hours that received late points; returns the ranges done."""
+        late_writes = getattr(self.db_handler, "late_writes", None)
+        if late_writes is None:
+            return 0
+        ranges = late_writes.pop_ranges(settle)
+        for index, (start, end) in enumerate(ranges):
+            try:
+                self.backfill(start, end)
+            except Exception:
+                late_writes.restore(ranges[index:])
+                raise
+            logger.info("Backfilled rollups for %d..%d after late writes", start, end)
+        return len(ranges)
+
+    def event_stats(
+        self,
+        resolution: str,
+        start: float,
+        end: float,
+        user_id: str = None,
+        event_type: str = None,
+    ) -> list:
+        """Per-bucket event counts and confidence for the time range."""
+        measurement = self._measurement(EVENT_ROLLUPS, resolution, start, end)
+        query = (
+            f'SELECT sum("count") AS "count", '
+            f'sum("sum_confidence") / sum("count") AS "mean_confidence", '
+            f'max("max_confidence") AS "max_confidence" FROM "{measurement}"'
+        )
+        return self._cached_query(
+            query, resolution, start, end, user_id=user_id, event_type=event_type
+        )
+
+    def event_type_totals(self, start: float, end: float, user_id: str = None):
+        """Total events per event_type over the range.
+
+        The whole days, hours and minutes the continuous queries have already
+        rolled up are read from the coarsest rollup covering them; unaligned
+        edges and the recent tail are counted from raw events. The statements
+        go to InfluxDB as one request and add up to a count of the raw points.
+        """
+        validate_range("1d", start, end)
+        start, end = self._snap(start, end)
+        params = {"user_id": user_id} if user_id else {}
+        statements = []
+        for measurement, value, segment_start, segment_end in self._segments(
+            start, end, list(ROLLUP_SECONDS)[::-1], time.time()
+        ):
+            conditions = [
+                f"time >= {segment_start * 10**9}",
+                f"time < {segment_end * 10**9}",
+            ]
+            if user_id:
+                conditions.append('"user_id" = $user_id')
+            statements.append(
+                f'SELECT {value} AS "count" FROM "{measurement}" '
+                f"WHERE {' AND '.join(conditions)} GROUP BY \"event_type\""
+            )
+        query = "; ".join(statements)
+
+        key = (query, tuple(sorted(params.items())))
+        totals = self.cache.get(key)
+        if totals is not None:
+            return totals
+        results = self.client.query(query, bind_params=params, epoch="s")
+        totals = {}
+        for result in results if isinstance(results, list) else [results]:
+            for (_, tags), points in result.items():
+                for point in points:
+                    event_type = tags["event_type"]
+                    totals[event_type] = totals.get(event_type, 0) + point["count"]
+        self.cache.put(key, totals)
+        return totals
+
+    def _segments(self, start, end, resolutions, now):
+        """Split [start, end) into rollup-covered parts and raw remainders."""
+        if not resolutions:
+            return (
+                [("events", 'count("confidence")', start, end)] if start < end else []
+            )
+        resolution, finer = resolutions[0], resolutions[1:]
+        step = ROLLUP_SECONDS[resolution]
+        # The newest closed bucket may not be written yet by its query
+        rolled_up = (math.floor(now / step) - 1) * step
+        aligned_start = math.ceil(start / step) * step
+        aligned_end = min(math.floor(end / step) * step, rolled_up)
+        if aligned_start >= aligned_end:
+            return self._segments(start, end, finer, now)
+        return (
+            self._segments(start, aligned_start, finer, now)
+            + [
+                (
+                    EVENT_ROLLUPS[resolution][0],
+                    'sum("count")',
+                    aligned_start,
+                    aligned_end,
+                )
+            ]
+            + self._segments(aligned_end, end, finer, now)
+        )
+
+    def sos_stats(self, resolution: str, start: float, end: float, user_id=None):
+        """Per-bucket SOS counts for the time range."""
+        measurement = self._measurement(SOS_ROLLUPS, resolution, start, end)
+        query = f'SELECT sum("count") AS "count" FROM "{measurement}"'
+        return self._cached_query(query, resolution, start, end, user_id=user_id)
+
+    def _measurement(self, rollups, resolution, start, end):
+        validate_range(resolution, start, end)
+        return rollups[resolution][0]
+
+    def _snap(self, start, end):
+        # Snap the range to the cache ttl so "up to now" requests made within
+        # the same window share one cache entry
+        step = max(int(self.cache.ttl), 1)
+        return math.floor(start / step) * step, math.ceil(end / step) * step
+
+    def _cached_query(
+        self,
+        query,
+        resolution,
+        start,
+        end,
+        user_id=None,
+        event_type=None,
+        group_by=None,
+    ):
+        start, end = self._snap(start, end)
+        conditions = [f"time >= {start * 10**9}", f"time < {end * 10**9}"]
+        params = {}
+        if user_id:
+            conditions.append('"user_id" = $user_id')
+            params["user_id"] = user_id
+        if event_type:
+            conditions.append('"event_type" = $event_type')
+            params["event_type"] = event_type
+
+        groups = [f"time({resolution})"] if resolution else []
+        if group_by:
+            groups.append(group_by)
+        query = f"{query} WHERE {' AND '.join(conditions)}"
+        if groups:
+            query += f" GROUP BY {', '.join(groups)}"
+        if resolution:
+            query += " fill(none)"
+
+        key = (query, tuple(sorted(params.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self.client.query(query, bind_params=params, epoch="s")
+        rows = []
+        for (_, tags), points in result.items():
+            for point in points:
+                rows.append({**(tags or {}), **point})
+        self.cache.put(key, rows)
+        return rows
+
+    def _existing_continuous_queries(self, database):
+        for entry in self.client.get_list_continuous_queries():
+            if database in entry:
+                return {cq["name"] for cq in entry[database]}
+        return set()
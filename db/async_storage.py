@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from influxdb.exceptions import InfluxDBClientError
+
+
+class StorageUnavailable(Exception):
+    """Raised when InfluxDB cannot be reached or the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling InfluxDB after repeated failures, then probes again.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds. The next call is let
+    through as the only probe: success closes the circuit, failure reopens
+    it. Shared by the routes and the write buffer thread, so it is locked.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.short_circuits = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now - self.opened_at < self.reset_timeout:
+                    self.short_circuits += 1
+                    return False
+                self.state = "half_open"
+                self.probe_at = now
+                return True
+            if self.state == "half_open":
+                # A probe that never reported back, e.g. rejected as bad
+                # input, is replaced after reset_timeout
+                if now - self.probe_at < self.reset_timeout:
+                    self.short_circuits += 1
+                    return False
+                self.probe_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "short_circuits": self.short_circuits,
+        }
+
+
+class AsyncStorage:
+    """Awaitable access to a StorageBackend for the FastAPI routes.
+
+    Blocking backend calls run on a dedicated pool sized to the InfluxDB
+    client's HTTP connection pool. Each call has a timeout and is retried
+    with exponential backoff; a call that timed out keeps its pool slot
+    until its thread returns, so hung requests cannot pile up behind the
+    pool. A circuit breaker fails fast while the database is down, and
+    writes fall back to the local write buffer instead of failing the
+    request.
+    """
+
+    def __init__(
+        self,
+        db_handler,
+        max_workers: int = 10,
+        timeout: float = 5.0,
+        retries: int = 3,
+        backoff: float = 0.1,
+        breaker: CircuitBreaker = None,
+    ):
+        self.db_handler = db_handler
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="influxdb"
+        )
+        # Calls running in the pool, including those that timed out
+        self._slots = asyncio.Semaphore(max_workers)
+        # The background writer holds its points while the circuit is open
+        write_buffer = getattr(db_handler, "write_buffer", None)
+        if write_buffer is not None:
+            write_buffer.breaker = self.breaker
+
+        self.calls = 0
+        self.failed_calls = 0
+        self.degraded_points = 0
+        self.unverified_sos = 0
+
+    async def call(self, fn, *args, **kwargs):
+        """Run a blocking storage call with timeout, retries and breaker."""
+        if not self.breaker.allow():
+            raise StorageUnavailable("InfluxDB unavailable, circuit open")
+
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                deadline = loop.time() + self.timeout
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+                future = loop.run_in_executor(
+                    self.executor, functools.partial(fn, *args, **kwargs)
+                )
+                future.add_done_callback(self._release)
+                # Shielded so a timeout leaves the slot held until the
+                # thread actually returns
+                result = await asyncio.wait_for(
+                    asyncio.shield(future), max(deadline - loop.time(), 0)
+                )
+            except (ValueError, InfluxDBClientError):
+                # Bad input or a rejected query, not a storage outage
+                raise
+            except Exception as e:
+                # Retries are part of one call, so they count as one failure
+                if attempt == self.retries or self.breaker.state == "open":
+                    self.breaker.record_failure()
+                    self.failed_calls += 1
+                    raise StorageUnavailable(f"InfluxDB request failed: {e}") from e
+                await asyncio.sleep(min(self.backoff * 2**attempt, 2.0))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _release(self, future):
+        self._slots.release()
+        if not future.cancelled():
+            # Retrieved so late failures of timed-out calls are not logged
+            future.exception()
+
+    async def write_event(
+        self, user_id: str, event_type: str, confidence: float
+    ) -> str:
+        """Validate and buffer a single event; never waits on InfluxDB."""
+        # Raises WriteBufferFull while the buffer holds points for an outage
+        return self.db_handler.write_event(user_id, event_type, confidence)
+
+    async def write_events(self, user_id: str, events: list) -> list:
+        """Validate and write a batch, buffering it locally if InfluxDB is down."""
+        batch, event_ids = await asyncio.to_thread(
+            self.db_handler.prepare_events, user_id, events
+        )
+        if not event_ids:
+            return event_ids
+
+        try:
+            await self.call(self.db_handler.commit_events, user_id, batch, event_ids)
+        except StorageUnavailable:
+            # Raises WriteBufferFull when the local buffer cannot take it either
+            self.db_handler.buffer_events(user_id, batch, event_ids)
+            self.degraded_points += len(event_ids)
+        return event_ids
+
+    async def write_sos(
+        self,
+        user_id: str,
+        event_id: str,
+        message: str,
+        latitude: float,
+        longitude: float,
+    ) -> str:
+        """Validate the referenced event, then buffer the SOS."""
+        try:
+            exists = await self.call(
+                self.db_handler.validate_event_exists, event_id, user_id
+            )
+        except StorageUnavailable:
+            # An SOS is never dropped because the event lookup is unavailable
+            exists = True
+            self.unverified_sos += 1
+        if not exists:
+            raise ValueError(f"Event {event_id} does not exist")
+
+        return self.db_handler.write_sos(
+            user_id, event_id, message, latitude, longitude, validate_event=False
+        )
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.stats(),
+            "calls": self.calls,
+            "failed_calls": self.failed_calls,
+            "degraded_points": self.degraded_points,
+            "unverified_sos": self.unverified_sos,
+        }
+
+    async def close(self):
+        """Drain the write buffer and release the pool."""
+        await asyncio.to_thread(self.db_handler.close)
+        self.executor.shutdown(wait=True)
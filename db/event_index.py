@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecentEventIndex:
+    """Bounded LRU/TTL map of recently written event ids to their user.
+
+    Filled when an event is accepted (before it is flushed to InfluxDB), so
+    SOS validation for recent events never has to query the database and
+    never misses an event that is still sitting in the write buffer.
+    """
+
+    def __init__(self, max_size: int = 100000, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, event_id: str, user_id: str):
+        with self._lock:
+            self._entries[event_id] = (user_id, time.monotonic())
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add_many(self, event_ids: list, user_id: str):
+        for event_id in event_ids:
+            self.add(event_id, user_id)
+
+    def contains(self, event_id: str, user_id: str = None) -> bool:
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[event_id]
+                entry = None
+            if entry is None or (user_id and entry[0] != user_id):
+                self.misses += 1
+                return False
+            self._entries.move_to_end(event_id)
+            self.hits += 1
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "capacity": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,437 @@
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+EARTH_RADIUS_M = 6371008.8
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude: float, longitude: float, precision: int) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple:
+    """(latitude, longitude) extent in degrees of a geohash cell."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def cell_bounds(key: str) -> tuple:
+    """(south, west, north, east) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in key:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            interval[0 if value >> shift & 1 else 1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _insort(items: deque, item: tuple):
+    """Insert into a deque sorted by item[0], after items with the same key."""
+    if not items or items[-1][0] <= item[0]:
+        # SOS mostly arrive in time order
+        items.append(item)
+        return
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high) // 2
+        if items[middle][0] <= item[0]:
+            low = middle + 1
+        else:
+            high = middle
+    items.insert(low, item)
+
+
+def validate_box(south: float, west: float, north: float, east: float):
+    if not -90 <= south <= north <= 90:
+        raise ValueError("Latitudes must satisfy -90 <= south <= north <= 90")
+    if not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("Longitudes must be between -180 and 180")
+
+
+class SOSGeoIndex:
+    """In-memory spatial index of recent SOS locations.
+
+    SOS are bucketed by geohash cell of ``precision`` characters (5 is about
+    5 x 5 km), and those cells are grouped under coarser cells two
+    characters shorter. A radius or viewport query only visits the occupied
+    cells it overlaps instead of scanning every SOS, and clusters of whole
+    cells come from running totals without touching the points. Entries
+    older than ``window`` seconds, or beyond ``max_size``, are evicted oldest
+    first. Filled as SOS are stored and rebuilt from the database at startup.
+    """
+
+    def __init__(
+        self, precision: int = 5, window: float = 7 * 86400, max_size: int = 1000000
+    ):
+        if not 3 <= precision <= 12:
+            raise ValueError("Index precision must be between 3 and 12")
+        self.precision = precision
+        self.coarse_precision = precision - 2
+        self.window = window
+        self.max_size = max_size
+        # geohash -> deque of (time_ns, latitude, longitude, record), by time
+        self._buckets = {}
+        # coarse geohash -> set of its occupied geohashes, and its bounds
+        self._children = {}
+        self._bounds = {}
+        # geohash or coarse geohash -> [count, latitude sum, longitude sum,
+        # latest time_ns]
+        self._totals = {}
+        # (time_ns, geohash, entry) sorted by time, also for SOS replayed
+        # late from an edge spool, for eviction and newest-first walks
+        self._order = deque()
+        self._lock = threading.Lock()
+
+        self.added = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.queries = 0
+
+    def add(self, record: dict):
+        """Index an SOS record with user_id, latitude, longitude and more.
+
+        The record's "time" (epoch ns) defaults to now; records that cannot
+        be placed on the map are skipped.
+        """
+        try:
+            latitude = float(record["latitude"])
+            longitude = float(record["longitude"])
+        except (KeyError, TypeError, ValueError):
+            latitude = longitude = math.nan
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            self.rejected += 1
+            return
+
+        timestamp = int(record.get("time") or time.time_ns())
+        record = {
+            **record,
+            "time": timestamp,
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+        key = geohash(latitude, longitude, self.precision)
+        parent = key[: self.coarse_precision]
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = deque()
+                if parent not in self._children:
+                    self._children[parent] = set()
+                    self._bounds[parent] = cell_bounds(parent)
+                self._children[parent].add(key)
+            entry = (timestamp, latitude, longitude, record)
+            _insort(bucket, entry)
+            _insort(self._order, (timestamp, key, entry))
+            self._count(key, latitude, longitude, timestamp, 1)
+            self._count(parent, latitude, longitude, timestamp, 1)
+            self.added += 1
+            self._evict()
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def within_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float,
+        limit: int = 100,
+        since: float = None,
+        user_id: str = None,
+    ) -> list:
+        """SOS within ``radius_m`` of a point, nearest first, with distance_m."""
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(
+                "Point must have -90 <= latitude <= 90, -180 <= longitude <= 180"
+            )
+        if radius_m <= 0:
+            raise ValueError("'radius' must be positive")
+
+        # Bounding box of the circle; longitude degrees shrink with latitude
+        span_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+        south, north = max(latitude - span_lat, -90.0), min(latitude + span_lat, 90.0)
+        cos_lat = min(math.cos(math.radians(south)), math.cos(math.radians(north)))
+        if cos_lat <= 0 or span_lat / cos_lat >= 180:
+            west, east = -180.0, 180.0
+        else:
+            span_lon = span_lat / cos_lat
+            west = (longitude - span_lon + 540) % 360 - 180
+            east = (longitude + span_lon + 540) % 360 - 180
+
+        matches = []
+        for entry in self._entries(south, west, north, east, since, user_id):
+            distance = distance_m(latitude, longitude, entry[1], entry[2])
+            if distance <= radius_m:
+                matches.append((distance, entry[3]))
+        nearest = heapq.nsmallest(limit, matches, key=lambda match: match[0])
+        return [{**record, "distance_m": round(d, 1)} for d, record in nearest]
+
+    def within_box(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        limit: int = 1000,
+        since: float = None,
+        user_id: str = None,
+    ) -> list:
+        """SOS inside a viewport, newest first. ``west > east`` crosses 180."""
+        validate_box(south, west, north, east)
+        since_ns = self._since_ns(since)
+        boxes = self._split(west, east)
+        with self._lock:
+            self.queries += 1
+            self._evict()
+            covering = [
+                (box, parent)
+                for box in boxes
+                for parent, _ in self._covering(south, box[0], north, box[1])
+            ]
+            candidates = sum(self._totals[parent][0] for _, parent in covering)
+            if limit * len(self._order) < candidates**2:
+                # Most SOS are in view: walking back from the newest finds
+                # ``limit`` of them sooner than reading every overlapped cell
+                entries = []
+                for _, _, entry in reversed(self._order):
+                    if (
+                        south <= entry[1] <= north
+                        and any(box[0] <= entry[2] <= box[1] for box in boxes)
+                        and entry[0] >= since_ns
+                        and (user_id is None or entry[3].get("user_id") == user_id)
+                    ):
+                        entries.append(entry)
+                        if len(entries) == limit:
+                            break
+            else:
+                entries = [
+                    entry
+                    for box, parent in covering
+                    for key in self._children[parent]
+                    for entry in self._filter(
+                        key, south, box[0], north, box[1], since_ns, user_id
+                    )
+                ]
+        newest = heapq.nlargest(limit, entries, key=lambda entry: entry[0])
+        return [entry[3] for entry in newest]
+
+    def clusters(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        precision: int = 3,
+        since: float = None,
+        user_id: str = None,
+    ) -> list:
+        """Per-geohash-cell SOS counts and centroids inside a viewport."""
+        validate_box(south, west, north, east)
+        if not 1 <= precision <= 12:
+            raise ValueError("'precision' must be between 1 and 12")
+
+        cells = {}
+
+        def merge(key, count, lat_sum, lon_sum, latest):
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [count, lat_sum, lon_sum, latest]
+                return
+            cell[0] += count
+            cell[1] += lat_sum
+            cell[2] += lon_sum
+            cell[3] = max(cell[3], latest)
+
+        # Running totals hold every indexed SOS, so filters need the points
+        use_totals = since is None and user_id is None and precision <= self.precision
+        since_ns = self._since_ns(since)
+        with self._lock:
+            self.queries += 1
+            self._evict()
+            for box_west, box_east in self._split(west, east):
+                for parent, inside in self._covering(south, box_west, north, box_east):
+                    if inside and use_totals and precision <= self.coarse_precision:
+                        merge(parent[:precision], *self._totals[parent])
+                        continue
+                    for key in self._children[parent]:
+                        if inside and use_totals:
+                            merge(key[:precision], *self._totals[key])
+                            continue
+                        for entry in self._filter(
+                            key, south, box_west, north, box_east, since_ns, user_id
+                        ):
+                            cell = (
+                                key[:precision]
+                                if precision <= self.precision
+                                else geohash(entry[1], entry[2], precision)
+                            )
+                            merge(cell, 1, entry[1], entry[2], entry[0])
+        return [
+            {
+                "geohash": key,
+                "count": count,
+                "latitude": lat_sum / count,
+                "longitude": lon_sum / count,
+                "latest": latest,
+            }
+            for key, (count, lat_sum, lon_sum, latest) in sorted(
+                cells.items(), key=lambda item: -item[1][0]
+            )
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._order),
+            "capacity": self.max_size,
+            "cells": len(self._buckets),
+            "precision": self.precision,
+            "added": self.added,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "queries": self.queries,
+        }
+
+    def _count(self, key, latitude, longitude, timestamp, sign):
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._totals[key] = [0, 0.0, 0.0, 0]
+        totals[0] += sign
+        totals[1] += sign * latitude
+        totals[2] += sign * longitude
+        if sign > 0:
+            totals[3] = max(totals[3], timestamp)
+        elif not totals[0]:
+            del self._totals[key]
+
+    def _evict(self):
+        cutoff = time.time_ns() - int(self.window * 1e9)
+        order = self._order
+        while order and (order[0][0] < cutoff or len(order) > self.max_size):
+            _, key, _ = order.popleft()
+            # Buckets are sorted by time too, so the oldest entry is leftmost
+            bucket = self._buckets[key]
+            timestamp, latitude, longitude, _ = bucket.popleft()
+            parent = key[: self.coarse_precision]
+            self._count(key, latitude, longitude, timestamp, -1)
+            self._count(parent, latitude, longitude, timestamp, -1)
+            if not bucket:
+                del self._buckets[key]
+                self._children[parent].discard(key)
+                if not self._children[parent]:
+                    del self._children[parent]
+                    del self._bounds[parent]
+            self.evicted += 1
+
+    def _since_ns(self, since: float) -> int:
+        # Entries past the window are only evicted on the next write or query
+        cutoff = time.time_ns() - int(self.window * 1e9)
+        return max(int(since * 1e9) if since else 0, cutoff)
+
+    @staticmethod
+    def _split(west, east) -> list:
+        # A viewport crossing the antimeridian is two boxes
+        return [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+
+    def _entries(self, south, west, north, east, since, user_id) -> list:
+        """Entries inside the box, read from the cells overlapping it."""
+        since_ns = self._since_ns(since)
+        entries = []
+        with self._lock:
+            self.queries += 1
+            self._evict()
+            for box_west, box_east in self._split(west, east):
+                for parent, _ in self._covering(south, box_west, north, box_east):
+                    for key in self._children[parent]:
+                        entries.extend(
+                            self._filter(
+                                key, south, box_west, north, box_east, since_ns, user_id
+                            )
+                        )
+        return entries
+
+    def _filter(self, key, south, west, north, east, since_ns, user_id):
+        return (
+            entry
+            for entry in self._buckets[key]
+            if south <= entry[1] <= north
+            and west <= entry[2] <= east
+            and entry[0] >= since_ns
+            and (user_id is None or entry[3].get("user_id") == user_id)
+        )
+
+    def _covering(self, south, west, north, east):
+        """Occupied coarse cells overlapping the box, and whether inside it."""
+        cell_lat, cell_lon = cell_size(self.coarse_precision)
+        rows = range(
+            int((south + 90) // cell_lat),
+            min(int((north + 90) // cell_lat), round(180 / cell_lat) - 1) + 1,
+        )
+        columns = range(
+            int((west + 180) // cell_lon),
+            min(int((east + 180) // cell_lon), round(360 / cell_lon) - 1) + 1,
+        )
+        if len(rows) * len(columns) > len(self._children):
+            # Fewer occupied cells than overlapped ones: check those instead
+            keys = list(self._children)
+        else:
+            keys = [
+                geohash(
+                    -90 + (row + 0.5) * cell_lat,
+                    -180 + (column + 0.5) * cell_lon,
+                    self.coarse_precision,
+                )
+                for row in rows
+                for column in columns
+            ]
+        for key in keys:
+            if key not in self._children:
+                continue
+            cell_south, cell_west, cell_north, cell_east = self._bounds[key]
+            if (
+                cell_south > north
+                or cell_north < south
+                or cell_west > east
+                or cell_east < west
+            ):
+                continue
+            yield key, (
+                south <= cell_south
+                and cell_north <= north
+                and west <= cell_west
+                and cell_east <= east
+            )
@@ -0,0 +1,390 @@
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from db.analytics import validate_range
+from db.event_index import RecentEventIndex
+from db.storage import history_page, history_query, parse_events, parse_location
+
+RESOLUTION_SECONDS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+
+class _Columns:
+    """Append-only numpy columns that double their capacity when full."""
+
+    def __init__(self, dtypes: dict, capacity: int = 4096):
+        self.size = 0
+        self._arrays = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()
+        }
+
+    def extend(self, **values):
+        count = len(next(iter(values.values())))
+        needed = self.size + count
+        capacity = len(next(iter(self._arrays.values())))
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[: self.size] = array[: self.size]
+                self._arrays[name] = grown
+        for name, column in values.items():
+            self._arrays[name][self.size : needed] = column
+        self.size = needed
+
+    def snapshot(self) -> dict:
+        # Slices stay valid after later appends: growth allocates new arrays
+        # and appends only write past the current size
+        return {name: array[: self.size] for name, array in self._arrays.items()}
+
+
+class _Codes:
+    """Dictionary encoding for low-cardinality strings such as user ids."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class MemoryStorage:
+    """In-process, column-oriented storage backend for load tests.
+
+    Events and SOS messages are kept in numpy columns with user ids and
+    event types dictionary-encoded, so /stats aggregations are vectorized
+    scans instead of rollup queries. A coalesced event counts ``count``
+    times, as the rollups would. Nothing is persisted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = _Codes()
+        self._event_types = _Codes()
+        self._events = _Columns(
+            {
+                "time": np.int64,
+                "user": np.int32,
+                "event_type": np.int32,
+                "confidence": np.float64,
+                "count": np.int64,
+                "max_confidence": np.float64,
+            }
+        )
+        self._sos = _Columns(
+            {
+                "time": np.int64,
+                "user": np.int32,
+                "latitude": np.float64,
+                "longitude": np.float64,
+            }
+        )
+        # Recent event owners, including events stored by other workers
+        self.event_index = RecentEventIndex(
+            max_size=int(os.getenv("EVENT_INDEX_SIZE", 100000)),
+            ttl=float(os.getenv("EVENT_INDEX_TTL", 3600)),
+        )
+        # Row-aligned with the event columns, for history queries
+        self._event_ids = []
+        self._sos_details = []
+        self._profiles = {}
+
+    def setup(self):
+        pass
+
+    def validate_user_exists(self, user_id: str) -> bool:
+        return True
+
+    def validate_event_exists(self, event_id: str, user_id: str = None) -> bool:
+        if self.event_index.contains(event_id, user_id):
+            return True
+        # Older events are still in the columns, found by a linear scan
+        with self._lock:
+            try:
+                row = self._event_ids.index(event_id)
+            except ValueError:
+                return False
+            owner = self._events.snapshot()["user"][row]
+        return user_id is None or owner == self._users.codes.get(user_id)
+
+    def write_event(self, user_id: str, event_type: str, confidence: float) -> str:
+        batch, event_ids = self.prepare_events(
+            user_id, [{"event_type": event_type, "confidence": confidence}]
+        )
+        self.commit_events(user_id, batch, event_ids)
+        return event_ids[0]
+
+    def write_events(self, user_id: str, events: list) -> list:
+        batch, event_ids = self.prepare_events(user_id, events)
+        self.commit_events(user_id, batch, event_ids)
+        return event_ids
+
+    def prepare_events(self, user_id: str, events: list) -> tuple:
+        parsed = parse_events(events)
+        return parsed, [str(uuid.uuid4()) for _ in parsed]
+
+    def commit_events(self, user_id: str, parsed: list, event_ids: list):
+        if not parsed:
+            return
+        now = time.time_ns()
+        with self._lock:
+            user = self._users.encode(user_id)
+            self._events.extend(
+                time=[event["timestamp_ns"] or now for event in parsed],
+                user=[user] * len(parsed),
+                event_type=[
+                    self._event_types.encode(event["event_type"]) for event in parsed
+                ],
+                confidence=[event["confidence"] for event in parsed],
+                count=[event["count"] or 1 for event in parsed],
+                max_confidence=[
+                    (
+                        event["confidence"]
+                        if event["max_confidence"] is None
+                        else event["max_confidence"]
+                    )
+                    for event in parsed
+                ],
+            )
+            self._event_ids.extend(event_ids)
+        self.event_index.add_many(event_ids, user_id)
+
+    # Writes are already in memory, so there is nothing to fall back to
+    buffer_events = commit_events
+
+    def remember_event(self, event_id: str, user_id: str):
+        # Only the owner: the event itself lives in the other worker's memory
+        self.event_index.add(event_id, user_id)
+
+    def write_sos(
+        self,
+        user_id: str,
+        event_id: str,
+        message: str,
+        latitude: float,
+        longitude: float,
+        validate_event: bool = True,
+    ) -> str:
+        latitude, longitude = parse_location(latitude, longitude)
+        if validate_event and not self.validate_event_exists(event_id, user_id):
+            raise ValueError(f"Event {event_id} does not exist")
+
+        sos_id = str(uuid.uuid4())
+        with self._lock:
+            self._sos.extend(
+                time=[time.time_ns()],
+                user=[self._users.encode(user_id)],
+                latitude=[latitude],
+                longitude=[longitude],
+            )
+            self._sos_details.append((sos_id, event_id, message))
+        return sos_id
+
+    def write_user(self, user: dict):
+        self._profiles[user["user_id"]] = {
+            "name": user["name"],
+            "email": user["email"],
+            "phone": user["phone"],
+        }
+
+    def legacy_users(self) -> list:
+        return []
+
+    def ensure_rollups(self):
+        pass
+
+    def backfill_late(self, settle: float = 60.0) -> int:
+        # Aggregates are computed from the raw columns, nothing to backfill
+        return 0
+
+    def event_stats(
+        self,
+        resolution: str,
+        start: float,
+        end: float,
+        user_id: str = None,
+        event_type: str = None,
+    ) -> list:
+        """Per-bucket event counts and confidence for the time range."""
+        validate_range(resolution, start, end)
+        with self._lock:
+            columns = self._events.snapshot()
+            type_code = self._event_types.codes.get(event_type, -1)
+        mask = self._select(columns, start, end, user_id)
+        if event_type:
+            mask &= columns["event_type"] == type_code
+
+        buckets, inverse = self._buckets(columns["time"][mask], resolution)
+        # A coalesced record's confidence is the mean over its count
+        weights = columns["count"][mask]
+        counts = np.bincount(inverse, weights=weights, minlength=len(buckets))
+        sums = np.bincount(
+            inverse,
+            weights=columns["confidence"][mask] * weights,
+            minlength=len(buckets),
+        )
+        maxima = np.full(len(buckets), -np.inf)
+        np.maximum.at(maxima, inverse, columns["max_confidence"][mask])
+        return [
+            {
+                "time": int(bucket),
+                "count": int(count),
+                "mean_confidence": float(total / count),
+                "max_confidence": float(maximum),
+            }
+            for bucket, count, total, maximum in zip(buckets, counts, sums, maxima)
+        ]
+
+    def event_type_totals(self, start: float, end: float, user_id: str = None):
+        """Total events per event_type over the range."""
+        validate_range("1d", start, end)
+        with self._lock:
+            columns = self._events.snapshot()
+            names = list(self._event_types.values)
+        mask = self._select(columns, start, end, user_id)
+        totals = np.bincount(
+            columns["event_type"][mask],
+            weights=columns["count"][mask],
+            minlength=len(names),
+        )
+        return {name: int(total) for name, total in zip(names, totals) if total}
+
+    def sos_stats(self, resolution: str, start: float, end: float, user_id=None):
+        """Per-bucket SOS counts for the time range."""
+        validate_range(resolution, start, end)
+        with self._lock:
+            columns = self._sos.snapshot()
+        mask = self._select(columns, start, end, user_id)
+        buckets, inverse = self._buckets(columns["time"][mask], resolution)
+        counts = np.bincount(inverse, minlength=len(buckets))
+        return [
+            {"time": int(bucket), "count": int(count)}
+            for bucket, count in zip(buckets, counts)
+        ]
+
+    def event_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields=None,
+    ) -> tuple:
+        """One page of a user's events in [start, end), oldest first."""
+        fields, start_ns, end_ns, skip = history_query(
+            "events", start, end, cursor, limit, fields
+        )
+        with self._lock:
+            columns = self._events.snapshot()
+            names = list(self._event_types.values)
+            event_ids = self._event_ids
+        rows = self._history_rows(columns, user_id, start_ns, end_ns, limit + skip)
+        values = {
+            "event_type": lambda row: names[columns["event_type"][row]],
+            "confidence": lambda row: float(columns["confidence"][row]),
+            "event_id": lambda row: event_ids[row],
+            "count": lambda row: int(columns["count"][row]),
+            "max_confidence": lambda row: float(columns["max_confidence"][row]),
+        }
+        return history_page(self._project(columns, rows, values, fields), skip, limit)
+
+    def sos_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields=None,
+    ) -> tuple:
+        """One page of a user's SOS messages in [start, end), oldest first."""
+        fields, start_ns, end_ns, skip = history_query(
+            "sos", start, end, cursor, limit, fields
+        )
+        with self._lock:
+            columns = self._sos.snapshot()
+            details = self._sos_details
+        rows = self._history_rows(columns, user_id, start_ns, end_ns, limit + skip)
+        values = {
+            "sos_id": lambda row: details[row][0],
+            "event_id": lambda row: details[row][1],
+            "message": lambda row: details[row][2],
+            "latitude": lambda row: float(columns["latitude"][row]),
+            "longitude": lambda row: float(columns["longitude"][row]),
+        }
+        return history_page(self._project(columns, rows, values, fields), skip, limit)
+
+    def recent_sos(self, start: float, end: float) -> list:
+        """Every user's SOS in [start, end), oldest first."""
+        with self._lock:
+            columns = self._sos.snapshot()
+            users = list(self._users.values)
+            details = self._sos_details
+        times = columns["time"]
+        rows = np.flatnonzero((times >= int(start * 1e9)) & (times < int(end * 1e9)))
+        return [
+            {
+                "time": int(times[row]),
+                "user_id": users[columns["user"][row]],
+                "sos_id": details[row][0],
+                "event_id": details[row][1],
+                "message": details[row][2],
+                "latitude": float(columns["latitude"][row]),
+                "longitude": float(columns["longitude"][row]),
+            }
+            for row in rows[np.argsort(times[rows], kind="stable")]
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "events": self._events.size,
+            "sos": self._sos.size,
+            "users": len(self._users.values),
+            "event_types": len(self._event_types.values),
+            "event_index": self.event_index.stats(),
+        }
+
+    def close(self):
+        pass
+
+    def _select(self, columns, start, end, user_id):
+        times = columns["time"]
+        mask = (times >= int(start * 1e9)) & (times < int(end * 1e9))
+        if user_id:
+            mask &= columns["user"] == self._users.codes.get(user_id, -1)
+        return mask
+
+    def _history_rows(self, columns, user_id, start_ns, end_ns, count):
+        """Indices of a user's first ``count`` rows in the range by time."""
+        times = columns["time"]
+        mask = (times >= start_ns) & (times < end_ns)
+        mask &= columns["user"] == self._users.codes.get(user_id, -1)
+        rows = np.flatnonzero(mask)
+        # Client timestamps can arrive out of order; stable keeps ties in
+        # insertion order so cursors resume at the same row
+        order = np.argsort(times[rows], kind="stable")[:count]
+        return rows[order]
+
+    @staticmethod
+    def _project(columns, rows, values, fields) -> list:
+        return [
+            {
+                "time": int(columns["time"][row]),
+                **{field: values[field](row) for field in fields if field in values},
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _buckets(times, resolution):
+        step = RESOLUTION_SECONDS[resolution]
+        buckets, inverse = np.unique(times // 10**9 // step, return_inverse=True)
+        return buckets * step, inverse.reshape(-1)
@@ -0,0 +1,247 @@
+import math
+import os
+from typing import Iterable, Optional, Protocol, Sequence, Tuple
+
+
+class StorageBackend(Protocol):
+    """What the API needs from a database: events, SOS messages and users.
+
+    Event batches are written in two steps so a caller can fall back to
+    buffer_events() when commit_events() cannot reach the database;
+    ``batch`` is whatever prepare_events() returned.
+    """
+
+    def setup(self) -> None: ...
+
+    def validate_user_exists(self, user_id: str) -> bool: ...
+
+    def validate_event_exists(self, event_id: str, user_id: str = None) -> bool: ...
+
+    def write_event(self, user_id: str, event_type: str, confidence: float) -> str: ...
+
+    def write_events(self, user_id: str, events: list) -> list: ...
+
+    def prepare_events(self, user_id: str, events: list) -> Tuple[object, list]: ...
+
+    def commit_events(self, user_id: str, batch, event_ids: list) -> None: ...
+
+    def buffer_events(self, user_id: str, batch, event_ids: list) -> None: ...
+
+    def remember_event(self, event_id: str, user_id: str) -> None: ...
+
+    def write_sos(
+        self,
+        user_id: str,
+        event_id: str,
+        message: str,
+        latitude: float,
+        longitude: float,
+        validate_event: bool = True,
+    ) -> str: ...
+
+    def write_user(self, user: dict) -> None: ...
+
+    def legacy_users(self) -> Iterable[dict]: ...
+
+    def event_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields: Sequence[str] = None,
+    ) -> Tuple[list, Optional[str]]: ...
+
+    def sos_history(
+        self,
+        user_id: str,
+        start: float,
+        end: float,
+        cursor: str = None,
+        limit: int = 500,
+        fields: Sequence[str] = None,
+    ) -> Tuple[list, Optional[str]]: ...
+
+    def recent_sos(self, start: float, end: float) -> Iterable[dict]: ...
+
+    def close(self) -> None: ...
+
+
+class RollupStore(Protocol):
+    """Aggregated reads behind the /stats routes."""
+
+    def ensure_rollups(self) -> None: ...
+
+    def backfill_late(self, settle: float = 60.0) -> int: ...
+
+    def event_stats(
+        self,
+        resolution: str,
+        start: float,
+        end: float,
+        user_id: str = None,
+        event_type: str = None,
+    ) -> list: ...
+
+    def event_type_totals(
+        self, start: float, end: float, user_id: str = None
+    ) -> dict: ...
+
+    def sos_stats(
+        self, resolution: str, start: float, end: float, user_id: str = None
+    ) -> list: ...
+
+
+def _is_finite(value) -> bool:
+    # NaN and infinity are valid JSON for Python but not line protocol
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def parse_location(latitude, longitude) -> Tuple[float, float]:
+    """Validate SOS coordinates, raising ValueError when off the map.
+
+    Numeric strings are accepted, as the SOS route always took them.
+    """
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("'latitude' and 'longitude' must be numbers")
+    if not (math.isfinite(latitude) and -90 <= latitude <= 90):
+        raise ValueError("'latitude' must be a number between -90 and 90")
+    if not (math.isfinite(longitude) and -180 <= longitude <= 180):
+        raise ValueError("'longitude' must be a number between -180 and 180")
+    return latitude, longitude
+
+
+def parse_events(events: list) -> list:
+    """Validate a batch of event objects, raising ValueError listing problems."""
+    errors = []
+    parsed = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            errors.append(f"[{index}] event must be an object")
+            continue
+        event_type = event.get("event_type")
+        confidence = event.get("confidence", 0.0)
+        timestamp = event.get("timestamp")
+        count = event.get("count")
+        max_confidence = event.get("max_confidence")
+        if not isinstance(event_type, str) or not event_type:
+            errors.append(f"[{index}] missing 'event_type'")
+        if not _is_finite(confidence):
+            errors.append(f"[{index}] 'confidence' must be a number")
+        if timestamp is not None and not _is_finite(timestamp):
+            errors.append(f"[{index}] 'timestamp' must be epoch seconds")
+        if count is not None and (
+            isinstance(count, bool) or not isinstance(count, int) or count < 1
+        ):
+            errors.append(f"[{index}] 'count' must be a positive integer")
+        if max_confidence is not None and not _is_finite(max_confidence):
+            errors.append(f"[{index}] 'max_confidence' must be a number")
+        if errors:
+            continue
+
+        parsed.append(
+            {
+                "event_type": event_type,
+                "confidence": float(confidence),
+                "timestamp_ns": (
+                    int(timestamp * 1e9) if timestamp is not None else None
+                ),
+                "count": count,
+                "max_confidence": (
+                    float(max_confidence) if max_confidence is not None else None
+                ),
+            }
+        )
+
+    if errors:
+        raise ValueError("; ".join(errors[:20]))
+    return parsed
+
+
+# Columns a history page can project, besides the always present "time"
+HISTORY_FIELDS = {
+    "events": ("event_type", "confidence", "event_id", "count", "max_confidence"),
+    "sos": ("event_id", "sos_id", "message", "latitude", "longitude"),
+}
+MAX_HISTORY_SECONDS = int(os.getenv("MAX_HISTORY_DAYS", 366)) * 86400
+MAX_HISTORY_PAGE = int(os.getenv("MAX_HISTORY_PAGE", 5000))
+
+
+def history_query(
+    measurement: str, start: float, end: float, cursor: str, limit: int, fields
+):
+    """Validate a history request and resolve where its page starts.
+
+    Returns (fields, start_ns, end_ns, skip): the page holds the ``limit``
+    rows that follow the first ``skip`` rows at or after ``start_ns``.
+    """
+    if end <= start:
+        raise ValueError("'end' must be after 'start'")
+    if end - start > MAX_HISTORY_SECONDS:
+        raise ValueError(
+            f"Time range exceeds {MAX_HISTORY_SECONDS // 86400} days, page through "
+            "shorter ranges"
+        )
+    if not 1 <= limit <= MAX_HISTORY_PAGE:
+        raise ValueError(f"'limit' must be between 1 and {MAX_HISTORY_PAGE}")
+
+    available = HISTORY_FIELDS[measurement]
+    fields = tuple(fields) if fields else available
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}, choose from {list(available)}")
+
+    start_ns, end_ns, skip = int(start * 1e9), int(end * 1e9), 0
+    if cursor:
+        # "<time_ns>-<rows already returned at that time>"
+        try:
+            cursor_ns, skip = (int(part) for part in cursor.split("-"))
+        except ValueError:
+            raise ValueError("Malformed cursor")
+        start_ns = max(start_ns, cursor_ns)
+    return fields, start_ns, end_ns, skip
+
+
+def history_page(rows: list, skip: int, limit: int) -> Tuple[list, Optional[str]]:
+    """Cut a page from rows fetched with ``limit + skip`` and make its cursor.
+
+    The cursor is keyed on the timestamp plus the number of rows already
+    returned at that timestamp, so rows sharing a timestamp across series
+    are neither skipped nor repeated.
+    """
+    page = rows[skip : skip + limit]
+    if len(rows) < skip + limit or not page:
+        return page, None
+    last = page[-1]["time"]
+    returned = sum(1 for row in rows[: skip + limit] if row["time"] == last)
+    return page, f"{last}-{returned}"
+
+
+def open_storage(backend: str = "influxdb") -> Tuple[StorageBackend, RollupStore]:
+    """Create the storage backend and rollup store selected by name."""
+    if backend == "memory":
+        from db.memory_storage import MemoryStorage
+
+        storage = MemoryStorage()
+        return storage, storage
+
+    if backend == "influxdb":
+        from db.Handler import InfluxDBHandler
+        from db.analytics import EventAnalytics
+
+        db_handler = InfluxDBHandler()
+        analytics = EventAnalytics(
+            db_handler,
+            cache_ttl=float(os.getenv("STATS_CACHE_TTL", 30)),
+            cache_size=int(os.getenv("STATS_CACHE_SIZE", 1024)),
+        )
+        return db_handler, analytics
+
+    raise ValueError(f"Unknown storage backend {backend!r}, use influxdb or memory")
@@ -1,13 +1,24 @@
 from typing import Dict, Optional
-import influxdb
+import logging
+import os
 import uuid
 from auth.jwt_handler import AuthHandler
+from db.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
 
 
 class UserHandler:
-    def __init__(self, db_handler):
+    def __init__(self, db_handler, repository: Optional[UserRepository] = None):
         self.db_handler = db_handler
-        self.client = db_handler.client
+        self.repository = repository or UserRepository(
+            os.getenv("USER_DB_PATH", "./users.db")
+        )
+
+    def setup(self):
+        # One-time import of users registered before the SQLite store existed
+        if len(self.repository) == 0:
+            self.import_influx_users()
 
     def create_user(self, user_data: Dict):
         # Validate required fields
@@ -21,49 +32,51 @@ class UserHandler:
         # Hash the password
         hashed_password = AuthHandler.get_password_hash(user_data["password"])
 
-        # Prepare user data for InfluxDB
-        json_body = [
-            {
-                "measurement": "users",
-                "tags": {"user_id": user_data["user_id"], "email": user_data["email"]},
-                "fields": {
-                    "name": user_data["name"],
-                    "phone": user_data["phone"],
-                    "hashed_password": hashed_password,
-                },
-            }
-        ]
+        # Credentials live in the repository; raises on duplicate email
+        self.repository.create({**user_data, "hashed_password": hashed_password})
 
-        # Write to database
-        self.client.write_points(json_body)
+        # Keep the users measurement for the Grafana driver panels, without
+        # the password hash
+        self.db_handler.write_user(user_data)
         return user_data["user_id"]
 
     def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
-        # Correct InfluxDB query syntax
-        query = f"SELECT * FROM \"users\" WHERE \"email\" = '{email}'"
-        print(query)
+        user = self.repository.get_by_email(email)
+        if not user:
+            return None
 
-        try:
-            # Use .get_points(measurement='users') to specify the measurement
-            result = list(self.client.query(query).get_points(measurement="users"))
+        if AuthHandler.verify_password(password, user["hashed_password"]):
+            return {
+                "user_id": user["user_id"],
+                "email": user["email"],
+                "name": user["name"],
+            }
+        return None
 
-            if not result:
-                return None
+    def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        return self.repository.get_by_id(user_id)
 
-            user = result[0]
-            if AuthHandler.verify_password(password, user.get("hashed_password", "")):
-                return {
-                    "user_id": user.get("user_id", ""),
-                    "email": user.get("email", ""),
-                    "name": user.get("name", ""),
-                }
-            return None
+    def import_influx_users(self):
+        """Copy users from the legacy InfluxDB measurement into the repository."""
+        try:
+            users = self.db_handler.legacy_users()
         except Exception as e:
-            print(f"Authentication error: {e}")
-            return None
-
-    def get_user_by_id(self, user_id: str) -> Optional[Dict]:
-        query = f"SELECT * FROM users WHERE user_id = '{user_id}'"
-        result = list(self.client.query(query).get_points())
+            logger.warning("Could not read legacy users: %s", e)
+            return
 
-        return result[0] if result else None
+        for user in users:
+            if not user.get("hashed_password") or not user.get("email"):
+                continue
+            try:
+                self.repository.create(
+                    {
+                        "user_id": user.get("user_id", ""),
+                        "email": user["email"],
+                        "name": user.get("name", ""),
+                        "phone": user.get("phone", ""),
+                        "hashed_password": user["hashed_password"],
+                    }
+                )
+            except ValueError:
+                # Duplicate emails: the first registration wins
+                continue
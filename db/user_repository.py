@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class UserRepository:
+    """Credential store in SQLite with email and id indexes kept in memory.
+
+    Every user is loaded once at startup; lookups are plain dictionary hits
+    and create() updates the indexes itself, so the database is mostly only
+    touched for writes. With several server workers sharing the file, users
+    created by another worker are picked up by load() when announced, or by
+    an indexed read on a miss.
+    """
+
+    def __init__(self, path: str = "./users.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                email TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                hashed_password TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """)
+        self._conn.commit()
+
+        self._by_id = {}
+        self._by_email = {}
+        self.reload()
+
+    def reload(self):
+        """Rebuild the in-memory indexes from the database."""
+        rows = self._conn.execute(
+            "SELECT user_id, email, name, phone, hashed_password FROM users"
+        ).fetchall()
+        by_id, by_email = {}, {}
+        for user_id, email, name, phone, hashed_password in rows:
+            user = {
+                "user_id": user_id,
+                "email": email,
+                "name": name,
+                "phone": phone,
+                "hashed_password": hashed_password,
+            }
+            by_id[user_id] = user
+            by_email[self._normalize(email)] = user
+        with self._lock:
+            self._by_id, self._by_email = by_id, by_email
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        """Add one user written by another process to the indexes."""
+        return self._fetch("user_id", user_id)
+
+    def _fetch(self, column: str, value: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id, email, name, phone, hashed_password FROM users "
+                f"WHERE {column} = ?",
+                (value,),
+            ).fetchone()
+            if row is None:
+                return None
+            user = dict(
+                zip(("user_id", "email", "name", "phone", "hashed_password"), row)
+            )
+            self._by_id[user["user_id"]] = user
+            self._by_email[self._normalize(user["email"])] = user
+            return user
+
+    def create(self, user: Dict) -> Dict:
+        """Insert a user; raises ValueError if the email is already registered."""
+        with self._lock:
+            if self._normalize(user["email"]) in self._by_email:
+                raise ValueError("Email already registered")
+            try:
+                self._conn.execute(
+                    "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        user["user_id"],
+                        user["email"],
+                        user["name"],
+                        user["phone"],
+                        user["hashed_password"],
+                        time.time(),
+                    ),
+                )
+                self._conn.commit()
+            except sqlite3.IntegrityError:
+                raise ValueError("Email already registered")
+
+            stored = {
+                key: user[key]
+                for key in ("user_id", "email", "name", "phone", "hashed_password")
+            }
+            self._by_id[stored["user_id"]] = stored
+            self._by_email[self._normalize(stored["email"])] = stored
+            return stored
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        user = self._by_email.get(self._normalize(email))
+        if user is None and email:
+            user = self._fetch("email", email.strip())
+        return user
+
+    def get_by_id(self, user_id: str) -> Optional[Dict]:
+        user = self._by_id.get(user_id)
+        if user is None and user_id:
+            user = self._fetch("user_id", user_id)
+        return user
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _normalize(email: str) -> str:
+        return (email or "").strip().lower()
@@ -0,0 +1,304 @@
+import logging
+import math
+import queue
+import re
+import threading
+import time
+from influxdb.exceptions import InfluxDBClientError
+from telemetry.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+WRITE_SECONDS = Histogram(
+    "influxdb_write_seconds", "Duration of InfluxDB write requests", ["path"]
+)
+WRITE_BATCH_POINTS = Histogram(
+    "influxdb_write_batch_points",
+    "Points per InfluxDB write request",
+    ["path"],
+    buckets=(1, 10, 100, 500, 1000, 2500, 5000, 10000, 50000),
+)
+DROPPED_POINTS = Counter(
+    "influxdb_dropped_points_total",
+    "Points dropped as rejected by InfluxDB or unwritable at shutdown",
+)
+
+
+class WriteBufferFull(Exception):
+    """Raised when the write buffer cannot accept more points."""
+
+
+def _escape_key(value: str) -> str:
+    # A raw newline would end the line and let the rest parse as a new point
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace(" ", "\\ ")
+        .replace("\n", "\\n")
+    )
+
+
+def _escape_measurement(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace(" ", "\\ ")
+        .replace("\n", "\\n")
+    )
+
+
+def _format_field(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def to_line_protocol(point: dict) -> str:
+    """Serialize a json-style point to an InfluxDB line protocol string."""
+    line = _escape_measurement(point["measurement"])
+    tags = point.get("tags") or {}
+    for key in sorted(tags):
+        if tags[key] is None or tags[key] == "":
+            continue
+        line += f",{_escape_key(key)}={_escape_key(tags[key])}"
+
+    fields = ",".join(
+        f"{_escape_key(key)}={_format_field(value)}"
+        for key, value in point["fields"].items()
+        # InfluxDB rejects the whole request over a NaN or infinite field
+        if value is not None
+        and not (isinstance(value, float) and not math.isfinite(value))
+    )
+    line += f" {fields}"
+
+    if point.get("time") is not None:
+        line += f" {int(point['time'])}"
+    return line
+
+
+class WriteBuffer:
+    """Bounded in-process queue flushed to InfluxDB by size or by time.
+
+    A batch that cannot be written because InfluxDB is unreachable is held
+    and retried, never dropped, while new points keep queueing until the
+    queue is full and enqueue raises WriteBufferFull. With a ``breaker``
+    (shared with AsyncStorage) the held batch waits while the circuit is
+    open and is retried as the half-open probe. Only points InfluxDB
+    rejects as invalid, or that still cannot be written at shutdown, are
+    dropped; the rest of a rejected batch is still written.
+    """
+
+    def __init__(
+        self,
+        client,
+        batch_size: int = 5000,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 100000,
+        max_retries: int = 3,
+        breaker=None,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.breaker = breaker
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._held = []
+        self._lock = threading.Lock()
+        # Makes the capacity check and the puts of enqueue_lines atomic
+        self._enqueue_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self.enqueued_points = 0
+        self.rejected_points = 0
+        self.flushed_points = 0
+        self.failed_points = 0
+        self.flush_count = 0
+        self.last_flush_size = 0
+        self.last_flush_seconds = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run, name="influxdb-write-buffer", daemon=True
+        )
+        self._thread.start()
+
+    def enqueue(self, point: dict):
+        """Queue a point for writing without blocking the caller."""
+        if self._closed.is_set():
+            raise WriteBufferFull("Write buffer is closed")
+        line = to_line_protocol(point)
+        with self._enqueue_lock:
+            try:
+                self._queue.put_nowait(line)
+            except queue.Full:
+                self.rejected_points += 1
+                raise WriteBufferFull("Write buffer is full, retry later")
+            self.enqueued_points += 1
+
+    def enqueue_lines(self, lines: list):
+        """Queue already serialized points, all or nothing."""
+        if self._closed.is_set():
+            raise WriteBufferFull("Write buffer is closed")
+        # The flusher only frees space, so once checked under the lock
+        # every put succeeds
+        with self._enqueue_lock:
+            if self._queue.maxsize - self._queue.qsize() < len(lines):
+                self.rejected_points += len(lines)
+                raise WriteBufferFull("Write buffer is full, retry later")
+            for line in lines:
+                self._queue.put_nowait(line)
+            self.enqueued_points += len(lines)
+
+    def flush(self):
+        """Synchronously write everything queued so far."""
+        with self._lock:
+            while True:
+                batch = self._held or self._drain(block=False)
+                if not batch:
+                    break
+                self._held = self._write(batch)
+                if self._held:
+                    break
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting points and drain the queue."""
+        self._closed.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "held_points": len(self._held),
+            "enqueued_points": self.enqueued_points,
+            "rejected_points": self.rejected_points,
+            "flushed_points": self.flushed_points,
+            "failed_points": self.failed_points,
+            "flush_count": self.flush_count,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty() and not self._held):
+            with self._lock:
+                batch = self._held or self._drain(block=True)
+                if batch:
+                    self._held = self._write(batch)
+            if self._held:
+                # InfluxDB is down: nothing more is drained, so the queue
+                # fills up and pushes back on the routes
+                self._closed.wait(max(self.flush_interval, 0.1))
+
+    def _drain(self, block: bool) -> list:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if block and not self._closed.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> list:
+        """Write a batch; returns the lines to hold and retry later."""
+        closing = self._closed.is_set()
+        if self.breaker is not None and not closing and not self.breaker.allow():
+            return batch
+
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with WRITE_SECONDS.labels("buffer").time():
+                    self.client.write_points(batch, protocol="line")
+                break
+            except InfluxDBClientError as e:
+                if e.code != 400:
+                    error = e
+                else:
+                    # Malformed points are rejected however often we retry
+                    held = self._write_valid(batch, e)
+                    if self.breaker is not None:
+                        self.breaker.record_success()
+                    return held
+            except Exception as e:
+                error = e
+            if attempt == self.max_retries:
+                # One failure per batch, as AsyncStorage counts one per call
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                if closing:
+                    self._drop(batch, error)
+                    return []
+                logger.warning(
+                    "Holding %d points until InfluxDB is back: %s", len(batch), error
+                )
+                return batch
+            time.sleep(min(0.1 * 2**attempt, 2.0))
+
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+        WRITE_BATCH_POINTS.labels("buffer").observe(len(batch))
+        self.flushed_points += len(batch)
+        self.flush_count += 1
+        self.last_flush_size = len(batch)
+        self.last_flush_seconds = time.perf_counter() - start
+        return []
+
+    def _write_valid(self, batch: list, error: Exception) -> list:
+        """Write the valid lines of a rejected batch, dropping the bad ones.
+
+        On a partial write InfluxDB has stored every line it could parse.
+        Otherwise the batch is split in halves until the rejected lines are
+        isolated; points carry their timestamp, so resending is idempotent.
+        Returns the lines to hold if InfluxDB fails for another reason.
+        """
+        if "partial write" in str(error):
+            match = re.search(r"dropped=(\d+)", str(error))
+            dropped = min(int(match.group(1)) if match else 1, len(batch))
+            self.flushed_points += len(batch) - dropped
+            self.failed_points += dropped
+            DROPPED_POINTS.inc(dropped)
+            logger.error("InfluxDB dropped %d invalid points: %s", dropped, error)
+            return []
+        if len(batch) == 1:
+            self._drop(batch, error)
+            return []
+
+        middle = len(batch) // 2
+        held = []
+        for half in (batch[:middle], batch[middle:]):
+            if held:
+                held += half
+                continue
+            try:
+                self.client.write_points(half, protocol="line")
+            except InfluxDBClientError as e:
+                held += self._write_valid(half, e) if e.code == 400 else half
+            except Exception:
+                held += half
+            else:
+                self.flushed_points += len(half)
+        return held
+
+    def _drop(self, batch: list, error: Exception):
+        self.failed_points += len(batch)
+        DROPPED_POINTS.inc(len(batch))
+        logger.error("Dropping %d points after write error: %s", len(batch), error)
@@ -0,0 +1,33 @@
+import os
+from ultralytics import YOLO
+
+# Artifact produced by tools/export_model.py for each backend, next to the .pt
+BACKENDS = {
+    "torch": "{stem}.pt",
+    "onnx": "{stem}.onnx",
+    "onnx-int8": "{stem}.int8.onnx",
+    "openvino": "{stem}_openvino_model",
+    "openvino-int8": "{stem}_int8_openvino_model",
+}
+
+
+def resolve_model_path(model_path: str, backend: str = "torch") -> str:
+    """Return the exported artifact path for ``backend`` given the .pt path."""
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend '{backend}', expected one of {list(BACKENDS)}"
+        )
+    directory, filename = os.path.split(model_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, BACKENDS[backend].format(stem=stem))
+
+
+def load_model(model_path: str, backend: str = "torch"):
+    """Load the model for ``backend``; every backend returns the same Results API."""
+    path = resolve_model_path(model_path, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"No {backend} model at {path}, "
+            f"run: python -m tools.export_model {model_path} --backend {backend}"
+        )
+    return YOLO(path, task="detect")
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+
+class LetterboxBuffer:
+    """Resizes frames into one preallocated, padded model-input buffer.
+
+    The buffer is reused for every frame, so preprocessing allocates nothing
+    once the stream resolution is known. Box coordinates predicted on the
+    buffer are mapped back to the original frame with ``to_frame``.
+    """
+
+    def __init__(self, size: int = 640, pad_value: int = 114):
+        self.size = size
+        self.pad_value = pad_value
+        self.buffer = np.full((size, size, 3), pad_value, dtype=np.uint8)
+        self.scale = 1.0
+        self.pad_x = 0
+        self.pad_y = 0
+        self._frame_shape = None
+        self._view = None
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        if frame.shape[:2] != self._frame_shape:
+            self._configure(frame.shape[:2])
+        cv2.resize(
+            frame,
+            (self._view.shape[1], self._view.shape[0]),
+            dst=self._view,
+            interpolation=cv2.INTER_LINEAR,
+        )
+        return self.buffer
+
+    def to_frame(self, x1, y1, x2, y2):
+        """Map a box from buffer coordinates back to frame coordinates."""
+        return (
+            (x1 - self.pad_x) / self.scale,
+            (y1 - self.pad_y) / self.scale,
+            (x2 - self.pad_x) / self.scale,
+            (y2 - self.pad_y) / self.scale,
+        )
+
+    def _configure(self, frame_shape):
+        height, width = frame_shape
+        self.scale = min(self.size / height, self.size / width)
+        new_width = round(width * self.scale)
+        new_height = round(height * self.scale)
+        self.pad_x = (self.size - new_width) // 2
+        self.pad_y = (self.size - new_height) // 2
+
+        self.buffer.fill(self.pad_value)
+        self._view = self.buffer[
+            self.pad_y : self.pad_y + new_height, self.pad_x : self.pad_x + new_width
+        ]
+        self._frame_shape = frame_shape
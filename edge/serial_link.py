@@ -0,0 +1,48 @@
+import time
+
+
+class ArduinoLink:
+    """Serial connection to the alert board, opened on first write."""
+
+    def __init__(self, port: str, baudrate: int = 9600, settle_seconds: float = 2.0):
+        self.port = port
+        self.baudrate = baudrate
+        self.settle_seconds = settle_seconds
+        self._serial = None
+
+    def write(self, data: bytes):
+        if self._serial is None:
+            import serial
+
+            self._serial = serial.Serial(
+                port=self.port, baudrate=self.baudrate, timeout=0.1
+            )
+            # The board resets when the port opens
+            time.sleep(self.settle_seconds)
+        return self._serial.write(data)
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+
+class NullSerial:
+    """Stand-in for the board in headless runs; keeps what would have been sent."""
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data: bytes):
+        self.writes.append(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def open_serial_link(port: str):
+    """Return a lazy ArduinoLink, or a NullSerial when ``port`` is empty/none."""
+    if not port or port.lower() in ("none", "null", "loopback"):
+        return NullSerial()
+    return ArduinoLink(port)
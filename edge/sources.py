@@ -0,0 +1,54 @@
+import os
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class ImageDirectoryCapture:
+    """cv2.VideoCapture look-alike that replays a directory of images in order."""
+
+    def __init__(self, directory: str, fps: float = 30.0):
+        self.fps = fps
+        self.paths = sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def grab(self):
+        if self.position >= len(self.paths):
+            return False
+        self.position += 1
+        return True
+
+    def read(self):
+        if self.position >= len(self.paths):
+            return False, None
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        return 0.0
+
+    def release(self):
+        self.paths = []
+
+
+def open_capture(source: str, image_fps: float = 30.0):
+    """Open a live URL, a local video file or an image directory."""
+    if os.path.isdir(source):
+        return ImageDirectoryCapture(source, image_fps)
+    return cv2.VideoCapture(source)
+
+
+def is_replay_source(source: str) -> bool:
+    return os.path.exists(source)
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+
+
+class EventSpool:
+    """Append-only on-disk queue made of rotating JSON-lines segment files.
+
+    Records are appended by the inference loop and read back by the sender
+    thread. The read position is only advanced by ``commit`` once the backend
+    has acknowledged the records, so nothing is lost across restarts. State
+    the sender derives from acknowledged records (e.g. the last event id) is
+    saved with the position in ``state`` so the two never disagree.
+    """
+
+    def __init__(
+        self, directory: str, segment_bytes: int = 4 * 1024 * 1024, fsync=False
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._cursor_path = os.path.join(directory, "cursor.json")
+        self._cursor, self.state = self._load_cursor()
+
+        # Always start a fresh segment so a torn write from a crash is never
+        # followed by new records in the same file
+        segments = self._segments()
+        self._active_seq = (segments[-1] + 1) if segments else self._cursor[0]
+        self._active = open(self._segment_path(self._active_seq), "ab")
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records: list):
+        data = b"".join(
+            json.dumps(record, separators=(",", ":")).encode() + b"\n"
+            for record in records
+        )
+        with self._lock:
+            self._active.write(data)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            if self._active.tell() >= self.segment_bytes:
+                self._rotate()
+
+    def read_batch(self, max_records: int = 500) -> list:
+        """Return up to ``max_records`` unacknowledged (position, record) pairs."""
+        with self._lock:
+            # Make sure the reader sees everything appended so far
+            self._active.flush()
+            segments = [seq for seq in self._segments() if seq >= self._cursor[0]]
+
+        batch = []
+        for seq in segments:
+            offset = self._cursor[1] if seq == self._cursor[0] else 0
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek(offset)
+                while len(batch) < max_records:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    batch.append(((seq, f.tell()), record))
+            if len(batch) >= max_records:
+                break
+        return batch
+
+    def commit(self, position: tuple, **state):
+        """Mark every record up to ``position`` as delivered."""
+        with self._lock:
+            self._cursor = tuple(position)
+            self.state = {**self.state, **state}
+            tmp_path = self._cursor_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"position": list(self._cursor), "state": self.state}, f)
+            os.replace(tmp_path, self._cursor_path)
+
+            for seq in self._segments():
+                if seq < self._cursor[0] and seq != self._active_seq:
+                    os.remove(self._segment_path(seq))
+
+    def pending_segments(self) -> int:
+        return len([seq for seq in self._segments() if seq >= self._cursor[0]])
+
+    def close(self):
+        with self._lock:
+            self._active.close()
+
+    def _rotate(self):
+        self._active.close()
+        self._active_seq += 1
+        self._active = open(self._segment_path(self._active_seq), "ab")
+
+    def _load_cursor(self) -> tuple:
+        try:
+            with open(self._cursor_path) as f:
+                cursor = json.load(f)
+            # Spools written before state was kept hold a bare position
+            if isinstance(cursor, list):
+                cursor = {"position": cursor}
+            seq, offset = cursor["position"]
+            return (int(seq), int(offset)), dict(cursor.get("state") or {})
+        except (OSError, ValueError, KeyError, TypeError):
+            return (0, 0), {}
+
+    def _segments(self) -> list:
+        return sorted(
+            int(name[len("segment-") : -len(".log")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:012d}.log")
@@ -0,0 +1,107 @@
+import time
+import numpy as np
+
+
+class TemporalAggregator:
+    """Sliding-window drowsiness scoring with hysteresis for one stream.
+
+    Every frame's per-class max confidence goes into a fixed-size ring
+    buffer. The drowsiness score is PERCLOS-style: the fraction of frames in
+    the window where a drowsy class was seen above ``min_confidence``. The
+    state only flips when the score crosses ``enter_threshold`` (going up) or
+    ``exit_threshold`` (going down), so one noisy frame cannot raise an alert.
+
+    ``update`` returns the events worth reporting: state transitions, plus a
+    per-class summary every ``summary_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        class_names: dict,
+        window: int = 20,
+        drowsy_classes=("drowsy",),
+        min_confidence: float = 0.5,
+        enter_threshold: float = 0.6,
+        exit_threshold: float = 0.3,
+        summary_interval: float = 30.0,
+    ):
+        self.class_names = dict(class_names)
+        self.window = window
+        self.min_confidence = min_confidence
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.summary_interval = summary_interval
+        self.drowsy_ids = [
+            class_id
+            for class_id, name in self.class_names.items()
+            if name in drowsy_classes
+        ]
+
+        num_classes = max(self.class_names) + 1
+        self.buffer = np.zeros((window, num_classes), dtype=np.float32)
+        self._summary_counts = np.zeros(num_classes, dtype=np.int64)
+        self._summary_sums = np.zeros(num_classes, dtype=np.float64)
+        self.index = 0
+        self.filled = 0
+        self.score = 0.0
+        self.is_drowsy = False
+        self._last_summary = None
+
+    def update(self, confidences: dict, now: float = None) -> list:
+        """Add one frame of {class_id: confidence} and return pending events."""
+        now = time.monotonic() if now is None else now
+        if self._last_summary is None:
+            self._last_summary = now
+        row = self.buffer[self.index]
+        row.fill(0.0)
+        for class_id, confidence in confidences.items():
+            row[class_id] = max(row[class_id], confidence)
+        self.index = (self.index + 1) % self.window
+        detected = row >= self.min_confidence
+        self._summary_counts += detected
+        self._summary_sums += np.where(detected, row, 0.0)
+        self.filled = min(self.filled + 1, self.window)
+
+        frames = self.buffer[: self.filled]
+        drowsy_frames = (frames[:, self.drowsy_ids] >= self.min_confidence).any(axis=1)
+        self.score = float(drowsy_frames.mean())
+
+        events = []
+        if not self.is_drowsy and self.score >= self.enter_threshold:
+            # Do not judge on a nearly empty window right after startup
+            if self.filled >= self.window // 2:
+                self.is_drowsy = True
+                events.append(
+                    {"type": "drowsy_start", "confidence": self._drowsy_confidence()}
+                )
+        elif self.is_drowsy and self.score <= self.exit_threshold:
+            self.is_drowsy = False
+            events.append({"type": "drowsy_end", "confidence": self.score})
+
+        if now - self._last_summary >= self.summary_interval:
+            self._last_summary = now
+            events.extend(self.summary())
+        return events
+
+    def summary(self) -> list:
+        """Per-class detection count and mean confidence since the last summary."""
+        events = []
+        for class_id, name in self.class_names.items():
+            count = int(self._summary_counts[class_id])
+            if count:
+                events.append(
+                    {
+                        "type": "summary",
+                        "event_type": name,
+                        "confidence": float(self._summary_sums[class_id] / count),
+                        "count": count,
+                    }
+                )
+        self._summary_counts.fill(0)
+        self._summary_sums.fill(0.0)
+        return events
+
+    def _drowsy_confidence(self) -> float:
+        values = self.buffer[: self.filled, self.drowsy_ids].max(axis=1)
+        values = values[values >= self.min_confidence]
+        return float(values.mean()) if len(values) else 0.0
@@ -1,22 +1,41 @@
 import cv2
+import logging
 import time
+import threading
 import requests
 import os
 from dotenv import load_dotenv
-from ultralytics import YOLO
-from PIL import Image
-import serial
+from edge.backends import load_model
+from edge.preprocess import LetterboxBuffer
+from edge.serial_link import open_serial_link
+from edge.sources import is_replay_source, open_capture
+from edge.spool import EventSpool
+from edge.temporal import TemporalAggregator
+from telemetry.logs import setup_logging
+from telemetry.metrics import Gauge, Histogram, start_http_server
 
 load_dotenv()
-# need to be changed depends on the ports in your machine
-arduino = serial.Serial(port="/dev/ttyACM1", baudrate=9600, timeout=0.1)
-time.sleep(2)
+logger = logging.getLogger("detector")
+
+STAGE_SECONDS = Histogram(
+    "detector_stage_seconds",
+    "Per-frame time spent in each detector stage",
+    ["stage"],
+)
+MODEL_FPS = Gauge("detector_model_fps", "Inference rate, smoothed over frames")
+FRAME_AGE = Gauge("detector_frame_age_seconds", "Age of the last frame processed")
+
+
+class EndOfStream(Exception):
+    """Raised when a replayed video file or image directory runs out of frames."""
 
 
 class BackendAuthenticator:
     def __init__(self, api_url):
         self.api_url = api_url
         self.access_token = None
+        self.refresh_token = None
+        self._credentials = None
 
     def login(self, email, password):
         try:
@@ -25,159 +44,547 @@ class BackendAuthenticator:
             response.raise_for_status()
             token_data = response.json()
             self.access_token = token_data.get("access_token")
+            self.refresh_token = token_data.get("refresh_token")
+            self._credentials = (email, password)
             return self.access_token
         except Exception as e:
-            print(f"Login failed: {e}")
+            logger.error("Login failed: %s", e)
             return None
 
-
-class BackendEventStreamer:
-    def __init__(self, api_url, access_token):
-        self.api_url = api_url
-        self.access_token = access_token
-        self.last_event_time = 0
-        self.event_interval = 1  # seconds
-        self.sos_sent = False
-        self.last_event_id = None
-
-    def send_event(self, event_type, confidence=0.6):
-        current_time = time.time()
-
-        # Only send events every 20 seconds
-        if True and (current_time - self.last_event_time >= self.event_interval):
+    def refresh(self):
+        """Renew the access token, falling back to a full login if needed."""
+        if self.refresh_token:
             try:
-                headers = {
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                }
-                payload = {"event_type": event_type, "confidence": confidence}
                 response = requests.post(
-                    f"{self.api_url}/event/", json=payload, headers=headers
+                    f"{self.api_url}/token/refresh",
+                    json={"refresh_token": self.refresh_token},
+                    timeout=10,
                 )
                 response.raise_for_status()
-                response_data = response.json()
-
-                # Store the event ID for potential SOS
-                self.last_event_id = response_data.get("published_event").get(
-                    "event_id"
-                )
-                self.last_event_time = current_time
+                self.access_token = response.json().get("access_token")
+                return self.access_token
+            except Exception as e:
+                logger.warning("Token refresh failed: %s", e)
+        if self._credentials:
+            return self.login(*self._credentials)
+        return None
 
-                print(f"Event sent: {event_type}, Event ID: {self.last_event_id}")
-                return response_data.get("published_event").get("event_id")
 
-            except Exception as e:
-                print(f"Failed to send event: {e}")
-                return None
+class BackendEventStreamer:
+    def __init__(
+        self,
+        api_url,
+        access_token,
+        spool_dir="./spool",
+        coalesce_window=1.0,
+        batch_size=500,
+        authenticator=None,
+        max_rejections=3,
+    ):
+        self.api_url = api_url
+        self.access_token = access_token
+        # Used to renew the access token when the backend rejects it
+        self.authenticator = authenticator
+        self.event_interval = coalesce_window  # seconds
+        self.batch_size = batch_size
+        self.sos_sent = False
+        # A 400 can be transient, e.g. an SOS whose event the backend has not
+        # indexed yet, so records are only dropped once rejected this often
+        self.max_rejections = max_rejections
+        self._rejections = 0
+
+        # Keep-alive connection reused by the sender thread
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {self.access_token}",
+                "Content-Type": "application/json",
+            }
+        )
+
+        # Detections are coalesced per class, then spooled to disk until the
+        # backend acknowledges them
+        self.spool = EventSpool(spool_dir)
+        # Survives restarts so a spooled SOS still has an event to refer to
+        self.last_event_id = self.spool.state.get("last_event_id")
+        self._window = {}
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sender = threading.Thread(
+            target=self._send_loop, name="event-sender", daemon=True
+        )
+        self._sender.start()
+
+    def send_event(self, event_type, confidence=0.6, urgent=False, count=1):
+        """Record a detection; it is shipped in the background."""
+        with self._lock:
+            stats = self._window.setdefault(
+                event_type, {"count": 0, "sum": 0.0, "max": 0.0}
+            )
+            stats["count"] += count
+            stats["sum"] += confidence * count
+            stats["max"] = max(stats["max"], confidence)
+
+        if urgent or time.time() - self._window_start >= self.event_interval:
+            self._flush_window()
+            self._wake.set()
 
     def reset_sos(self):
         self.sos_sent = False
 
     def send_sos(self, message, latitude=0, longitude=0):
-        # Only send SOS once and ensure we have an event ID
-        if not self.sos_sent and self.last_event_id:
-            try:
-                headers = {
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
+        # Only send SOS once per drowsy episode; it is attached to the latest
+        # event acknowledged before it in the spool
+        if not self.sos_sent:
+            self._flush_window()
+            self.spool.append(
+                {
+                    "kind": "sos",
                     "event_id": self.last_event_id,
                     "message": message,
                     "latitude": latitude,
                     "longitude": longitude,
                 }
-                response = requests.post(
-                    f"{self.api_url}/sos/", json=payload, headers=headers
-                )
-                response.raise_for_status()
-                self.sos_sent = True
-                print(f"SOS sent with Event ID: {self.last_event_id}")
+            )
+            self.sos_sent = True
+            self._wake.set()
+
+    def close(self, timeout=5.0):
+        self._flush_window()
+        self._stop.set()
+        self._wake.set()
+        self._sender.join(timeout)
+        self.spool.close()
+        self.session.close()
+
+    def _flush_window(self):
+        with self._lock:
+            window, self._window = self._window, {}
+            window_start, self._window_start = self._window_start, time.time()
+
+        if window:
+            self.spool.append_many(
+                [
+                    {
+                        "kind": "event",
+                        "event_type": event_type,
+                        "confidence": stats["sum"] / stats["count"],
+                        "max_confidence": stats["max"],
+                        "count": stats["count"],
+                        "timestamp": window_start,
+                    }
+                    for event_type, stats in window.items()
+                ]
+            )
+
+    def _send_loop(self):
+        backoff = 1.0
+        while True:
+            if time.time() - self._window_start >= self.event_interval:
+                self._flush_window()
+
+            batch = self.spool.read_batch(self.batch_size)
+            if not batch:
+                if self._stop.is_set():
+                    return
+                self._wake.wait(self.event_interval)
+                self._wake.clear()
+                continue
+
+            try:
+                self._ship(batch)
+                backoff = 1.0
             except Exception as e:
-                print(f"Failed to send SOS: {e}")
+                logger.warning(
+                    "Failed to send events, retrying in %.0fs: %s", backoff, e
+                )
+                if self._stop.wait(backoff):
+                    return
+                backoff = min(backoff * 2, 60.0)
+
+    def _ship(self, batch):
+        # Consecutive events go out in one request, SOS records individually
+        events = []
+        for position, record in batch:
+            if record.get("kind") == "sos":
+                if events:
+                    self._post_events(events)
+                    events = []
+                self._post_sos(record)
+                self.spool.commit(position)
+            else:
+                events.append((position, record))
+        if events:
+            self._post_events(events)
+
+    def _post_events(self, events):
+        payload = [
+            {key: value for key, value in record.items() if key != "kind"}
+            for _, record in events
+        ]
+        response = self._post("/events/batch", payload)
+        if response is None:
+            self.spool.commit(events[-1][0])
+            return
+        event_ids = response.json().get("event_ids", [])
+        if event_ids:
+            self.last_event_id = event_ids[-1]
+        self.spool.commit(events[-1][0], last_event_id=self.last_event_id)
+        logger.info(
+            "Events sent: %d, last event id: %s", len(event_ids), self.last_event_id
+        )
+
+    def _post_sos(self, record):
+        # The events spooled before the SOS are acknowledged first, so the
+        # latest event id is the one that led to it
+        event_id = self.last_event_id or record.get("event_id")
+        if not event_id:
+            # Left in the spool and retried with backoff, but not forever: an
+            # SOS spooled before a restart may never get an event to refer to
+            self._rejections += 1
+            if self._rejections < self.max_rejections:
+                raise Exception(
+                    f"SOS held until an event has been acknowledged "
+                    f"({self._rejections}/{self.max_rejections})"
+                )
+            self._rejections = 0
+            logger.error("Dropping SOS without an event to refer to: %s", record)
+            return
+        payload = {
+            "event_id": event_id,
+            "message": record["message"],
+            "latitude": record["latitude"],
+            "longitude": record["longitude"],
+        }
+        if self._post("/sos/", payload) is not None:
+            logger.info("SOS sent with event id: %s", event_id)
+
+    def _post(self, path, payload):
+        """POST with token renewal; returns None if the backend rejects the data."""
+        response = self.session.post(f"{self.api_url}{path}", json=payload, timeout=10)
+        if response.status_code in (401, 403) and self.authenticator is not None:
+            access_token = self.authenticator.refresh()
+            if access_token:
+                self.access_token = access_token
+                self.session.headers["Authorization"] = f"Bearer {access_token}"
+                response = self.session.post(
+                    f"{self.api_url}{path}", json=payload, timeout=10
+                )
+
+        # Payloads that fail validation would block the spool forever, so they
+        # are dropped: at once for schema (422) and size (413) errors, after
+        # repeated rejections for a 400. Auth, throttling and server errors
+        # are retried
+        if response.status_code == 400:
+            self._rejections += 1
+            if self._rejections < self.max_rejections:
+                raise Exception(
+                    f"Records rejected by {path} ({self._rejections}/"
+                    f"{self.max_rejections}): {response.text}"
+                )
+        if response.status_code in (400, 413, 422):
+            self._rejections = 0
+            logger.error(
+                "Dropping records rejected by %s (%d): %s",
+                path,
+                response.status_code,
+                response.text,
+            )
+            return None
+        response.raise_for_status()
+        self._rejections = 0
+        return response
 
 
 class RTMPStream:
-    def __init__(self, stream_url):
+    def __init__(self, stream_url, threaded=False, target_fps=None, replay="native"):
+        # stream_url may also be a local video file or a directory of images
         self.stream_url = stream_url
-        self.cap = cv2.VideoCapture(self.stream_url)
+        self.cap = open_capture(self.stream_url)
         if not self.cap.isOpened():
             raise Exception(f"Error: Could not open RTMP stream at {stream_url}")
 
+        self.threaded = threaded
+        self.target_fps = target_fps
+        self._next_frame_time = time.monotonic()
+
+        # Replayed sources are paced at their native frame rate unless
+        # replay="fast", in which case they are decoded as fast as possible
+        self.is_replay = is_replay_source(stream_url)
+        source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._replay_interval = (
+            1.0 / source_fps if self.is_replay and replay == "native" else 0.0
+        )
+        self._next_replay_time = time.monotonic()
+
+        # Threaded mode keeps only the newest decoded frame (latest frame wins)
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_seq = 0
+        self._consumed_seq = 0
+        self._error = None
+        self._running = False
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.processed_frames = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+
+        if self.threaded:
+            self._running = True
+            self._reader = threading.Thread(
+                target=self._read_loop, name="frame-reader", daemon=True
+            )
+            self._reader.start()
+
     def get_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            raise Exception("Error: Failed to capture frame.")
+        self._wait_for_slot()
+        if not self.threaded:
+            ret, frame = self._read()
+            if not ret:
+                raise self._read_error()
+            return frame
+
+        with self._condition:
+            while self._frame_seq == self._consumed_seq and self._error is None:
+                self._condition.wait()
+        return self.poll_frame()
+
+    def poll_frame(self):
+        """Take the newest unseen frame without waiting, or None (threaded mode)."""
+        with self._condition:
+            if self._frame_seq == self._consumed_seq:
+                if self._error is not None:
+                    raise self._error
+                return None
+            frame, frame_time = self._frame, self._frame_time
+            self._consumed_seq = self._frame_seq
+
+        self.processed_frames += 1
+        self.last_latency = time.monotonic() - frame_time
+        self.max_latency = max(self.max_latency, self.last_latency)
+        self._total_latency += self.last_latency
         return frame
 
+    def stats(self):
+        return {
+            "captured_frames": self.captured_frames,
+            "dropped_frames": self.dropped_frames,
+            "processed_frames": self.processed_frames,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+            "mean_latency": self._total_latency / max(self.processed_frames, 1),
+        }
+
     def release(self):
+        self._running = False
+        if self.threaded:
+            self._reader.join(timeout=2)
         self.cap.release()
 
+    def _wait_for_slot(self):
+        if not self.target_fps:
+            return
+        if self.threaded:
+            # The reader thread keeps the slot fresh, so just sleep
+            delay = self._next_frame_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # Grab without decoding to keep the capture buffer at real time
+            while time.monotonic() < self._next_frame_time:
+                self._pace_replay()
+                if not self.cap.grab():
+                    break
+                self.dropped_frames += 1
+        self._next_frame_time = max(self._next_frame_time, time.monotonic()) + (
+            1.0 / self.target_fps
+        )
+
+    def _pace_replay(self):
+        if not self._replay_interval:
+            return
+        delay = self._next_replay_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_replay_time = (
+            max(self._next_replay_time, time.monotonic()) + self._replay_interval
+        )
+
+    def _read(self):
+        self._pace_replay()
+        return self.cap.read()
+
+    def _read_error(self):
+        if self.is_replay:
+            return EndOfStream(f"Replay of {self.stream_url} finished")
+        return Exception("Error: Failed to capture frame.")
+
+    def _read_loop(self):
+        while self._running:
+            ret, frame = self._read()
+            with self._condition:
+                if not ret:
+                    self._error = self._read_error()
+                    self._condition.notify_all()
+                    return
+                if self._frame_seq != self._consumed_seq:
+                    self.dropped_frames += 1
+                self._frame = frame
+                self._frame_time = time.monotonic()
+                self._frame_seq += 1
+                self.captured_frames += 1
+                self._condition.notify_all()
+
 
 class DrowsinessDetector:
-    def __init__(self, model_path, event_streamer):
-        self.model = YOLO(model_path)
+    def __init__(
+        self,
+        model_path,
+        event_streamer,
+        model=None,
+        serial_link=None,
+        draw_boxes=True,
+        preprocessing="direct",
+        imgsz=640,
+        backend="torch",
+        aggregator=None,
+    ):
+        # A loaded model can be shared between detectors in multi-stream mode
+        self.model = model or load_model(model_path, backend)
         self.event_streamer = event_streamer
+        self.serial_link = serial_link
+        self.draw_boxes = draw_boxes
+        self.imgsz = imgsz
+        self.letterbox = (
+            LetterboxBuffer(imgsz) if preprocessing == "letterbox" else None
+        )
+        # Drowsiness is judged over a window of frames, not a single frame
+        self.aggregator = aggregator or TemporalAggregator(self.model.names)
         self.is_currently_drowsy = False
+        self.model_fps = 0.0
+        self._send_seconds = 0.0
+
+    def preprocess(self, frame):
+        # Ultralytics takes BGR ndarrays as-is, so no RGB/PIL round trip is
+        # needed; the letterbox path also reuses one preallocated input buffer
+        if self.letterbox is not None:
+            return self.letterbox(frame)
+        return frame
 
     def process_frame(self, frame):
-        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        results = self.model.predict(source=image, conf=0.5)
-
-        drowsy_detected = False
-        events_sent = []
+        start = time.perf_counter()
+        image = self.preprocess(frame)
+        preprocessed = time.perf_counter()
+        results = self.model.predict(
+            source=image, conf=0.5, imgsz=self.imgsz, verbose=False
+        )
+        inferred = time.perf_counter()
+        frame, message = self.handle_results(frame, results)
+        finished = time.perf_counter()
+
+        inference = inferred - preprocessed
+        self.model_fps = 0.9 * self.model_fps + 0.1 / max(inference, 1e-6)
+        MODEL_FPS.set(self.model_fps)
+        STAGE_SECONDS.labels("preprocess").observe(preprocessed - start)
+        STAGE_SECONDS.labels("inference").observe(inference)
+        logger.info(
+            "Frame processed",
+            extra={
+                "preprocess_ms": round((preprocessed - start) * 1000, 2),
+                "inference_ms": round(inference * 1000, 2),
+                "postprocess_ms": round((finished - inferred) * 1000, 2),
+                "model_fps": round(self.model_fps, 2),
+            },
+        )
+        return frame, message
+
+    def _send(self, method, *args, **kwargs):
+        # Time spent handing events to the streamer, reported separately
+        # from postprocessing
+        start = time.perf_counter()
+        method(*args, **kwargs)
+        self._send_seconds += time.perf_counter() - start
+
+    def handle_results(self, frame, results):
+        start = time.perf_counter()
+        self._send_seconds = 0.0
+        confidences = {}
 
         for result in results:
             for box in result.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])  # Bounding box coordinates
-                class_name = self.model.names[int(box.cls[0])]
-                confidence = box.conf[0]
+                class_id = int(box.cls[0])
+                class_name = self.model.names[class_id]
+                confidence = box.conf[0].item()
+                confidences[class_id] = max(confidences.get(class_id, 0.0), confidence)
 
                 # Draw bounding boxes and labels
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # Green box
-                label = f"{class_name} {confidence:.2f}"
-                cv2.putText(
-                    frame,
-                    label,
-                    (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (0, 255, 0),
-                    2,
-                )
-
-                # Send events for each detected class
-                if class_name:
-                    events_sent.append(
-                        self.event_streamer.send_event(class_name, confidence.item())
+                if self.draw_boxes:
+                    coords = box.xyxy[0].tolist()  # Bounding box coordinates
+                    if self.letterbox is not None:
+                        coords = self.letterbox.to_frame(*coords)
+                    x1, y1, x2, y2 = map(int, coords)
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                    label = f"{class_name} {confidence:.2f}"
+                    cv2.putText(
+                        frame,
+                        label,
+                        (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5,
+                        (0, 255, 0),
+                        2,
                     )
 
-                # Check for drowsiness
-                if class_name == "drowsy":
-                    drowsy_detected = True
-
-        # Handle drowsiness state
-        if drowsy_detected:
-            if not self.is_currently_drowsy:
-                # First time drowsiness is detected
+        # Only state transitions and periodic summaries become events
+        message = None
+        for event in self.aggregator.update(confidences):
+            if event["type"] == "drowsy_start":
                 self.is_currently_drowsy = True
-                event_id = self.event_streamer.send_event("drowsy", 0.8)
-                arduino.write(b"drowsy")
-                print(event_id)
-                if event_id:
-                    print("sos trigger")
-                    self.event_streamer.send_sos("Severe Drowsiness Detected!")
-                return frame, "SOS: Drowsiness Detected!"
-        else:
-            # Reset SOS if driver is no longer drowsy
-            if self.is_currently_drowsy:
+                self._send(
+                    self.event_streamer.send_event,
+                    "drowsy",
+                    event["confidence"],
+                    urgent=True,
+                )
+                if self.serial_link is not None:
+                    self.serial_link.write(b"drowsy")
+                logger.warning(
+                    "Drowsiness detected, triggering SOS",
+                    extra={"confidence": round(event["confidence"], 3)},
+                )
+                self._send(self.event_streamer.send_sos, "Severe Drowsiness Detected!")
+                message = "SOS: Drowsiness Detected!"
+            elif event["type"] == "drowsy_end":
+                # Reset SOS once the driver is no longer drowsy
                 self.is_currently_drowsy = False
                 self.event_streamer.reset_sos()
+            else:
+                self._send(
+                    self.event_streamer.send_event,
+                    event["event_type"],
+                    event["confidence"],
+                    count=event["count"],
+                )
 
-        return frame, None
+        STAGE_SECONDS.labels("postprocess").observe(
+            time.perf_counter() - start - self._send_seconds
+        )
+        STAGE_SECONDS.labels("event_send").observe(self._send_seconds)
+        return frame, message
 
 
 def main():
+    setup_logging()
+    # Stage timings and model FPS are scraped from METRICS_PORT when set
+    if os.getenv("METRICS_PORT"):
+        start_http_server(int(os.getenv("METRICS_PORT")))
+
     # Get configuration from environment variables
     api_url = os.getenv("API_URL", "http://localhost:8000")
     stream_url = os.getenv("RTMP_STREAM_URL", "rtmp://localhost:1935/live/1")
@@ -192,30 +599,51 @@ def main():
     access_token = authenticator.login(email, password)
 
     if not access_token:
-        print("Authentication failed. Exiting.")
+        logger.error("Authentication failed. Exiting.")
         return
 
     # Initialize components
-    event_streamer = BackendEventStreamer(api_url, access_token)
-    stream = RTMPStream(stream_url)
-    detector = DrowsinessDetector(model_path, event_streamer)
-
-    frame_interval = 0.5  # Delay between frames
-    last_frame_time = time.time()
+    event_streamer = BackendEventStreamer(
+        api_url,
+        access_token,
+        spool_dir=os.getenv("SPOOL_DIR", "./spool"),
+        authenticator=authenticator,
+    )
+    stream = RTMPStream(
+        stream_url,
+        threaded=os.getenv("THREADED_CAPTURE", "1") == "1",
+        target_fps=float(os.getenv("TARGET_FPS", 2)),
+        replay=os.getenv("REPLAY_MODE", "native"),
+    )
+
+    # Headless runs skip the preview window; ARDUINO_PORT=none swaps the
+    # board for a null sink so no hardware is needed
+    headless = os.getenv("HEADLESS", "0") == "1"
+    serial_link = open_serial_link(os.getenv("ARDUINO_PORT", "/dev/ttyACM1"))
+    detector = DrowsinessDetector(
+        model_path,
+        event_streamer,
+        serial_link=serial_link,
+        draw_boxes=not headless,
+        preprocessing=os.getenv("PREPROCESSING", "direct"),
+        imgsz=int(os.getenv("MODEL_IMGSZ", 640)),
+        backend=os.getenv("INFERENCE_BACKEND", "torch"),
+    )
 
     try:
         while True:
-            frame = stream.get_frame()
-            current_time = time.time()
-
-            # Process frame every 0.5 seconds
-            if current_time - last_frame_time < frame_interval:
-                continue
-
-            last_frame_time = current_time
+            try:
+                with STAGE_SECONDS.labels("capture").time():
+                    frame = stream.get_frame()
+            except EndOfStream as e:
+                logger.info("%s", e)
+                break
+            FRAME_AGE.set(stream.last_latency)
 
             # Detect drowsiness and draw results
             frame, message = detector.process_frame(frame)
+            if headless:
+                continue
 
             # Display the frame with bounding boxes
             cv2.imshow("RTMP Stream with YOLO Detection", frame)
@@ -225,7 +653,11 @@ def main():
                 break
     finally:
         stream.release()
-        cv2.destroyAllWindows()
+        logger.info("Capture stats", extra=stream.stats())
+        event_streamer.close()
+        serial_link.close()
+        if not headless:
+            cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
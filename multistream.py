@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from edge.backends import load_model
+from main import (
+    BackendAuthenticator,
+    BackendEventStreamer,
+    DrowsinessDetector,
+    MODEL_FPS,
+    STAGE_SECONDS,
+    RTMPStream,
+)
+from telemetry.logs import setup_logging
+from telemetry.metrics import start_http_server
+
+load_dotenv()
+logger = logging.getLogger("multistream")
+
+
+class StreamWorker:
+    """Per-camera state: capture thread, event streamer and drowsiness state."""
+
+    def __init__(self, name, stream, detector):
+        self.name = name
+        self.stream = stream
+        self.detector = detector
+
+
+class MultiStreamInference:
+    """Runs one capture thread per stream and a shared, batched inference loop."""
+
+    def __init__(
+        self,
+        model_path,
+        max_batch_size=16,
+        target_fps=2.0,
+        preprocessing="direct",
+        imgsz=640,
+        backend="torch",
+    ):
+        self.model = load_model(model_path, backend)
+        self.preprocessing = preprocessing
+        self.imgsz = imgsz
+        self.max_batch_size = max_batch_size
+        self.target_fps = target_fps
+        self.workers = []
+
+        self.batches = 0
+        self.frames = 0
+        self.model_fps = 0.0
+
+    def add_stream(self, name, stream_url, event_streamer):
+        stream = RTMPStream(stream_url, threaded=True)
+        detector = DrowsinessDetector(
+            None,
+            event_streamer,
+            model=self.model,
+            serial_link=None,
+            draw_boxes=False,
+            preprocessing=self.preprocessing,
+            imgsz=self.imgsz,
+        )
+        self.workers.append(StreamWorker(name, stream, detector))
+
+    def step(self):
+        """Run one batched inference over every stream with a fresh frame."""
+        pending = []
+        for worker in list(self.workers):
+            try:
+                frame = worker.stream.poll_frame()
+            except Exception as e:
+                logger.warning("[%s] stream stopped: %s", worker.name, e)
+                self.workers.remove(worker)
+                self._release_worker(worker)
+                continue
+            if frame is not None:
+                pending.append((worker, frame))
+
+        for start in range(0, len(pending), self.max_batch_size):
+            chunk = pending[start : start + self.max_batch_size]
+            with STAGE_SECONDS.labels("preprocess").time():
+                images = [worker.detector.preprocess(frame) for worker, frame in chunk]
+            inference_start = time.perf_counter()
+            results = self.model.predict(
+                source=images, conf=0.5, imgsz=self.imgsz, verbose=False
+            )
+            inference = time.perf_counter() - inference_start
+            STAGE_SECONDS.labels("inference").observe(inference)
+            self.model_fps = 0.9 * self.model_fps + 0.1 * len(chunk) / max(
+                inference, 1e-6
+            )
+            MODEL_FPS.set(self.model_fps)
+
+            # Results come back in input order, one per image; handle_results
+            # records the postprocess and event_send stages itself
+            for (worker, frame), result in zip(chunk, results):
+                _, message = worker.detector.handle_results(frame, [result])
+                if message:
+                    logger.info("[%s] %s", worker.name, message)
+
+            self.batches += 1
+            self.frames += len(chunk)
+        return len(pending)
+
+    def run(self):
+        interval = 1.0 / self.target_fps if self.target_fps else 0.0
+        while self.workers:
+            started = time.monotonic()
+            self.step()
+            delay = interval - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def release(self):
+        for worker in self.workers:
+            self._release_worker(worker)
+
+    @staticmethod
+    def _release_worker(worker):
+        # Closing the streamer stops its sender thread and spool file; what
+        # is still spooled is sent when the stream is started again
+        worker.stream.release()
+        worker.detector.event_streamer.close()
+        logger.info("[%s] capture stats", worker.name, extra=worker.stream.stats())
+
+
+def load_streams_config(path):
+    """Read a JSON list of {"name", "stream_url", "email", "password"} entries."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    setup_logging()
+    if os.getenv("METRICS_PORT"):
+        start_http_server(int(os.getenv("METRICS_PORT")))
+
+    api_url = os.getenv("API_URL", "http://localhost:8000")
+    model_path = os.getenv("MODEL_PATH", "./yolo/best_with_100_epochs.pt")
+    config_path = os.getenv("STREAMS_CONFIG", "./streams.json")
+    spool_root = os.getenv("SPOOL_DIR", "./spool")
+
+    server = MultiStreamInference(
+        model_path,
+        max_batch_size=int(os.getenv("MAX_BATCH_SIZE", 16)),
+        target_fps=float(os.getenv("TARGET_FPS", 2)),
+        preprocessing=os.getenv("PREPROCESSING", "direct"),
+        imgsz=int(os.getenv("MODEL_IMGSZ", 640)),
+        backend=os.getenv("INFERENCE_BACKEND", "torch"),
+    )
+
+    for index, entry in enumerate(load_streams_config(config_path)):
+        name = entry.get("name", f"stream-{index}")
+        authenticator = BackendAuthenticator(api_url)
+        access_token = authenticator.login(entry["email"], entry["password"])
+        if not access_token:
+            logger.error("[%s] authentication failed, skipping stream", name)
+            continue
+
+        # Each stream gets its own spool so events are routed to its driver
+        event_streamer = BackendEventStreamer(
+            api_url,
+            access_token,
+            spool_dir=os.path.join(spool_root, name),
+            authenticator=authenticator,
+        )
+        server.add_stream(name, entry["stream_url"], event_streamer)
+
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+# Large event batches travel as one line
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+class ChannelRelay:
+    """Fans out newline-delimited messages between the server's workers.
+
+    Runs in its own process under server_run.py. Every line a worker sends
+    is forwarded to every other connected worker, never back to the sender.
+    The socket is bound by ``bind`` before workers start, so they can
+    connect right away and a restarted relay keeps the same socket.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sock = None
+        self.writers = set()
+
+    def bind(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(256)
+
+    async def serve(self):
+        if self.sock is None:
+            self.bind()
+        server = await asyncio.start_unix_server(
+            self._client, sock=self.sock, limit=LINE_LIMIT
+        )
+        async with server:
+            await server.serve_forever()
+
+    async def _client(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for other in list(self.writers):
+                    if other is not writer:
+                        other.write(line)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning("Dropping channel client: %s", e)
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+class Channel:
+    """A worker's connection to the relay, for keeping per-process state in sync.
+
+    ``publish`` sends a message to the other workers, never to this one, so
+    callers apply the change locally themselves. Handlers registered with
+    ``subscribe`` run on the event loop for messages from other workers.
+    Without a relay path (a single process) publishing is a no-op.
+    """
+
+    def __init__(self, path: str = None, reconnect_delay: float = 1.0):
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self.handlers = {}
+        self._reader = None
+        self._writer = None
+        self._task = None
+
+        self.sent = 0
+        self.received = 0
+
+    def subscribe(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        if not self.path:
+            return
+        await self._connect()
+        self._task = asyncio.create_task(self._run())
+
+    def publish(self, kind: str, data):
+        if self._writer is None:
+            return
+        line = json.dumps({"kind": kind, "data": data}, separators=(",", ":"))
+        self._writer.write(line.encode() + b"\n")
+        self.sent += 1
+
+    async def _connect(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(
+                    self.path, limit=LINE_LIMIT
+                )
+                self._reader = reader
+                return
+            except OSError as e:
+                logger.warning("Channel relay not reachable at %s: %s", self.path, e)
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def _run(self):
+        while True:
+            try:
+                line = await self._reader.readline()
+            except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+                logger.warning("Channel read failed: %s", e)
+                line = b""
+            if not line:
+                # Relay restarted; messages sent meanwhile are lost. Pushes
+                # are best effort and the caches fall back to their stores
+                self._writer.close()
+                self._writer = None
+                await self._connect()
+                continue
+
+            self.received += 1
+            message = json.loads(line)
+            handler = self.handlers.get(message["kind"])
+            if handler is None:
+                continue
+            try:
+                handler(message["data"])
+            except Exception as e:
+                logger.error("Channel handler for %s failed: %s", message["kind"], e)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._writer is not None,
+            "sent": self.sent,
+            "received": self.received,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
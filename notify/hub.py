@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from telemetry.metrics import Counter, Gauge
+
+PUSH_DELIVERED = Counter(
+    "push_messages_delivered_total", "Messages queued for push subscribers"
+)
+PUSH_DROPPED = Counter(
+    "push_subscribers_dropped_total", "Push subscribers disconnected for falling behind"
+)
+PUSH_SUBSCRIBERS = Gauge("push_subscribers", "Connected push subscribers")
+
+
+class HubFull(Exception):
+    """Raised when the hub already has its maximum number of subscribers."""
+
+
+class Message:
+    """A published event or SOS, serialized once and shared by every subscriber."""
+
+    __slots__ = ("topic", "user_id", "event_type", "data", "_sse")
+
+    def __init__(self, topic: str, payload: dict):
+        self.topic = topic
+        self.user_id = payload.get("user_id")
+        self.event_type = payload.get("event_type")
+        # published_at lets clients measure end-to-end delivery latency
+        self.data = json.dumps(
+            {"topic": topic, "published_at": time.time(), **payload}, default=str
+        )
+        self._sse = None
+
+    @property
+    def sse(self) -> str:
+        if self._sse is None:
+            self._sse = f"event: {self.topic}\ndata: {self.data}\n\n"
+        return self._sse
+
+
+class Subscription:
+    """Bounded queue of messages for one connected client.
+
+    ``None`` filters match everything. When the queue overflows the client
+    is dropped: its pending messages are discarded and ``get`` returns
+    ``None`` so the connection can be closed.
+    """
+
+    def __init__(self, topics=None, user_ids=None, event_types=None, max_queue=256):
+        self.topics = topics
+        self.user_ids = user_ids
+        self.event_types = event_types
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+        self.active = False
+
+    def matches(self, message: Message) -> bool:
+        if self.topics is not None and message.topic not in self.topics:
+            return False
+        # SOS messages carry no event type and pass event type filters
+        if (
+            self.event_types is not None
+            and message.event_type is not None
+            and message.event_type not in self.event_types
+        ):
+            return False
+        return True
+
+    def offer(self, message: Message) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.drop()
+            return False
+
+    def drop(self):
+        if self.dropped:
+            return
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """In-process fan-out of events and SOS to WebSocket and SSE clients.
+
+    Publishing never blocks: each message is encoded once and offered to
+    every matching subscriber's queue, and subscribers that cannot keep up
+    are dropped rather than slowing the publisher. Subscribers are indexed
+    by user so a publish only visits clients that can match it. Must be
+    used from the event loop thread.
+    """
+
+    def __init__(self, max_queue: int = 256, max_subscribers: int = 10000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._by_user = {}
+        self._any_user = set()
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        PUSH_SUBSCRIBERS.set_function(lambda: self.subscribers)
+
+    def subscribe(self, topics=None, user_ids=None, event_types=None) -> Subscription:
+        if self.subscribers >= self.max_subscribers:
+            raise HubFull("Too many push subscribers, retry later")
+        subscription = Subscription(topics, user_ids, event_types, self.max_queue)
+        if user_ids is None:
+            self._any_user.add(subscription)
+        else:
+            for user_id in user_ids:
+                self._by_user.setdefault(user_id, set()).add(subscription)
+        subscription.active = True
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if not subscription.active:
+            return
+        subscription.active = False
+        if subscription.user_ids is None:
+            self._any_user.discard(subscription)
+        else:
+            for user_id in subscription.user_ids:
+                subscribers = self._by_user.get(user_id, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._by_user.pop(user_id, None)
+        self.subscribers -= 1
+
+    def publish(self, topic: str, payload: dict) -> int:
+        """Offer a message to matching subscribers, returning how many got it."""
+        self.published += 1
+        candidates = self._by_user.get(payload.get("user_id"), ())
+        if not candidates and not self._any_user:
+            return 0
+
+        message = Message(topic, payload)
+        delivered = 0
+        for subscribers in (self._any_user, candidates):
+            for subscription in subscribers:
+                if subscription.dropped or not subscription.matches(message):
+                    continue
+                if subscription.offer(message):
+                    delivered += 1
+                else:
+                    self.dropped += 1
+                    PUSH_DROPPED.inc()
+        self.delivered += delivered
+        PUSH_DELIVERED.inc(delivered)
+        return delivered
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "max_subscribers": self.max_subscribers,
+            "max_queue": self.max_queue,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped,
+        }
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from telemetry.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_SECONDS = Histogram(
+    "webhook_delivery_seconds", "Duration of outbound webhook requests", ["topic"]
+)
+WEBHOOK_DELIVERIES = Counter(
+    "webhook_deliveries_total", "Outbound webhook attempts by outcome", ["outcome"]
+)
+
+
+class WebhookQueue:
+    """Durable queue of outbound webhook deliveries in SQLite.
+
+    Rows are claimed with a lease instead of being removed, and only deleted
+    once the target acknowledged them, so deliveries interrupted by a crash
+    are retried after the lease expires. Rows that exhaust their attempts
+    are kept with status 'dead' for inspection.
+    """
+
+    def __init__(self, path: str = "./webhooks.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps enqueues cheap: no fsync per commit, still crash-safe
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS deliveries_due
+            ON deliveries (status, target, topic, next_attempt)
+            """)
+        self._conn.commit()
+
+    def put_many(self, rows: list):
+        """Insert (target, topic, payload) rows in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO deliveries "
+                "(target, topic, payload, next_attempt, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(target, topic, payload, now, now) for target, topic, payload in rows],
+            )
+            self._conn.commit()
+
+    def claim(self, target: str, topic: str, limit: int, lease: float) -> list:
+        """Lease up to ``limit`` due rows, returning (id, attempts, payload)."""
+        now = time.time()
+        with self._lock:
+            # Server workers share the file; the write lock keeps two of
+            # them from leasing the same rows
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, attempts, payload FROM deliveries "
+                    "WHERE status = 'pending' AND target = ? AND topic = ? "
+                    "AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+                    (target, topic, now, limit),
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE deliveries SET next_attempt = ? WHERE id = ?",
+                        [(now + lease, row[0]) for row in rows],
+                    )
+                self._conn.commit()
+            except Exception:
+                # Left open, the transaction would fail every later claim
+                self._conn.rollback()
+                raise
+        return rows
+
+    def ack(self, ids: list):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM deliveries WHERE id = ?", [(id,) for id in ids]
+            )
+            self._conn.commit()
+
+    def retry(self, ids: list, delay: float, error: str):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE deliveries SET attempts = attempts + 1, "
+                "next_attempt = ?, last_error = ? WHERE id = ?",
+                [(time.time() + delay, error, id) for id in ids],
+            )
+            self._conn.commit()
+
+    def bury(self, ids: list, error: str):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE deliveries SET status = 'dead', attempts = attempts + 1, "
+                "last_error = ? WHERE id = ?",
+                [(error, id) for id in ids],
+            )
+            self._conn.commit()
+
+    def counts(self) -> dict:
+        """Row counts by status and topic, e.g. {"pending": {"sos": 2}}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, topic, COUNT(*) FROM deliveries GROUP BY status, topic"
+            ).fetchall()
+        counts = {}
+        for status, topic, count in rows:
+            counts.setdefault(status, {})[topic] = count
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+
+class DeliveryError(Exception):
+    """A failed delivery; ``retry`` is False when resending cannot help."""
+
+    def __init__(self, message: str, retry: bool = True, retry_after: float = None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class WebhookDispatcher:
+    """Delivers stored events and SOS to external HTTP endpoints.
+
+    Routes only await ``enqueue``, which writes to the durable queue and
+    wakes the workers. SQLite calls run in threads, never on the event
+    loop; ``stats`` reports queue counts refreshed every ``stats_interval``
+    seconds. Each target gets its own SOS lane, which sends every alert as
+    soon as it arrives, and an event lane, which waits up to ``batch_delay``
+    and posts events as a JSON array of up to ``batch_size``. Each lane
+    runs ``concurrency`` workers, so a slow target neither delays other
+    targets nor holds SOS alerts behind event batches. Failed deliveries
+    back off exponentially until ``max_attempts``, then are marked dead.
+    """
+
+    def __init__(
+        self,
+        targets: dict,
+        queue_path: str = "./webhooks.db",
+        concurrency: int = 4,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        timeout: float = 5.0,
+        max_attempts: int = 10,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        stats_interval: float = 5.0,
+    ):
+        self.queue_path = queue_path
+        self.queue = None
+        # {"event": [url, ...], "sos": [url, ...]}
+        self.targets = {topic: list(urls) for topic, urls in targets.items() if urls}
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats_interval = stats_interval
+        # A claimed row is retried if it is not resolved within the lease
+        self.lease = timeout * 2 + 5
+
+        lanes = sum(len(urls) for urls in self.targets.values()) * concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(lanes, 1), thread_name_prefix="webhook"
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(lanes, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._wakeups = {}
+        self._tasks = []
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        # Last queue.counts(), so scrapes never query SQLite on the loop
+        self.queue_counts = {}
+
+    async def enqueue(self, topic: str, payloads: list):
+        """Durably queue payloads for every target subscribed to ``topic``."""
+        urls = self.targets.get(topic)
+        if not urls or not payloads or self.queue is None:
+            return
+        encoded = [json.dumps(payload, default=str) for payload in payloads]
+        await asyncio.to_thread(
+            self.queue.put_many,
+            [(url, topic, payload) for url in urls for payload in encoded],
+        )
+        self.enqueued += len(encoded) * len(urls)
+        for url in urls:
+            wakeup = self._wakeups.get((url, topic))
+            if wakeup is not None:
+                wakeup.set()
+
+    def start(self):
+        """Open the queue and start the workers; a no-op without targets."""
+        if not self.targets:
+            return
+        self.queue = WebhookQueue(self.queue_path)
+        self._tasks.append(asyncio.create_task(self._refresh_counts()))
+        for topic, urls in self.targets.items():
+            for url in urls:
+                wakeup = self._wakeups[(url, topic)] = asyncio.Event()
+                wakeup.set()
+                self._tasks += [
+                    asyncio.create_task(self._worker(url, topic, wakeup))
+                    for _ in range(self.concurrency)
+                ]
+
+    @property
+    def pending(self) -> int:
+        return sum(self.queue_counts.get("pending", {}).values())
+
+    async def _refresh_counts(self):
+        while True:
+            try:
+                self.queue_counts = await asyncio.to_thread(self.queue.counts)
+            except Exception as e:
+                logger.warning("Could not count queued webhooks: %s", e)
+            await asyncio.sleep(self.stats_interval)
+
+    async def _worker(self, url: str, topic: str, wakeup: asyncio.Event):
+        limit = self.batch_size if topic == "event" else 1
+        while True:
+            try:
+                # Poll now and then for retries that became due
+                await asyncio.wait_for(wakeup.wait(), timeout=self.backoff)
+            except asyncio.TimeoutError:
+                pass
+            if topic == "event":
+                # Let events accumulate into a batch; SOS never wait
+                await asyncio.sleep(self.batch_delay)
+
+            try:
+                while True:
+                    rows = await asyncio.to_thread(
+                        self.queue.claim, url, topic, limit, self.lease
+                    )
+                    if not rows:
+                        wakeup.clear()
+                        break
+                    await self._deliver(url, topic, rows)
+            except Exception as e:
+                # Leased rows are picked up again once the lease expires
+                logger.error("Webhook worker for %s failed: %s", url, e)
+
+    async def _deliver(self, url: str, topic: str, rows: list):
+        ids = [row[0] for row in rows]
+        if topic == "event":
+            body = "[" + ",".join(row[2] for row in rows) + "]"
+        else:
+            body = rows[0][2]
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Topic": topic,
+            # Delivery is at-least-once; receivers can dedupe on this
+            "X-Delivery-Id": ",".join(str(id) for id in ids),
+        }
+
+        loop = asyncio.get_running_loop()
+        try:
+            with WEBHOOK_SECONDS.labels(topic).time():
+                await loop.run_in_executor(
+                    self.executor, self._post, url, body, headers
+                )
+        except DeliveryError as e:
+            attempts = max(row[1] for row in rows) + 1
+            if not e.retry or attempts >= self.max_attempts:
+                await asyncio.to_thread(self.queue.bury, ids, str(e))
+                self.dead += len(ids)
+                WEBHOOK_DELIVERIES.labels("dead").inc(len(ids))
+                logger.error(
+                    "Giving up on %d %s webhook(s) to %s: %s", len(ids), topic, url, e
+                )
+                return
+            delay = min(self.backoff * 2**attempts, self.max_backoff)
+            delay = max(delay * random.uniform(0.5, 1.0), e.retry_after or 0)
+            await asyncio.to_thread(self.queue.retry, ids, delay, str(e))
+            self.retried += len(ids)
+            WEBHOOK_DELIVERIES.labels("retry").inc(len(ids))
+            logger.warning("Webhook to %s failed, retrying in %.1fs: %s", url, delay, e)
+        else:
+            await asyncio.to_thread(self.queue.ack, ids)
+            self.delivered += len(ids)
+            WEBHOOK_DELIVERIES.labels("delivered").inc(len(ids))
+
+    def _post(self, url: str, body: str, headers: dict):
+        try:
+            response = self.session.post(
+                url, data=body.encode(), headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}")
+        if response.status_code < 300:
+            return
+        retry_after = response.headers.get("Retry-After", "")
+        raise DeliveryError(
+            f"HTTP {response.status_code}",
+            # Other client errors will be rejected again however often we retry
+            retry=response.status_code >= 500 or response.status_code in (408, 429),
+            retry_after=float(retry_after) if retry_after.isdigit() else None,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "targets": self.targets,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead": self.dead,
+            "queue": self.queue_counts,
+        }
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        if self.queue is not None:
+            self.queue.close()
@@ -1,14 +1,30 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Response
+from fastapi import WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from db.Handler import InfluxDBHandler
+from db.async_storage import AsyncStorage, CircuitBreaker, StorageUnavailable
+from db.geo_index import SOSGeoIndex
+from db.storage import open_storage
+from db.write_buffer import WriteBufferFull
 from db.user_handler import UserHandler
 from auth.jwt_handler import AuthHandler
+from auth.password_pool import PasswordPool, PasswordPoolBusy
+from notify.channel import Channel
+from notify.hub import EventHub, HubFull
+from notify.webhooks import WebhookDispatcher, WebhookQueue
+from telemetry.logs import setup_logging
+from telemetry.metrics import CONTENT_TYPE, REGISTRY, Gauge, Histogram
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 import os
+import time
+import zlib
 
 load_dotenv()
-app = FastAPI()
 
 # Database Configuration
 INFLUXDB_HOST = os.getenv("INFLUXDB_HOST")
@@ -16,34 +32,338 @@ INFLUXDB_PORT = int(os.getenv("INFLUXDB_PORT", 8086))
 INFLUXDB_USERNAME = os.getenv("INFLUXDB_USERNAME")
 INFLUXDB_PASSWORD = os.getenv("INFLUXDB_PASSWORD")
 INFLUXDB_DATABASE = os.getenv("INFLUXDB_DATABASE")
+EVENT_BATCH_MAX_SIZE = int(os.getenv("EVENT_BATCH_MAX_SIZE", 10000))
+# Largest decoded /events/batch body, so a small gzip bomb cannot exhaust memory
+EVENT_BATCH_MAX_BYTES = int(os.getenv("EVENT_BATCH_MAX_BYTES", 16 * 1024 * 1024))
+# "memory" serves the API from an in-process store, e.g. for load tests
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "influxdb")
+# Users allowed to subscribe to every driver's events, e.g. dispatch desks
+DISPATCHER_USER_IDS = set(filter(None, os.getenv("DISPATCHER_USER_IDS", "").split(",")))
+PUSH_KEEPALIVE = float(os.getenv("PUSH_KEEPALIVE", 15))
+# How often rollups are recomputed for hours that received late events
+ROLLUP_BACKFILL_INTERVAL = float(os.getenv("ROLLUP_BACKFILL_INTERVAL", 60))
+# Comma-separated webhook URLs notified of every stored event / SOS
+HTTP_EVENT_API = os.getenv("HTTP_EVENT_API", "")
+HTTP_SOS_API = os.getenv("HTTP_SOS_API", "")
+
+# Set by server_run.py when it runs several worker processes
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+CHANNEL_PATH = os.getenv("CHANNEL_PATH")
+# Set to 0 by server_run.py, which runs setup_storage() once before forking
+STORAGE_SETUP = os.getenv("STORAGE_SETUP", "1") != "0"
+
+# Per-process components, created in lifespan() so that server_run.py can
+# import the app once and fork workers before any thread, connection or
+# file handle exists
+db_handler = analytics = user_handler = storage = None
+password_pool = hub = webhooks = channel = sos_index = None
+
+
+def create_components():
+    global db_handler, analytics, user_handler, storage
+    global password_pool, hub, webhooks, channel, sos_index
+
+    db_handler, analytics = open_storage(STORAGE_BACKEND)
+    user_handler = UserHandler(db_handler)
+
+    # Routes await the database through this instead of calling blocking code
+    storage = AsyncStorage(
+        db_handler,
+        max_workers=int(os.getenv("INFLUXDB_POOL_SIZE", 10)),
+        timeout=float(os.getenv("INFLUXDB_TIMEOUT", 5)),
+        retries=int(os.getenv("INFLUXDB_RETRIES", 3)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("INFLUXDB_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("INFLUXDB_BREAKER_RESET", 30)),
+        ),
+    )
+
+    # bcrypt hashing and verification run here, off the event loop
+    password_pool = PasswordPool(
+        max_workers=int(os.getenv("PASSWORD_WORKERS", 4)),
+        max_pending=int(os.getenv("PASSWORD_MAX_PENDING", 64)),
+    )
+
+    # Stored events and SOS are pushed to WebSocket and SSE subscribers from here
+    hub = EventHub(
+        max_queue=int(os.getenv("PUSH_MAX_QUEUE", 256)),
+        max_subscribers=int(os.getenv("PUSH_MAX_SUBSCRIBERS", 10000)),
+    )
+
+    # Routes only enqueue webhooks; delivery and retries happen in the
+    # background. Every worker delivers, so they split the per-target limit
+    webhooks = WebhookDispatcher(
+        targets={
+            "event": list(filter(None, HTTP_EVENT_API.split(","))),
+            "sos": list(filter(None, HTTP_SOS_API.split(","))),
+        },
+        queue_path=os.getenv("WEBHOOK_QUEUE_PATH", "./webhooks.db"),
+        concurrency=max(int(os.getenv("WEBHOOK_CONCURRENCY", 4)) // WEB_CONCURRENCY, 1),
+        batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", 100)),
+        batch_delay=float(os.getenv("WEBHOOK_BATCH_DELAY", 1)),
+        timeout=float(os.getenv("WEBHOOK_TIMEOUT", 5)),
+        max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 10)),
+    )
+
+    # Recent SOS locations for map queries, kept current from announce()
+    sos_index = SOSGeoIndex(
+        precision=int(os.getenv("SOS_INDEX_PRECISION", 5)),
+        window=float(os.getenv("SOS_INDEX_DAYS", 7)) * 86400,
+        max_size=int(os.getenv("SOS_INDEX_SIZE", 1000000)),
+    )
+
+    # Tells the other workers about new users, events and SOS so their
+    # caches and push subscribers stay in sync with this one
+    channel = Channel(CHANNEL_PATH)
+    channel.subscribe("user", lambda data: user_handler.repository.load(data))
+    channel.subscribe("event", lambda data: apply_remote("event", data))
+    channel.subscribe("sos", lambda data: apply_remote("sos", data))
+
+
+def apply_remote(topic: str, payloads: list):
+    """Mirror events and SOS stored by another worker in this one."""
+    for payload in payloads:
+        if topic == "event":
+            db_handler.remember_event(payload["event_id"], payload["user_id"])
+        hub.publish(topic, payload)
+    if topic == "sos":
+        sos_index.add_many(payloads)
+
+
+async def announce(topic: str, payloads: list):
+    """Push stored records to local subscribers, webhooks and other workers.
+
+    The records are already stored, so a failure here is logged rather than
+    failing the request, which the client would retry into a duplicate.
+    """
+    for payload in payloads:
+        hub.publish(topic, payload)
+    if topic == "sos":
+        sos_index.add_many(payloads)
+    try:
+        await webhooks.enqueue(topic, payloads)
+    except Exception as e:
+        logger.error(f"Webhooks not queued for {len(payloads)} {topic} record(s): {e}")
+    channel.publish(topic, payloads)
+
+
+def setup_storage():
+    """Create the database, rollups and SQLite tables the workers share.
+
+    Run by the server at startup, or by server_run.py once before forking so
+    workers do not race each other into "database is locked" errors.
+    """
+    db_handler, analytics = open_storage(STORAGE_BACKEND)
+    try:
+        try:
+            db_handler.setup()
+            # Dashboards and /stats read these rollups instead of raw points
+            analytics.ensure_rollups()
+        except Exception as e:
+            logger.warning(f"InfluxDB not ready at startup, writes are buffered: {e}")
+        user_handler = UserHandler(db_handler)
+        user_handler.setup()
+        user_handler.repository.close()
+        if HTTP_EVENT_API or HTTP_SOS_API:
+            WebhookQueue(os.getenv("WEBHOOK_QUEUE_PATH", "./webhooks.db")).close()
+    finally:
+        db_handler.close()
+
+
+async def backfill_rollups():
+    """Recompute rollups for hours that received events the continuous
+    queries had already passed, e.g. an edge spool replayed after an outage."""
+    while True:
+        await asyncio.sleep(ROLLUP_BACKFILL_INTERVAL)
+        try:
+            await asyncio.to_thread(analytics.backfill_late, ROLLUP_BACKFILL_INTERVAL)
+        except Exception as e:
+            logger.warning(f"Rollup backfill failed, retrying later: {e}")
 
-# Initialize Handlers
-db_handler = InfluxDBHandler()
-user_handler = UserHandler(db_handler)
 
 # Logging Setup
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Metrics Setup
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting in in-process queues", ["queue"])
+QUEUE_DEPTH.labels("password_pool").set_function(lambda: password_pool.pending)
+# Skipped at scrape time by backends without a write buffer
+QUEUE_DEPTH.labels("write_buffer").set_function(
+    lambda: db_handler.write_buffer.stats()["queue_depth"]
+)
+QUEUE_DEPTH.labels("webhooks").set_function(lambda: webhooks.pending)
+CIRCUIT_OPEN = Gauge("influxdb_circuit_open", "1 while the storage circuit is open")
+CIRCUIT_OPEN.set_function(lambda: storage.breaker.state == "open")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One-time startup, run by the server rather than on import
+    create_components()
+    await channel.start()
+    if STORAGE_SETUP:
+        await asyncio.to_thread(setup_storage)
+    try:
+        # Not through storage.call: a week of SOS can outlast its timeout
+        now = time.time()
+        sos_index.add_many(
+            await asyncio.to_thread(db_handler.recent_sos, now - sos_index.window, now)
+        )
+    except Exception as e:
+        logger.warning(f"SOS map index not rebuilt, starting empty: {e}")
+    webhooks.start()
+    backfill_task = asyncio.create_task(backfill_rollups())
+
+    yield
+
+    backfill_task.cancel()
+    await channel.close()
+    await webhooks.close()
+    # Drain buffered points before the process exits
+    await storage.close()
+    password_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), status
+        ).observe(time.perf_counter() - start)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
+
+def component_stats(owner, name: str) -> dict:
+    """Stats of an optional storage component, 404 if the backend has none."""
+    component = getattr(owner, name, None)
+    if component is None:
+        raise HTTPException(
+            status_code=404, detail=f"No {name} in the {STORAGE_BACKEND} backend"
+        )
+    return component.stats()
+
+
+@app.get("/metrics/write-buffer")
+async def write_buffer_metrics():
+    return component_stats(db_handler, "write_buffer")
+
+
+@app.get("/metrics/event-index")
+async def event_index_metrics():
+    return component_stats(db_handler, "event_index")
+
+
+@app.get("/metrics/token-cache")
+async def token_cache_metrics():
+    return AuthHandler.claims_cache.stats()
+
+
+@app.get("/metrics/storage")
+async def storage_metrics():
+    return storage.stats()
+
+
+@app.get("/metrics/stats-cache")
+async def stats_cache_metrics():
+    return component_stats(analytics, "cache")
+
+
+@app.get("/metrics/late-writes")
+async def late_writes_metrics():
+    return component_stats(db_handler, "late_writes")
+
+
+@app.get("/metrics/password-pool")
+async def password_pool_metrics():
+    return password_pool.stats()
+
+
+@app.get("/metrics/push")
+async def push_metrics():
+    return hub.stats()
+
+
+@app.get("/metrics/webhooks")
+async def webhook_metrics():
+    return webhooks.stats()
+
+
+@app.get("/metrics/channel")
+async def channel_metrics():
+    return channel.stats()
+
+
+@app.get("/metrics/sos-index")
+async def sos_index_metrics():
+    return sos_index.stats()
+
 
 @app.post("/register")
 async def register_user(user_data: dict):
     try:
-        user_id = user_handler.create_user(user_data)
+        user_id = await password_pool.run(user_handler.create_user, user_data)
+        channel.publish("user", user_id)
         return {"status": "success", "user_id": user_id}
+    except PasswordPoolBusy as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/token")
 async def login_for_access_token(form_data: dict):
-    user = user_handler.authenticate_user(
-        form_data.get("email"), form_data.get("password")
-    )
+    try:
+        user = await password_pool.run(
+            user_handler.authenticate_user,
+            form_data.get("email"),
+            form_data.get("password"),
+        )
+    except PasswordPoolBusy as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
     access_token = AuthHandler.create_access_token(data={"sub": user["user_id"]})
+    refresh_token = AuthHandler.create_refresh_token(data={"sub": user["user_id"]})
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+@app.post("/token/refresh")
+async def refresh_access_token(form_data: dict):
+    # Long-running edge clients renew access tokens here instead of logging in
+    refresh_token = form_data.get("refresh_token")
+    if not refresh_token:
+        raise HTTPException(status_code=400, detail="Missing 'refresh_token'")
+    access_token = AuthHandler.refresh_access_token(refresh_token)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -64,7 +384,7 @@ async def handle_event(
             )
 
         # Write the event to InfluxDB
-        event_id = db_handler.write_event(user_id, event_type, confidence)
+        event_id = await storage.write_event(user_id, event_type, confidence)
 
         # Publish event to external HTTP API
         payload = {
@@ -73,20 +393,93 @@ async def handle_event(
             "confidence": confidence,
             "event_id": event_id,
         }
-        # try:
-        #            response = requests.post(HTTP_EVENT_API, json=payload)
-        # response.raise_for_status()
-        # logger.info(f"Event published to HTTP API: {response.json()}")
-        # except requests.RequestException as e:
-        #    logger.error(f"Failed to publish event: {e}")
-        #    raise HTTPException(status_code=502, detail="Failed to notify HTTP API")
+        await announce("event", [payload])
 
         return {"status": "success", "published_event": payload}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WriteBufferFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except Exception as e:
         # raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
         raise e
 
 
+class BatchTooLarge(Exception):
+    """Raised when a batch body decodes to more than EVENT_BATCH_MAX_BYTES."""
+
+
+def decode_event_batch(body: bytes, content_type: str, content_encoding: str):
+    """Decode a JSON array or NDJSON body, optionally gzip-compressed."""
+    if "gzip" in content_encoding:
+        decompressor = zlib.decompressobj(wbits=31)
+        # One byte past the limit is enough to know the body is too large
+        body = decompressor.decompress(body, EVENT_BATCH_MAX_BYTES + 1)
+        if len(body) <= EVENT_BATCH_MAX_BYTES and not decompressor.eof:
+            raise EOFError("Truncated gzip body")
+    if len(body) > EVENT_BATCH_MAX_BYTES:
+        raise BatchTooLarge(f"Batch exceeds {EVENT_BATCH_MAX_BYTES} bytes")
+    if "ndjson" in content_type:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    events = json.loads(body)
+    if not isinstance(events, list):
+        raise ValueError("Expected a JSON array of events")
+    return events
+
+
+# Batch Event Route
+@app.post("/events/batch")
+async def handle_event_batch(
+    request: Request, current_user: dict = Depends(AuthHandler.get_current_user)
+):
+    user_id = current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=400, detail="Missing 'user_id'")
+
+    try:
+        # Decompressing and parsing is CPU-bound, so off the event loop
+        events = await run_in_threadpool(
+            decode_event_batch,
+            await request.body(),
+            request.headers.get("content-type", ""),
+            request.headers.get("content-encoding", ""),
+        )
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (OSError, ValueError, EOFError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+
+    if len(events) > EVENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {EVENT_BATCH_MAX_SIZE} events",
+        )
+
+    try:
+        event_ids = await storage.write_events(user_id, events)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WriteBufferFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+
+    payloads = [
+        {
+            "user_id": user_id,
+            "event_type": event.get("event_type"),
+            "confidence": event.get("confidence", 0.0),
+            "event_id": event_id,
+            "timestamp": event.get("timestamp"),
+        }
+        for event, event_id in zip(events, event_ids)
+    ]
+    await announce("event", payloads)
+    return {"status": "success", "count": len(event_ids), "event_ids": event_ids}
+
+
 # SOS Route
 @app.post("/sos/")
 async def handle_sos(
@@ -104,29 +497,451 @@ async def handle_sos(
             raise HTTPException(status_code=400, detail="Missing required fields")
 
         # Write SOS to InfluxDB
-        db_handler.write_sos(user_id, event_id, message, latitude, longitude)
+        sos_id = await storage.write_sos(
+            user_id, event_id, message, latitude, longitude
+        )
 
         # Notify external HTTP API
         payload = {
             "user_id": user_id,
             "event_id": event_id,
+            "sos_id": sos_id,
             "message": message,
             "latitude": latitude,
             "longitude": longitude,
         }
-        # try:
-        #            response = requests.post(HTTP_SOS_API, json=payload)
-        #            response.raise_for_status()
-        # logger.info(f"SOS notification sent to HTTP API: {response.json()}")
-        # except requests.RequestException as e:
-        #    logger.error(f"Failed to send SOS notification: {e}")
-        #    raise HTTPException(status_code=502, detail="Failed to notify HTTP API")
-
-        return {"status": "SOS sent", "message": message}
+        await announce("sos", [payload])
+
+        return {"status": "SOS sent", "message": message, "sos_id": sos_id}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WriteBufferFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+def split_filter(value: str):
+    """Comma-separated query values as a set, None (match all) when empty."""
+    values = {item.strip() for item in (value or "").split(",") if item.strip()}
+    return values or None
+
+
+def open_subscription(token: str, user_id: str, event_type: str, topic: str):
+    """Authenticate a push client and subscribe it to the hub.
+
+    Drivers only receive their own events and SOS; users listed in
+    DISPATCHER_USER_IDS may watch any or all drivers.
+    """
+    claims = AuthHandler.jwt_bearer.verify_jwt(token) if token else None
+    if claims is None or not claims.get("sub"):
+        raise HTTPException(status_code=403, detail="Invalid token or expired token.")
+
+    user_ids = split_filter(user_id)
+    if claims["sub"] not in DISPATCHER_USER_IDS:
+        if user_ids is None:
+            user_ids = {claims["sub"]}
+        elif user_ids != {claims["sub"]}:
+            raise HTTPException(
+                status_code=403, detail="Not allowed to watch other users"
+            )
+
+    topics = split_filter(topic)
+    if topics is not None and not topics <= {"event", "sos"}:
+        raise HTTPException(status_code=400, detail="Topics are 'event' and 'sos'")
+    try:
+        return hub.subscribe(
+            topics=topics, user_ids=user_ids, event_types=split_filter(event_type)
+        )
+    except HubFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+
+
+# Push Routes; browsers cannot set headers on EventSource or WebSocket, so
+# the access token may also be passed as ?token=
+@app.get("/push/sse")
+async def push_sse(
+    request: Request,
+    token: str = None,
+    user_id: str = None,
+    event_type: str = None,
+    topic: str = None,
+):
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.startswith("Bearer "):
+        token = authorization[len("Bearer ") :]
+    subscription = open_subscription(token, user_id, event_type, topic)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.get(), timeout=PUSH_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing idle streams
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield 'event: dropped\ndata: {"reason": "too slow"}\n\n'
+                    break
+                yield message.sse
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/push/ws")
+async def push_websocket(
+    websocket: WebSocket,
+    token: str = None,
+    user_id: str = None,
+    event_type: str = None,
+    topic: str = None,
+):
+    try:
+        subscription = open_subscription(token, user_id, event_type, topic)
+    except HTTPException as e:
+        # 1008: policy violation, 1013: try again later
+        await websocket.close(
+            code=1008 if e.status_code < 500 else 1013, reason=str(e.detail)
+        )
+        return
+    await websocket.accept()
+
+    async def forward():
+        while True:
+            message = await subscription.get()
+            if message is None:
+                await websocket.close(code=1013, reason="Subscriber too slow")
+                return
+            await websocket.send_text(message.data)
+
+    async def wait_for_disconnect():
+        # Clients only listen; anything they send is ignored
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hub.unsubscribe(subscription)
+
+
+def stats_range(start: float, end: float = None):
+    """Resolve the requested time range, defaulting the end to now."""
+    return start, end if end is not None else time.time()
+
+
+# Aggregated Stats Routes, served from the rollup measurements
+@app.get("/stats/events")
+async def event_stats(
+    start: float,
+    end: float = None,
+    resolution: str = "1h",
+    event_type: str = None,
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    start, end = stats_range(start, end)
+    try:
+        buckets = await storage.call(
+            analytics.event_stats,
+            resolution,
+            start,
+            end,
+            user_id=current_user.get("sub"),
+            event_type=event_type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+    return {"resolution": resolution, "start": start, "end": end, "buckets": buckets}
+
+
+@app.get("/stats/event-types")
+async def event_type_stats(
+    start: float,
+    end: float = None,
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    start, end = stats_range(start, end)
+    try:
+        totals = await storage.call(
+            analytics.event_type_totals, start, end, user_id=current_user.get("sub")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+    return {"start": start, "end": end, "totals": totals}
+
+
+@app.get("/stats/sos")
+async def sos_stats(
+    start: float,
+    end: float = None,
+    resolution: str = "1h",
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    start, end = stats_range(start, end)
+    try:
+        buckets = await storage.call(
+            analytics.sos_stats,
+            resolution,
+            start,
+            end,
+            user_id=current_user.get("sub"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+    return {"resolution": resolution, "start": start, "end": end, "buckets": buckets}
+
+
+# History pages read per request; NDJSON streams keep fetching pages of this
+# size until the range is exhausted or the time budget is spent
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 500))
+HISTORY_STREAM_BUDGET = float(os.getenv("HISTORY_STREAM_BUDGET", 30))
+
+
+def history_user(user_id: str, current_user: dict) -> str:
+    """Drivers read their own history; dispatchers may read anyone's."""
+    sub = current_user.get("sub")
+    if user_id != sub and sub not in DISPATCHER_USER_IDS:
+        raise HTTPException(status_code=403, detail="Not allowed to read other users")
+    return user_id
+
+
+async def fetch_history(fetch, user_id, start, end, cursor, limit, fields):
+    try:
+        return await storage.call(
+            fetch, user_id, start, end, cursor=cursor, limit=limit, fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+
+
+async def history_response(
+    request: Request, fetch, user_id, start, end, cursor, limit, fields, format
+):
+    """A JSON page, or every page of the range as chunked NDJSON.
+
+    Pages are fetched one at a time with cursor pagination, so a stream over
+    months of history holds a single page in memory. A stream that runs out
+    of HISTORY_STREAM_BUDGET ends with a {"next_cursor": ...} line to resume
+    from; a complete one ends without it.
+    """
+    fields = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    limit = limit or HISTORY_PAGE_SIZE
+    # The first page is read up front so bad input still maps to 400 / 503
+    items, next_cursor = await fetch_history(
+        fetch, user_id, start, end, cursor, limit, fields
+    )
+    ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get(
+        "accept", ""
+    )
+    if not ndjson:
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def stream():
+        nonlocal items, next_cursor
+        deadline = time.monotonic() + HISTORY_STREAM_BUDGET
+        while True:
+            if items:
+                yield "".join(json.dumps(item) + "\n" for item in items)
+            if next_cursor is None:
+                return
+            if time.monotonic() > deadline or await request.is_disconnected():
+                break
+            try:
+                items, next_cursor = await storage.call(
+                    fetch,
+                    user_id,
+                    start,
+                    end,
+                    cursor=next_cursor,
+                    limit=limit,
+                    fields=fields,
+                )
+            except StorageUnavailable as e:
+                logger.warning("History stream for %s cut short: %s", user_id, e)
+                break
+        yield json.dumps({"next_cursor": next_cursor}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# History Routes: raw events and SOS messages of one driver, oldest first.
+# Times are epoch seconds in the query and epoch nanoseconds in the rows
+@app.get("/users/{user_id}/events")
+async def user_event_history(
+    request: Request,
+    user_id: str,
+    start: float,
+    end: float,
+    cursor: str = None,
+    limit: int = None,
+    fields: str = None,
+    format: str = "json",
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    return await history_response(
+        request,
+        db_handler.event_history,
+        history_user(user_id, current_user),
+        start,
+        end,
+        cursor,
+        limit,
+        fields,
+        format,
+    )
+
+
+@app.get("/users/{user_id}/sos")
+async def user_sos_history(
+    request: Request,
+    user_id: str,
+    start: float,
+    end: float,
+    cursor: str = None,
+    limit: int = None,
+    fields: str = None,
+    format: str = "json",
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    return await history_response(
+        request,
+        db_handler.sos_history,
+        history_user(user_id, current_user),
+        start,
+        end,
+        cursor,
+        limit,
+        fields,
+        format,
+    )
+
+
+# Largest result set a map query may ask for
+SOS_QUERY_MAX_RESULTS = int(os.getenv("SOS_QUERY_MAX_RESULTS", 5000))
+
+
+async def query_sos_index(method, current_user: dict, *args, **kwargs):
+    """Run a map query; drivers only see their own SOS, dispatchers all."""
+    sub = current_user.get("sub")
+    if sub not in DISPATCHER_USER_IDS:
+        kwargs["user_id"] = sub
+    if not 1 <= kwargs.get("limit", 1) <= SOS_QUERY_MAX_RESULTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'limit' must be between 1 and {SOS_QUERY_MAX_RESULTS}",
+        )
+    try:
+        # Off the event loop: large viewports take a few milliseconds
+        return await asyncio.to_thread(method, *args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# SOS Map Routes, served from the in-memory index of recent SOS locations.
+# ``since`` is epoch seconds; viewports with west > east cross the antimeridian
+@app.get("/sos/nearby")
+async def sos_nearby(
+    latitude: float,
+    longitude: float,
+    radius: float,
+    limit: int = 100,
+    since: float = None,
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    results = await query_sos_index(
+        sos_index.within_radius,
+        current_user,
+        latitude,
+        longitude,
+        radius,
+        limit=limit,
+        since=since,
+    )
+    return {"radius_m": radius, "results": results}
+
+
+@app.get("/sos/area")
+async def sos_area(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    limit: int = 1000,
+    since: float = None,
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    results = await query_sos_index(
+        sos_index.within_box,
+        current_user,
+        south,
+        west,
+        north,
+        east,
+        limit=limit,
+        since=since,
+    )
+    return {"results": results}
+
+
+@app.get("/sos/clusters")
+async def sos_clusters(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    precision: int = 3,
+    since: float = None,
+    current_user: dict = Depends(AuthHandler.get_current_user),
+):
+    clusters = await query_sos_index(
+        sos_index.clusters,
+        current_user,
+        south,
+        west,
+        north,
+        east,
+        precision=precision,
+        since=since,
+    )
+    return {"precision": precision, "clusters": clusters}
+
+
 # Main entry point for running the server
 def main():
     import uvicorn
@@ -1,13 +1,156 @@
-import uvicorn
+"""Run the API in several worker processes sharing one listening socket.
+
+The app is imported once before forking, so module imports are paid once
+and shared copy-on-write; each worker then builds its own handlers, pools
+and connections in the app's lifespan. Databases, rollups and SQLite tables
+are set up once before forking. A relay process connects the
+workers so user, event and SOS updates reach every worker's caches and push
+subscribers. Workers that exit are restarted.
+
+    python server_run.py --workers 4 --port 8000
+    python server_run.py --reload            # single process, for development
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import traceback
+import uvicorn
+from notify.channel import ChannelRelay
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def fork(target, *args) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Child: default signal handling, run, and never return into the parent
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    status = 0
+    try:
+        target(*args)
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    os._exit(status)
+
+
+def run_relay(relay: ChannelRelay):
+    asyncio.run(relay.serve())
+
+
+def run_worker(app, sock: socket.socket, args):
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        access_log=args.access_log,
+        timeout_keep_alive=args.keep_alive,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(args):
+    sock = bind_socket(args.host, args.port)
+    channel_dir = tempfile.mkdtemp(prefix="drowsiness-")
+    relay = ChannelRelay(os.path.join(channel_dir, "channel.sock"))
+    relay.bind()
+    # Read by the workers' lifespan, so set before importing and forking
+    os.environ["CHANNEL_PATH"] = relay.path
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    os.environ["STORAGE_SETUP"] = "0"
+
+    started = time.perf_counter()
+    from server import app, logger, setup_storage
+
+    logger.info(
+        "Preloaded app in %.2fs, starting %d workers on %s:%d",
+        time.perf_counter() - started,
+        args.workers,
+        args.host,
+        args.port,
+    )
+
+    # One-time database setup, in a child like everything else so this
+    # process never runs threads and can safely fork replacements later
+    _, status = os.waitpid(fork(setup_storage), 0)
+    if os.waitstatus_to_exitcode(status):
+        logger.warning("Storage setup failed, starting workers anyway")
+
+    children = {fork(run_relay, relay): "relay"}
+    for _ in range(args.workers):
+        children[fork(run_worker, app, sock, args)] = "worker"
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        role = children.pop(pid, None)
+        if role is None or stopping:
+            continue
+        logger.warning(
+            "%s %d exited with status %d, restarting",
+            role,
+            pid,
+            os.waitstatus_to_exitcode(status),
+        )
+        time.sleep(0.5)
+        if role == "relay":
+            children[fork(run_relay, relay)] = "relay"
+        else:
+            children[fork(run_worker, app, sock, args)] = "worker"
+    sock.close()
+    shutil.rmtree(channel_dir, ignore_errors=True)
 
 
 def main():
-    uvicorn.run(
-        "server:app",  # Assumes your main FastAPI script is named main.py
-        host="0.0.0.0",  # Listen on all available network interfaces
-        port=3000,  # Standard FastAPI development port
-        reload=True,  # Enable auto-reload for development
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 3000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 1))
+    )
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--access-log", action="store_true")
+    parser.add_argument(
+        "--reload", action="store_true", help="single process with auto-reload"
     )
+    args = parser.parse_args()
+
+    if args.reload:
+        uvicorn.run("server:app", host=args.host, port=args.port, reload=True)
+    else:
+        serve(args)
 
 
 if __name__ == "__main__":
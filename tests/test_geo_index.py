@@ -0,0 +1,80 @@
+"""Spatial index behind the SOS map queries.
+
+python -m pytest tests/test_geo_index.py
+"""
+
+import time
+import pytest
+from db.geo_index import SOSGeoIndex, distance_m
+
+
+def sos(sos_id, latitude, longitude, age=0.0, user_id="driver"):
+    return {
+        "sos_id": sos_id,
+        "user_id": user_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "time": time.time_ns() - int(age * 1e9),
+    }
+
+
+def ids(records):
+    return [record["sos_id"] for record in records]
+
+
+@pytest.fixture
+def dateline():
+    """SOS on both sides of the antimeridian, plus one far away."""
+    index = SOSGeoIndex()
+    index.add_many(
+        [
+            sos("east", 10.0, 179.95, age=3),
+            sos("west", 10.0, -179.95, age=2),
+            sos("far", 10.0, 0.0, age=1),
+        ]
+    )
+    return index
+
+
+def test_radius_query_crosses_the_antimeridian(dateline):
+    matches = dateline.within_radius(10.0, 179.99, 20000)
+    assert ids(matches) == ["east", "west"]
+    assert matches[0]["distance_m"] == pytest.approx(
+        distance_m(10.0, 179.99, 10.0, 179.95), abs=0.1
+    )
+
+
+def test_box_with_west_greater_than_east_wraps_around(dateline):
+    assert ids(dateline.within_box(0, 179, 20, -179)) == ["west", "east"]
+    assert ids(dateline.within_box(0, -179, 20, 179)) == ["far"]
+
+
+def test_clusters_on_both_sides_of_the_antimeridian(dateline):
+    clusters = dateline.clusters(0, 179, 20, -179, precision=2)
+    assert sorted(cluster["count"] for cluster in clusters) == [1, 1]
+    assert all(abs(cluster["longitude"]) > 179 for cluster in clusters)
+
+
+def test_oldest_entries_are_evicted_beyond_max_size():
+    index = SOSGeoIndex(max_size=3)
+    for i in range(5):
+        index.add(sos(f"sos-{i}", 48.0 + i * 0.01, 2.0, age=10 - i))
+    assert ids(index.within_box(40, 0, 50, 5)) == ["sos-4", "sos-3", "sos-2"]
+    assert index.stats()["evicted"] == 2
+
+
+def test_late_inserts_are_evicted_by_their_own_time():
+    index = SOSGeoIndex(max_size=2)
+    index.add(sos("new", 48.0, 2.0, age=1))
+    # Replayed late from an edge spool, older than what is indexed
+    index.add(sos("replayed", 48.0, 2.0, age=100))
+    index.add(sos("newest", 48.0, 2.0))
+    assert ids(index.within_box(40, 0, 50, 5)) == ["newest", "new"]
+
+
+def test_entries_older_than_the_window_are_not_returned():
+    index = SOSGeoIndex(window=60)
+    index.add_many([sos("stale", 48.0, 2.0, age=120), sos("fresh", 48.0, 2.0)])
+    assert ids(index.within_radius(48.0, 2.0, 1000)) == ["fresh"]
+    assert index.clusters(40, 0, 50, 5)[0]["count"] == 1
+    assert index.stats()["size"] == 1
@@ -0,0 +1,90 @@
+"""Event validation and history paging shared by the storage backends.
+
+python -m pytest tests/test_storage.py
+"""
+
+import pytest
+from db.storage import history_page, history_query, parse_events
+
+
+def test_parse_events_fills_optional_fields():
+    parsed = parse_events(
+        [
+            {"event_type": "yawn", "confidence": 0.7, "timestamp": 1.5},
+            {"event_type": "drowsy", "count": 4, "max_confidence": 0.9},
+        ]
+    )
+    assert parsed == [
+        {
+            "event_type": "yawn",
+            "confidence": 0.7,
+            "timestamp_ns": 1500000000,
+            "count": None,
+            "max_confidence": None,
+        },
+        {
+            "event_type": "drowsy",
+            "confidence": 0.0,
+            "timestamp_ns": None,
+            "count": 4,
+            "max_confidence": 0.9,
+        },
+    ]
+
+
+def test_parse_events_lists_every_problem():
+    with pytest.raises(ValueError) as error:
+        parse_events(
+            [
+                "yawn",
+                {"confidence": 0.5},
+                {"event_type": "yawn", "confidence": float("nan")},
+                {"event_type": "yawn", "count": True},
+                {"event_type": "yawn", "count": 0},
+                {"event_type": "yawn", "timestamp": "yesterday"},
+            ]
+        )
+    message = str(error.value)
+    assert "[0] event must be an object" in message
+    assert "[1] missing 'event_type'" in message
+    assert "[2] 'confidence' must be a number" in message
+    assert "[3] 'count' must be a positive integer" in message
+    assert "[4] 'count' must be a positive integer" in message
+    assert "[5] 'timestamp' must be epoch seconds" in message
+
+
+def test_history_pages_split_rows_sharing_a_timestamp():
+    rows = [{"time": t} for t in (1, 2, 2, 2, 3)]
+
+    page, cursor = history_page(rows[:3], 0, 3)
+    assert page == rows[:3]
+    assert cursor == "2-2"
+
+    # The next query starts at the cursor time and skips the rows returned
+    _, start_ns, _, skip = history_query("events", 0, 10, cursor, 3, None)
+    assert (start_ns, skip) == (2, 2)
+    remaining = [row for row in rows if row["time"] >= start_ns]
+    page, cursor = history_page(remaining[: skip + 3], skip, 3)
+    assert page == [{"time": 2}, {"time": 3}]
+    assert cursor is None
+
+
+def test_history_page_counts_earlier_pages_at_the_same_timestamp():
+    rows = [{"time": 5}] * 6
+    page, cursor = history_page(rows[:4], 2, 2)
+    assert len(page) == 2
+    assert cursor == "5-4"
+
+
+@pytest.mark.parametrize(
+    "start, end, cursor, limit, fields",
+    [
+        (10, 10, None, 10, None),
+        (0, 10, None, 0, None),
+        (0, 10, "oops", 10, None),
+        (0, 10, None, 10, ["sos_id"]),
+    ],
+)
+def test_history_query_rejects_bad_requests(start, end, cursor, limit, fields):
+    with pytest.raises(ValueError):
+        history_query("events", start, end, cursor, limit, fields)
@@ -0,0 +1,72 @@
+"""Sliding-window drowsiness scoring of the edge client.
+
+python -m pytest tests/test_temporal.py
+"""
+
+import pytest
+from edge.temporal import TemporalAggregator
+
+AWAKE, DROWSY = 0, 1
+CLASSES = {AWAKE: "awake", DROWSY: "drowsy"}
+
+
+def feed(aggregator, frames, start=0.0):
+    """Feed frames of {class_id: confidence}; return (frame, event type) pairs."""
+    transitions = []
+    for frame, confidences in enumerate(frames):
+        for event in aggregator.update(confidences, now=start + frame):
+            if event["type"] != "summary":
+                transitions.append((frame, event["type"]))
+    return transitions
+
+
+def make_aggregator(**kwargs):
+    options = {"window": 10, "enter_threshold": 0.6, "exit_threshold": 0.3}
+    options.update(kwargs)
+    return TemporalAggregator(CLASSES, summary_interval=1000, **options)
+
+
+def test_alert_waits_for_half_a_window():
+    aggregator = make_aggregator()
+    # The score is 1.0 from the first frame, but the window is nearly empty
+    assert feed(aggregator, [{DROWSY: 0.9}] * 5) == [(4, "drowsy_start")]
+
+
+def test_state_only_flips_at_the_thresholds():
+    aggregator = make_aggregator()
+    awake, drowsy = {AWAKE: 0.9}, {DROWSY: 0.9}
+    frames = [drowsy] * 10 + [awake] * 6 + [drowsy] + [awake] * 4
+    # Scores of 0.5 and 0.4 keep the alert up, and the lone drowsy frame
+    # holds the score at 0.4 until frame 17 brings it down to 0.3
+    assert feed(aggregator, frames) == [(4, "drowsy_start"), (17, "drowsy_end")]
+    assert not aggregator.is_drowsy
+
+
+def test_noisy_frames_do_not_raise_an_alert():
+    aggregator = make_aggregator()
+    # One drowsy frame in three keeps the score between 0.3 and 0.4
+    frames = [{DROWSY: 0.9}, {AWAKE: 0.9}, {AWAKE: 0.9}] * 20
+    assert feed(aggregator, frames) == []
+    assert aggregator.score < aggregator.enter_threshold
+
+
+def test_low_confidence_detections_are_ignored():
+    aggregator = make_aggregator(min_confidence=0.5)
+    assert feed(aggregator, [{DROWSY: 0.4}] * 20) == []
+    assert aggregator.score == 0.0
+
+
+def test_summary_reports_counts_and_mean_confidence():
+    aggregator = make_aggregator()
+    aggregator.update({DROWSY: 0.6}, now=0.0)
+    aggregator.update({DROWSY: 0.8, AWAKE: 0.2}, now=1.0)
+    summary = aggregator.summary()
+    assert summary == [
+        {
+            "type": "summary",
+            "event_type": "drowsy",
+            "confidence": pytest.approx(0.7),
+            "count": 2,
+        }
+    ]
+    assert aggregator.summary() == []
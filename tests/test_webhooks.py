@@ -0,0 +1,162 @@
+"""Webhook dispatcher against the local stub receiver (tools/webhook_stub.py).
+
+python -m pytest tests/test_webhooks.py
+"""
+
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+import pytest
+from notify.webhooks import WebhookDispatcher
+from tools.webhook_stub import StubState, make_handler
+
+
+class CountingState(StubState):
+    """Stub state that also remembers the size of every accepted request."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.batches = []
+
+    def record(self, path: str, records: list, delivery_ids: list):
+        super().record(path, records, delivery_ids)
+        self.batches.append((path, len(records)))
+
+
+@pytest.fixture
+def stub():
+    state = CountingState(0.0, 503, 0.0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+def make_dispatcher(url, tmp_path, **kwargs):
+    options = {"concurrency": 1, "batch_delay": 0.2, "timeout": 2.0, "backoff": 0.1}
+    options.update(kwargs)
+    return WebhookDispatcher(
+        targets={"event": [f"{url}/events"], "sos": [f"{url}/sos"]},
+        queue_path=str(tmp_path / "webhooks.db"),
+        **options,
+    )
+
+
+async def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for webhook deliveries")
+        await asyncio.sleep(0.02)
+
+
+def record_attempts(dispatcher) -> list:
+    """Wrap the dispatcher's HTTP call to timestamp every attempt."""
+    attempts = []
+    post = dispatcher._post
+
+    def timed_post(*args):
+        attempts.append(time.monotonic())
+        return post(*args)
+
+    dispatcher._post = timed_post
+    return attempts
+
+
+def test_events_are_posted_in_batches(stub, tmp_path):
+    url, state = stub
+
+    async def scenario():
+        dispatcher = make_dispatcher(url, tmp_path, batch_size=50)
+        dispatcher.start()
+        await dispatcher.enqueue("event", [{"event_id": str(i)} for i in range(120)])
+        await wait_for(lambda: dispatcher.delivered == 120)
+        await dispatcher.close()
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert sorted(size for _, size in state.batches) == [20, 50, 50]
+    assert state.received["/events"] == 120
+    assert state.duplicates == 0
+
+
+def test_sos_are_posted_one_by_one(stub, tmp_path):
+    url, state = stub
+
+    async def scenario():
+        dispatcher = make_dispatcher(url, tmp_path, batch_size=50)
+        dispatcher.start()
+        await dispatcher.enqueue("sos", [{"sos_id": str(i)} for i in range(3)])
+        await wait_for(lambda: dispatcher.delivered == 3)
+        await dispatcher.close()
+
+    asyncio.run(scenario())
+    assert state.batches == [("/sos", 1)] * 3
+
+
+def test_failed_deliveries_are_retried_with_backoff(stub, tmp_path):
+    url, state = stub
+    state.fail_rate = 1.0
+
+    async def scenario():
+        dispatcher = make_dispatcher(url, tmp_path, max_attempts=10)
+        attempts = record_attempts(dispatcher)
+        dispatcher.start()
+        await dispatcher.enqueue("sos", [{"sos_id": "1"}])
+        await wait_for(lambda: len(attempts) >= 4)
+        # The receiver recovers and the held delivery goes through
+        state.fail_rate = 0.0
+        await wait_for(lambda: dispatcher.delivered == 1)
+        counts = dispatcher.queue.counts()
+        await dispatcher.close()
+        return dispatcher, attempts, counts
+
+    dispatcher, attempts, counts = asyncio.run(scenario())
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    # Delays double per attempt (with jitter), so the third wait is longer
+    assert gaps[2] > gaps[0]
+    assert dispatcher.retried >= 3
+    assert state.received["/sos"] == 1
+    assert state.duplicates == 0
+    assert counts == {}
+
+
+def test_retries_stop_after_max_attempts(stub, tmp_path):
+    url, state = stub
+    state.fail_rate = 1.0
+
+    async def scenario():
+        dispatcher = make_dispatcher(url, tmp_path, max_attempts=3)
+        attempts = record_attempts(dispatcher)
+        dispatcher.start()
+        await dispatcher.enqueue("sos", [{"sos_id": "1"}])
+        await wait_for(lambda: dispatcher.dead == 1)
+        counts = dispatcher.queue.counts()
+        await dispatcher.close()
+        return attempts, counts
+
+    attempts, counts = asyncio.run(scenario())
+    assert len(attempts) == 3
+    assert counts == {"dead": {"sos": 1}}
+
+
+def test_client_errors_are_not_retried(stub, tmp_path):
+    url, state = stub
+    state.fail_rate = 1.0
+    state.fail_status = 400
+
+    async def scenario():
+        dispatcher = make_dispatcher(url, tmp_path)
+        dispatcher.start()
+        await dispatcher.enqueue("event", [{"event_id": str(i)} for i in range(5)])
+        await wait_for(lambda: dispatcher.dead == 5)
+        counts = dispatcher.queue.counts()
+        await dispatcher.close()
+        return dispatcher, counts
+
+    dispatcher, counts = asyncio.run(scenario())
+    assert dispatcher.retried == 0
+    assert counts == {"dead": {"event": 5}}
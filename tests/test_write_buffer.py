@@ -0,0 +1,118 @@
+"""Background InfluxDB write buffer against an in-process fake client.
+
+python -m pytest tests/test_write_buffer.py
+"""
+
+import threading
+import time
+import pytest
+from influxdb.exceptions import InfluxDBClientError
+from db.write_buffer import WriteBuffer, WriteBufferFull
+
+
+class FakeClient:
+    """Stores written lines; fails while down and rejects lines with "bad"."""
+
+    def __init__(self, partial=False):
+        self.down = False
+        self.partial = partial
+        self.lines = []
+        self.requests = 0
+
+    def write_points(self, batch, protocol):
+        self.requests += 1
+        if self.down:
+            raise ConnectionError("InfluxDB is down")
+        bad = [line for line in batch if "bad" in line]
+        if bad and not self.partial:
+            raise InfluxDBClientError(f"unable to parse '{bad[0]}'", 400)
+        self.lines += [line for line in batch if "bad" not in line]
+        if bad:
+            raise InfluxDBClientError(
+                f'{{"error":"partial write: unable to parse dropped={len(bad)}"}}', 400
+            )
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the write buffer")
+        time.sleep(0.01)
+
+
+def lines(prefix, count):
+    return [f"events,user_id={prefix} confidence={i} {i}" for i in range(count)]
+
+
+@pytest.fixture
+def held_buffer():
+    """A buffer holding one point for a down InfluxDB, so nothing is drained."""
+    client = FakeClient()
+    client.down = True
+    buffer = WriteBuffer(
+        client, batch_size=100, flush_interval=0.05, max_queue_size=20, max_retries=0
+    )
+    buffer.enqueue_lines(lines("held", 1))
+    wait_for(lambda: buffer.stats()["held_points"] == 1)
+    yield client, buffer
+    client.down = False
+    buffer.close()
+
+
+def test_enqueue_lines_is_all_or_nothing(held_buffer):
+    _, buffer = held_buffer
+    buffer.enqueue_lines(lines("a", 15))
+    with pytest.raises(WriteBufferFull):
+        buffer.enqueue_lines(lines("b", 6))
+    buffer.enqueue_lines(lines("c", 5))
+    stats = buffer.stats()
+    assert stats["queue_depth"] == 20
+    assert stats["rejected_points"] == 6
+
+
+def test_concurrent_enqueue_lines_never_overfill(held_buffer):
+    _, buffer = held_buffer
+    accepted = []
+
+    def produce():
+        for _ in range(20):
+            try:
+                buffer.enqueue_lines(lines("t", 3))
+                accepted.append(3)
+            except WriteBufferFull:
+                pass
+
+    threads = [threading.Thread(target=produce) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert buffer.stats()["queue_depth"] == sum(accepted) == 18
+
+
+def test_held_batch_is_retried_once_influxdb_is_back(held_buffer):
+    client, buffer = held_buffer
+    buffer.enqueue_lines(lines("later", 3))
+    failed = client.requests
+    wait_for(lambda: client.requests > failed)
+    assert client.lines == []
+
+    client.down = False
+    wait_for(lambda: buffer.stats()["flushed_points"] == 4)
+    # The held point goes out before anything queued after it
+    assert client.lines[0] == lines("held", 1)[0]
+    assert buffer.stats()["failed_points"] == 0
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_only_rejected_lines_are_dropped(partial):
+    client = FakeClient(partial=partial)
+    buffer = WriteBuffer(client, batch_size=100, flush_interval=60)
+    batch = lines("a", 9) + ["bad line"] + lines("b", 6)
+    buffer.enqueue_lines(batch)
+    buffer.close()
+    assert sorted(client.lines) == sorted(line for line in batch if "bad" not in line)
+    stats = buffer.stats()
+    assert stats["flushed_points"] == 15
+    assert stats["failed_points"] == 1
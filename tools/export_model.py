@@ -0,0 +1,78 @@
+"""Export the PyTorch checkpoint to the CPU inference backends in edge/backends.py.
+
+    python -m tools.export_model ./yolo/best_with_100_epochs.pt --backend onnx
+    python -m tools.export_model ./yolo/best_with_100_epochs.pt --backend onnx-int8
+    python -m tools.export_model ./yolo/best_with_100_epochs.pt \
+        --backend openvino-int8 --data data.yaml
+"""
+
+import argparse
+import os
+import shutil
+from ultralytics import YOLO
+from edge.backends import BACKENDS, resolve_model_path
+
+
+def _move(exported, target):
+    if os.path.abspath(exported) == os.path.abspath(target):
+        return target
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(exported, target)
+    return target
+
+
+def export_onnx_int8(model_path, imgsz):
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fp32_path = resolve_model_path(model_path, "onnx")
+    if not os.path.exists(fp32_path):
+        export(model_path, "onnx", imgsz)
+    target = resolve_model_path(model_path, "onnx-int8")
+    quantize_dynamic(fp32_path, target, weight_type=QuantType.QUInt8)
+
+    # Keep the class names and task metadata Ultralytics reads on load
+    source = onnx.load(fp32_path)
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, target)
+    return target
+
+
+def export(model_path, backend, imgsz=640, data=None):
+    target = resolve_model_path(model_path, backend)
+    if backend == "torch":
+        return model_path
+    if backend == "onnx-int8":
+        return export_onnx_int8(model_path, imgsz)
+
+    model = YOLO(model_path)
+    if backend == "onnx":
+        # Dynamic axes so multi-stream mode can batch frames
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+    elif backend == "openvino":
+        exported = model.export(format="openvino", imgsz=imgsz, dynamic=True)
+    else:
+        # OpenVINO post-training quantization calibrates on the dataset yaml
+        exported = model.export(format="openvino", imgsz=imgsz, int8=True, data=data)
+    return _move(str(exported), target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--data", help="dataset yaml for openvino-int8 calibration")
+    args = parser.parse_args()
+
+    path = export(args.model_path, args.backend, args.imgsz, args.data)
+    print(f"Exported {args.backend} model to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Generate reproducible synthetic drivers, events and SOS points at volume.
+
+Users are simulated in fixed-size chunks, each seeded from --seed and its
+chunk index, so the output does not depend on how many worker processes
+share the work. Within a chunk everything is vectorized with numpy:
+
+- event types follow a Markov chain (drowsy and sleep are sticky, and more
+  likely at night), so drowsiness arrives in bursts;
+- every drowsy episode start raises an SOS, as the edge client does;
+- each driver travels back and forth between two cities and SOS
+  coordinates are taken along that route.
+
+Points go to InfluxDB in line-protocol batches, or to a file with --output.
+
+    python -m tools.generate_data --users 5000 --events-per-user 2000 --workers 8 --end 1735689600
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+import influxdb
+import numpy as np
+from dotenv import load_dotenv
+
+EVENT_TYPES = ["active", "inactive", "drowsy", "sleep"]
+ACTIVE, INACTIVE, DROWSY, SLEEP = range(len(EVENT_TYPES))
+
+# Row = current state, column = next state
+DAY_TRANSITIONS = np.array(
+    [
+        [0.93, 0.05, 0.02, 0.00],
+        [0.40, 0.55, 0.04, 0.01],
+        [0.30, 0.05, 0.60, 0.05],
+        [0.25, 0.05, 0.30, 0.40],
+    ]
+)
+NIGHT_TRANSITIONS = np.array(
+    [
+        [0.85, 0.07, 0.07, 0.01],
+        [0.30, 0.55, 0.12, 0.03],
+        [0.15, 0.05, 0.70, 0.10],
+        [0.10, 0.05, 0.35, 0.50],
+    ]
+)
+CUMULATIVE = np.cumsum(np.stack([DAY_TRANSITIONS, NIGHT_TRANSITIONS]), axis=2)
+
+# Beta(a, b) parameters of the model confidence for each event type
+CONFIDENCE_BETA = np.array([[8.0, 2.0], [5.0, 3.0], [6.0, 2.5], [7.0, 2.0]])
+
+LOCATIONS = np.array(
+    [
+        [30.4278, -9.5981],  # Agadir
+        [34.6814, -1.9076],  # Oujda
+        [34.2610, -6.5802],  # Kenitra
+        [35.5720, -5.3729],  # Tetouan
+        [32.2994, -9.2372],  # Safi
+        [52.3676, 4.9041],  # Amsterdam
+        [48.2082, 16.3738],  # Vienna
+        [38.7223, -9.1393],  # Lisbon
+        [37.9838, 23.7275],  # Athens
+        [59.3293, 18.0686],  # Stockholm
+    ]
+)
+SOS_MESSAGE = "Severe Drowsiness Detected!"
+
+
+def random_uuids(rng, count: int) -> list:
+    """Version 4 UUID strings drawn from rng, so they repeat with the seed."""
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hexed = raw.tobytes().hex()
+    return [
+        f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+        for h in (hexed[i : i + 32] for i in range(0, len(hexed), 32))
+    ]
+
+
+def simulate_states(rng, times_ns: np.ndarray) -> np.ndarray:
+    """Markov chain of event types, one step per event, all users at once."""
+    users, steps = times_ns.shape
+    hours = (times_ns // 3_600_000_000_000) % 24
+    night = ((hours >= 22) | (hours < 6)).astype(np.intp)
+    draws = rng.random((users, steps))
+
+    states = np.empty((users, steps), dtype=np.intp)
+    states[:, 0] = ACTIVE
+    for step in range(1, steps):
+        cumulative = CUMULATIVE[night[:, step], states[:, step - 1]]
+        states[:, step] = np.minimum(
+            (draws[:, step, None] > cumulative).sum(axis=1), len(EVENT_TYPES) - 1
+        )
+    return states
+
+
+def route_positions(rng, users: int, start_ns: int, times_ns: np.ndarray):
+    """Positions of each driver shuttling between an origin and a destination."""
+    origin = rng.integers(len(LOCATIONS), size=users)
+    destination = (origin + rng.integers(1, len(LOCATIONS), size=users)) % len(
+        LOCATIONS
+    )
+    speed_kmh = rng.uniform(60, 110, size=users)
+    start, end = LOCATIONS[origin], LOCATIONS[destination]
+
+    # Equirectangular distance is plenty for picking a trip duration
+    mid_lat = np.radians((start[:, 0] + end[:, 0]) / 2)
+    dlat = end[:, 0] - start[:, 0]
+    dlon = (end[:, 1] - start[:, 1]) * np.cos(mid_lat)
+    trip_hours = np.hypot(dlat, dlon) * 111.2 / speed_kmh
+
+    hours = (times_ns - start_ns) / 3.6e12
+    phase = (hours / trip_hours[:, None]) % 2
+    progress = np.where(phase > 1, 2 - phase, phase)
+    latitude = start[:, 0, None] + progress * dlat[:, None]
+    longitude = start[:, 1, None] + progress * (end[:, 1] - start[:, 1])[:, None]
+    noise = rng.normal(0, 0.005, size=(2,) + times_ns.shape)
+    return latitude + noise[0], longitude + noise[1]
+
+
+def generate_chunk(
+    seed: int, chunk: int, users: int, events_per_user: int, start_ns: int, end_ns
+):
+    """Line-protocol points for one chunk of users: users, events and SOS."""
+    rng = np.random.default_rng([seed, chunk])
+    user_ids = [f"driver_{value}" for value in random_uuids(rng, users)]
+
+    # Exponential gaps scaled so every user's events span the whole range
+    gaps = rng.exponential(1.0, size=(users, events_per_user))
+    offsets = np.cumsum(gaps, axis=1)
+    offsets /= offsets[:, -1:] * (1 + 1e-9)
+    times_ns = start_ns + (offsets * (end_ns - start_ns)).astype(np.int64)
+
+    states = simulate_states(rng, times_ns)
+    alpha, beta = CONFIDENCE_BETA[states, 0], CONFIDENCE_BETA[states, 1]
+    confidence = rng.beta(alpha, beta).round(4)
+    event_ids = random_uuids(rng, users * events_per_user)
+
+    previous = np.concatenate([np.full((users, 1), ACTIVE), states[:, :-1]], axis=1)
+    sos_mask = (states == DROWSY) & (previous != DROWSY) & (previous != SLEEP)
+    latitude, longitude = route_positions(rng, users, start_ns, times_ns)
+    sos_ids = random_uuids(rng, int(sos_mask.sum()))
+
+    lines = [
+        f"users,email=driver{chunk}.{index}@example.com,user_id={user_id} "
+        f'name="Driver {chunk}.{index}",phone="+2126{chunk:04d}{index:04d}" {start_ns}'
+        for index, user_id in enumerate(user_ids)
+    ]
+
+    type_names = np.array(EVENT_TYPES)[states].ravel().tolist()
+    user_column = np.repeat(np.arange(users), events_per_user).tolist()
+    lines += [
+        f"events,event_type={event_type},user_id={user_ids[user]} "
+        f'confidence={value},event_id="{event_id}" {timestamp}'
+        for event_type, user, value, event_id, timestamp in zip(
+            type_names,
+            user_column,
+            confidence.ravel().tolist(),
+            event_ids,
+            times_ns.ravel().tolist(),
+        )
+    ]
+
+    flat = np.flatnonzero(sos_mask.ravel())
+    lines += [
+        f"sos,user_id={user_ids[position // events_per_user]} "
+        f'event_id="{event_ids[position]}",latitude={lat:.5f},'
+        f'longitude={lon:.5f},message="{SOS_MESSAGE}",sos_id="{sos_id}" '
+        f"{timestamp + 1_000_000}"
+        for position, lat, lon, sos_id, timestamp in zip(
+            flat.tolist(),
+            latitude.ravel()[flat].tolist(),
+            longitude.ravel()[flat].tolist(),
+            sos_ids,
+            times_ns.ravel()[flat].tolist(),
+        )
+    ]
+    return lines, len(flat)
+
+
+def connect():
+    load_dotenv()
+    return influxdb.InfluxDBClient(
+        host=os.getenv("INFLUXDB_HOST"),
+        port=int(os.getenv("INFLUXDB_PORT", 8086)),
+        username=os.getenv("INFLUXDB_USERNAME"),
+        password=os.getenv("INFLUXDB_PASSWORD"),
+        database=os.getenv("INFLUXDB_DATABASE"),
+    )
+
+
+def _run_chunk(job):
+    args, chunk, users, start_ns, end_ns = job
+    lines, sos = generate_chunk(
+        args.seed, chunk, users, args.events_per_user, start_ns, end_ns
+    )
+    if args.output:
+        # The parent process owns the output file
+        return lines, sos
+
+    client = connect()
+    for offset in range(0, len(lines), args.batch_size):
+        client.write_points(lines[offset : offset + args.batch_size], protocol="line")
+    client.close()
+    return len(lines), sos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--events-per-user", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument(
+        "--end", type=float, help="epoch seconds of the last event (default: now)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-users", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--output", help="write line protocol to this file instead")
+    args = parser.parse_args()
+
+    end_ns = int((args.end if args.end is not None else time.time()) * 1e9)
+    start_ns = end_ns - int(args.days * 86400 * 1e9)
+    jobs = [
+        (args, chunk, min(args.chunk_users, args.users - first), start_ns, end_ns)
+        for chunk, first in enumerate(range(0, args.users, args.chunk_users))
+    ]
+
+    output = open(args.output, "w") if args.output else None
+    points = sos = 0
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        # imap keeps chunk order, so file output is identical for a given seed
+        for result, chunk_sos in pool.imap(_run_chunk, jobs):
+            if output is not None:
+                output.write("\n".join(result) + "\n")
+                result = len(result)
+            points += result
+            sos += chunk_sos
+            rate = points / max(time.perf_counter() - started, 1e-9)
+            print(f"{points} points ({sos} SOS) written, {rate:.0f} points/s")
+    if output is not None:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Move event_id/sos_id from tags to fields in the events and sos measurements.
+
+Old points are read back one time window at a time, rewritten with only
+user_id/event_type as tags and written in line-protocol batches, so memory
+stays bounded however much history there is. Once a measurement is copied
+the old high-cardinality series are dropped. Re-running is safe: only points
+that still carry an id tag are read.
+
+Without the id tags, points that shared a timestamp and user_id/event_type
+would land in the same series and overwrite each other, so such collisions
+are moved 1ns later until the timestamp is free. Points already in the new
+layout, written by the server or by an interrupted run, count as taken; a
+point whose copy is already there is skipped.
+
+    python -m tools.migrate_schema --window 6h --batch-size 5000
+"""
+
+import argparse
+import os
+import time
+import influxdb
+from dotenv import load_dotenv
+from db.write_buffer import to_line_protocol
+
+# measurement -> (tags kept, tags turned into fields, regular fields)
+LAYOUTS = {
+    "events": (
+        ["user_id", "event_type"],
+        ["event_id"],
+        ["confidence", "count", "max_confidence"],
+    ),
+    "sos": (
+        ["user_id"],
+        ["event_id", "sos_id"],
+        ["message", "latitude", "longitude"],
+    ),
+}
+
+DURATIONS = {"m": 60, "h": 3600, "d": 86400}
+
+# Collisions move points a few ns, so points this far past a window can
+# already be taken by it
+NUDGE_MARGIN_NS = 10**9
+
+
+def parse_duration(value: str) -> int:
+    """Convert '30m', '6h' or '1d' to nanoseconds."""
+    return int(value[:-1]) * DURATIONS[value[-1]] * 10**9
+
+
+def old_layout_bounds(client, measurement):
+    tags, id_tags, fields = LAYOUTS[measurement]
+    where = f'"{id_tags[0]}"::tag =~ /.+/'
+    bounds = []
+    for selector in ("FIRST", "LAST"):
+        rows = list(
+            client.query(
+                f'SELECT {selector}("{fields[0]}") FROM "{measurement}" WHERE {where}',
+                epoch="ns",
+            ).get_points()
+        )
+        if not rows:
+            return None
+        bounds.append(rows[0]["time"])
+    return bounds
+
+
+def new_layout_taken(client, measurement, start, stop):
+    """Map (tag values, time) to the ids of new-layout points in [start, stop)."""
+    tags, id_tags, fields = LAYOUTS[measurement]
+    columns = [f'"{key}"::tag AS "{key}"' for key in tags]
+    columns += [f'"{key}"::field AS "{key}"' for key in id_tags]
+    rows = client.query(
+        f'SELECT {", ".join(columns)} FROM "{measurement}" '
+        f"WHERE \"{id_tags[0]}\"::tag = '' AND time >= {start} AND time < {stop}",
+        epoch="ns",
+    ).get_points()
+    return {
+        (tuple(row.get(key) for key in tags), row["time"]): tuple(
+            row.get(key) for key in id_tags
+        )
+        for row in rows
+    }
+
+
+def migrate_measurement(client, measurement, window_ns, batch_size, dry_run=False):
+    tags, id_tags, fields = LAYOUTS[measurement]
+    bounds = old_layout_bounds(client, measurement)
+    if bounds is None:
+        print(f"{measurement}: nothing to migrate")
+        return 0
+
+    columns = [f'"{key}"::tag AS "{key}"' for key in tags + id_tags]
+    columns += [f'"{key}"::field AS "{key}"' for key in fields]
+    select = f'SELECT {", ".join(columns)} FROM "{measurement}"'
+    where = f'"{id_tags[0]}"::tag =~ /.+/'
+
+    migrated = nudged = skipped = 0
+    # (tag values, time) -> ids already written, including points nudged
+    # past the end of the previous window
+    taken = {}
+    start, last = bounds
+    started = time.perf_counter()
+    while start <= last:
+        stop = start + window_ns
+        taken.update(
+            new_layout_taken(client, measurement, start, stop + NUDGE_MARGIN_NS)
+        )
+        rows = client.query(
+            f"{select} WHERE {where} AND time >= {start} AND time < {stop}",
+            epoch="ns",
+        ).get_points()
+
+        batch = []
+        for row in rows:
+            series = tuple(row.get(key) for key in tags)
+            ids = tuple(row.get(key) for key in id_tags)
+            timestamp = row["time"]
+            while taken.get((series, timestamp), ids) != ids:
+                timestamp += 1
+            if taken.get((series, timestamp)) == ids:
+                # Copied by an interrupted run
+                skipped += 1
+                continue
+            if timestamp != row["time"]:
+                nudged += 1
+            taken[(series, timestamp)] = ids
+            point = {
+                "measurement": measurement,
+                "tags": {key: row.get(key) for key in tags},
+                "fields": {key: row.get(key) for key in id_tags + fields},
+                "time": timestamp,
+            }
+            batch.append(to_line_protocol(point))
+            if len(batch) >= batch_size:
+                migrated += _write(client, batch, dry_run)
+                batch = []
+        if batch:
+            migrated += _write(client, batch, dry_run)
+
+        start = stop
+        taken = {key: ids for key, ids in taken.items() if key[1] >= stop}
+        rate = migrated / max(time.perf_counter() - started, 1e-9)
+        print(
+            f"{measurement}: {migrated} points migrated, {nudged} moved by "
+            f"colliding timestamps, {skipped} already copied ({rate:.0f} points/s)"
+        )
+
+    if not dry_run:
+        # Dropping the id-tagged series is what actually shrinks the index
+        client.query(f'DROP SERIES FROM "{measurement}" WHERE "{id_tags[0]}" =~ /.+/')
+        print(f"{measurement}: dropped old id-tagged series")
+    return migrated
+
+
+def _write(client, batch, dry_run):
+    if not dry_run:
+        client.write_points(batch, protocol="line")
+    return len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--window", default="6h", help="time span read per query")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--measurements", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS)
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = influxdb.InfluxDBClient(
+        host=os.getenv("INFLUXDB_HOST"),
+        port=int(os.getenv("INFLUXDB_PORT", 8086)),
+        username=os.getenv("INFLUXDB_USERNAME"),
+        password=os.getenv("INFLUXDB_PASSWORD"),
+        database=os.getenv("INFLUXDB_DATABASE"),
+    )
+    for measurement in args.measurements:
+        migrate_measurement(
+            client,
+            measurement,
+            parse_duration(args.window),
+            args.batch_size,
+            args.dry_run,
+        )
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
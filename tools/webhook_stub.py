@@ -0,0 +1,91 @@
+"""Local stub endpoint for exercising the webhook dispatcher.
+
+Accepts webhook POSTs, prints one line per delivery and can be told to fail
+or stall a share of requests, so batching, the SOS lane, retries and dead
+lettering can be watched without a real third-party service:
+
+    python -m tools.webhook_stub --port 9000 --fail-rate 0.3 --delay 0.2
+    HTTP_EVENT_API=http://localhost:9000/events HTTP_SOS_API=http://localhost:9000/sos python server.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, fail_rate: float, fail_status: int, delay: float):
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.delay = delay
+        self.received = {}
+        self.delivery_ids = set()
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def record(self, path: str, records: list, delivery_ids: list):
+        with self._lock:
+            self.received[path] = self.received.get(path, 0) + len(records)
+            for delivery_id in delivery_ids:
+                if delivery_id in self.delivery_ids:
+                    self.duplicates += 1
+                self.delivery_ids.add(delivery_id)
+
+
+def make_handler(state: StubState):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if state.delay:
+                time.sleep(state.delay)
+            if random.random() < state.fail_rate:
+                self.send_response(state.fail_status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                print(f"{self.path} -> {state.fail_status} (injected)")
+                return
+
+            records = json.loads(body)
+            if not isinstance(records, list):
+                records = [records]
+            delivery_ids = self.headers.get("X-Delivery-Id", "").split(",")
+            state.record(self.path, records, delivery_ids)
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            print(
+                f"{self.path} <- {self.headers.get('X-Webhook-Topic')} "
+                f"x{len(records)} (total {state.received[self.path]}, "
+                f"duplicates {state.duplicates})"
+            )
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="share of requests to fail"
+    )
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+
+    state = StubState(args.fail_rate, args.fail_status, args.delay)
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(state))
+    print(f"Listening on :{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()